@@ -1,5 +1,8 @@
 import streamlit as st
 from utils.api_client import APIClient
+from utils.templates import placeholder_help, validate_template
+from utils.ai_messages import get_ai_message_service
+from utils.helpers import fragment
 
 st.set_page_config(
     page_title="Mini CRM Platform",
@@ -110,24 +113,20 @@ elif page == "🎯 Campaigns":
             message_template = st.text_area(
                 "Message Template *", 
                 value="Hi {name}, special offer for you! 🎉",
-                help="Use {name} as placeholder for customer name"
+                help=placeholder_help()
             )
             
             col1, col2 = st.columns(2)
             with col1:
                 if st.form_submit_button("🤖 Generate AI Messages", type="secondary"):
-                    try:
-                        ai_result = api_client.generate_ai_message("increase sales")
-                        if ai_result and "messages" in ai_result:
-                            st.success("✅ AI generated message options!")
-                            for i, msg in enumerate(ai_result["messages"]):
-                                st.code(msg, language="text")
-                    except Exception as e:
-                        st.error(f"AI generation failed: {str(e)}")
+                    # Generation runs in the background; results show below the form
+                    st.session_state.app_ai_objective = "increase sales"
+                    get_ai_message_service().prefetch("increase sales", api_client)
             
             with col2:
                 if st.form_submit_button("🚀 Launch Campaign", type="primary"):
-                    if name and message_template:
+                    template_errors = validate_template(message_template)
+                    if name and not template_errors:
                         campaign_data = {
                             "name": name,
                             "message_template": message_template,
@@ -137,8 +136,34 @@ elif page == "🎯 Campaigns":
                         result = api_client.create_campaign(campaign_data)
                         if result:
                             st.success("🚀 Campaign launched successfully!")
-                    else:
+                    elif not name:
                         st.error("❌ Name and message template are required")
+                    else:
+                        for error in template_errors:
+                            st.error(f"❌ {error}")
+        
+        def render_ai_messages(polling=False):
+            service = get_ai_message_service()
+            objective = st.session_state.app_ai_objective
+            pending = service.pending(objective)
+            
+            # Generation finished: rerun the page once so the fragment stops polling
+            if polling and not pending:
+                st.rerun()
+            
+            ai_result = service.cached(objective)
+            if ai_result and "messages" in ai_result:
+                st.success("✅ AI generated message options!")
+                for i, msg in enumerate(ai_result["messages"]):
+                    st.code(msg, language="text")
+            elif pending:
+                st.caption("🤖 Generating AI messages in the background...")
+            elif service.failed(objective):
+                st.error("AI generation failed. Try generating again.")
+        
+        if st.session_state.get("app_ai_objective"):
+            polling = get_ai_message_service().pending(st.session_state.app_ai_objective)
+            fragment(run_every=1 if polling else None)(render_ai_messages)(polling)
     
     with tab2:
         st.subheader("📊 All Campaigns")
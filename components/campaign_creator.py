@@ -1,4 +1,6 @@
 import streamlit as st
+import numpy as np
+import pandas as pd
 import sys
 import os
 
@@ -8,6 +10,21 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 from utils.api_client import APIClient
 from components.segment_builder import SegmentBuilder
 from components.auth_component import AuthComponent
+from utils.data_store import get_data_store
+from utils.segment_engine import SegmentError, audience_snapshot, get_segment_engine
+from utils.segment_rules import rules_hash
+from utils.messaging import GSM7, SMS_LIMITS, UCS2, delivery_estimate, sms_segments
+from utils.templates import SAMPLE_CUSTOMER, compile_template, placeholder_help, validate_template
+from utils.dispatch import CampaignDispatcher, get_delivery_adapter
+from utils.ai_messages import get_ai_message_service
+from utils.helpers import fragment
+from utils.jobs import CANCELLED, FAILED, get_job_manager
+
+# Seconds between checks on a running delivery estimate
+ESTIMATE_POLL = 0.5
+
+# Customers personalized for the delivery estimate; larger audiences are sampled
+ESTIMATE_SAMPLE_SIZE = 20000
 
 class CampaignCreator:
     """Component for creating and managing campaigns"""
@@ -30,10 +47,13 @@ class CampaignCreator:
                 help="Give your campaign a descriptive name"
             )
             
+            # Committing the objective starts AI generation in the background
             campaign_objective = st.text_input(
                 "Campaign Objective",
                 placeholder="e.g., Bring back inactive customers, Promote new products",
-                help="Describe what you want to achieve (used for AI message generation)"
+                help="Describe what you want to achieve (used for AI message generation)",
+                key="campaign_objective",
+                on_change=self._prefetch_ai_messages
             )
         
         # Audience segmentation
@@ -52,26 +72,11 @@ class CampaignCreator:
             
             with col2:
                 if st.button("🤖 Generate AI Messages", type="secondary"):
-                    with st.spinner("🤖 Generating personalized messages..."):
-                        ai_result = self.api_client.generate_ai_message(campaign_objective)
-                        if ai_result and "messages" in ai_result:
-                            st.session_state.ai_messages = ai_result["messages"]
-                            st.success("✅ AI generated message options!")
+                    self._prefetch_ai_messages()
         
-        # Display AI generated messages
-        if st.session_state.get("ai_messages"):
-            st.markdown("**🤖 AI Message Suggestions:**")
-            
-            for i, message in enumerate(st.session_state.ai_messages):
-                col1, col2 = st.columns([4, 1])
-                
-                with col1:
-                    st.code(message, language=None)
-                
-                with col2:
-                    if st.button(f"Use #{i+1}", key=f"use_msg_{i}"):
-                        st.session_state.selected_message = message
-                        st.success(f"✅ Selected message {i+1}")
+        # Suggestions arrive in a fragment that polls only while generation runs
+        pending = get_ai_message_service().pending(campaign_objective)
+        fragment(run_every=1 if pending else None)(self._render_ai_messages)(pending)
         
         # Message template input
         default_message = st.session_state.get("selected_message", "Hi {name}, here's a special offer just for you! 🎉")
@@ -79,22 +84,34 @@ class CampaignCreator:
         message_template = st.text_area(
             "Message Template *",
             value=default_message,
-            help="Use {name} as placeholder for customer name. Keep under 160 characters for SMS.",
+            help=placeholder_help() + " Keep under 160 characters for SMS.",
             height=100
         )
         
-        # Character counter
-        char_count = len(message_template)
-        if char_count > 160:
-            st.warning(f"⚠️ Message is {char_count} characters (recommended: under 160 for SMS)")
+        # Character counter, in the units the SMS encoding actually bills
+        encoding, units, segments = sms_segments(message_template)
+        if segments > 1:
+            st.warning(
+                f"⚠️ Template is {units} {encoding} units: {segments} SMS parts "
+                f"(one part holds {SMS_LIMITS[encoding][0]} in {encoding})"
+            )
         else:
-            st.info(f"✅ Message length: {char_count} characters")
+            st.info(f"✅ Message length: {len(message_template)} characters, 1 SMS part ({encoding})")
+        
+        # Templates are compiled once; errors are reported before anything renders
+        template_errors = validate_template(message_template)
         
         # Preview section
-        if message_template and "{name}" in message_template:
+        if not template_errors:
             st.markdown("**📱 Message Preview:**")
-            preview_message = message_template.replace("{name}", "John Doe")
-            st.success(f"📱 {preview_message}")
+            # The audience is resolved and sized as a job; the sample customer shows until it lands
+            estimate_id = self._estimate_job(segment_rules, message_template)
+            job = get_job_manager().get(estimate_id) if estimate_id else None
+            polling = job is not None and not job.done
+            fragment(run_every=ESTIMATE_POLL if polling else None)(self._render_estimate_status)(estimate_id, message_template, polling)
+        elif message_template.strip():
+            for error in template_errors:
+                st.error(f"❌ {error}")
         
         # Campaign launch section
         st.markdown("---")
@@ -104,8 +121,7 @@ class CampaignCreator:
         can_launch = all([
             campaign_name.strip(),
             segment_rules.get("rules"),
-            message_template.strip(),
-            "{name}" in message_template
+            not template_errors
         ])
         
         if not can_launch:
@@ -114,10 +130,8 @@ class CampaignCreator:
                 missing.append("Campaign Name")
             if not segment_rules.get("rules"):
                 missing.append("Target Audience Rules")
-            if not message_template.strip():
-                missing.append("Message Template")
-            elif "{name}" not in message_template:
-                missing.append("Message must include {name} placeholder")
+            if template_errors:
+                missing.append("Message Template" if not message_template.strip() else "Valid Message Template")
             
             st.error(f"❌ Please complete: {', '.join(missing)}")
         
@@ -141,35 +155,296 @@ class CampaignCreator:
                 "created_by": self.auth_component.get_user_email()
             }
             
-            with st.spinner("🚀 Launching campaign..."):
-                result = self.api_client.create_campaign(campaign_data)
+            # Resolving the audience, creating and sending run as a background job; this rerun only submits it
+            job = get_job_manager().submit(
+                "campaign_launch", self._launch_job, campaign_data,
+                label=f"Launch: {campaign_data['name']}",
+                owner=campaign_data["created_by"]
+            )
+            st.session_state.launch_job = job.id
+        
+        # Launch progress renders in a fragment that polls while the job runs
+        job_id = st.session_state.get("launch_job")
+        if job_id:
+            job = get_job_manager().get(job_id)
+            polling = job is not None and not job.done
+            fragment(run_every=1 if polling else None)(self._render_launch)(job_id, polling)
+    
+    def _launch_job(self, job, campaign_data):
+        """Resolve the audience, create the campaign and send its messages (runs on a job worker thread)"""
+        job.update(message="🎯 Resolving audience...", name=campaign_data["name"], template_length=len(campaign_data["message_template"]))
+        audience = self._audience(campaign_data["segment_rules"])
+        job.update(audience_size=len(audience) if audience is not None else 0)
+        
+        job.update(message="🚀 Creating campaign...")
+        campaign = self.api_client.create_campaign(campaign_data, silent=True)
+        if not campaign:
+            raise RuntimeError("the backend didn't create the campaign")
+        job.update(campaign=campaign)
+        
+        # Without a configured adapter the backend sends the campaign itself
+        adapter = get_delivery_adapter(self.api_client, campaign.get("id"))
+        if adapter is None or audience is None or not len(audience):
+            return {"campaign": campaign, "delivery": None, "adapter": None}
+        
+        def report(snapshot):
+            done = snapshot["total_sent"] / snapshot["total"] if snapshot["total"] else 1.0
+            job.update(progress=done, message=f"📤 {snapshot['total_sent']:,} of {snapshot['total']:,} messages sent", delivery=snapshot)
+        
+        job.update(message="📤 Sending messages...")
+        dispatcher = CampaignDispatcher(adapter, cancel=job.cancel_event)
+        progress = dispatcher.dispatch(campaign_data["message_template"], audience, on_progress=report)
+        return {"campaign": campaign, "delivery": progress.snapshot(), "adapter": adapter.name}
+    
+    def _render_launch(self, job_id, polling=False):
+        """Show a launch job's progress while it runs and its summary once it finishes"""
+        jobs = get_job_manager()
+        job = jobs.get(job_id)
+        if job is None:
+            st.session_state.pop("launch_job", None)
+            return
+        
+        snapshot = job.snapshot()
+        details = snapshot["details"]
+        
+        # Job finished: rerun the page once so the fragment stops polling
+        if polling and snapshot["done"]:
+            st.rerun()
+        
+        if not snapshot["done"]:
+            st.markdown("### 📤 Launching Campaign")
+            st.progress(snapshot["progress"], text=snapshot["message"] or "⏳ Queued...")
+            if details.get("delivery"):
+                self._render_delivery_counters(details["delivery"])
+            
+            if st.button("⏹️ Cancel Sending", key=f"cancel_{job_id}", disabled=snapshot["cancel_requested"]):
+                jobs.cancel(job_id)
+            if snapshot["cancel_requested"]:
+                st.caption("⏹️ Cancelling: chunks already in flight will finish")
+            return
+        
+        if snapshot["status"] == FAILED:
+            st.error(f"❌ Failed to launch campaign: {snapshot['error']}. Please try again.")
+            st.session_state.pop("launch_job", None)
+            return
+        
+        result = snapshot["result"] or {}
+        campaign = result.get("campaign") or details.get("campaign") or {}
+        if st.session_state.get("launch_celebrated") != job_id:
+            st.session_state.launch_celebrated = job_id
+            st.balloons()
+        st.success("🎉 Campaign launched successfully!")
+        
+        # Show campaign summary
+        st.markdown("### 📊 Campaign Summary")
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.metric("Campaign Name", details.get("name", ""))
+            st.metric("Target Audience", f"{campaign.get('audience_size', details.get('audience_size', 0))} customers")
+        
+        with col2:
+            st.metric("Message Template", f"{details.get('template_length', 0)} chars")
+            st.metric("Status", "Active 🟢")
+        
+        delivery = result.get("delivery") or details.get("delivery")
+        if delivery:
+            st.markdown("### 📤 Delivery")
+            self._render_delivery_counters(delivery)
+            if snapshot["status"] == CANCELLED:
+                st.warning(f"⏹️ Sending cancelled after {delivery['total_sent']:,} of {delivery['total']:,} messages")
+            if result.get("adapter"):
+                st.caption(f"📤 Sent through the {result['adapter']} delivery adapter in {delivery['elapsed_s']:.1f}s")
+            for error, count in sorted(delivery["errors"].items(), key=lambda item: -item[1]):
+                st.caption(f"⚠️ {count:,} failed: {error}")
+        
+        # Clear form
+        if st.button("Create Another Campaign"):
+            self.segment_builder.set_rules([])
+            for key in ("ai_messages", "selected_message", "launch_job"):
+                st.session_state.pop(key, None)
+            st.rerun()
+    
+    def _render_delivery_counters(self, snapshot):
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric("Sent", f"{snapshot['total_sent']:,}")
+        
+        with col2:
+            if snapshot.get("accepted"):
+                st.metric("Accepted", f"{snapshot['accepted']:,}", help="Handed to the backend; delivered and failed counts come from its campaign stats")
+            else:
+                st.metric("Delivered", f"{snapshot['delivered']:,}")
+        
+        with col3:
+            st.metric("Failed", f"{snapshot['failed']:,}")
+        
+        with col4:
+            st.metric("Throughput", f"{snapshot['rate_per_s']:,.0f}/s")
+    
+    def _prefetch_ai_messages(self):
+        """Start generating messages for the current objective without blocking the rerun"""
+        objective = st.session_state.get("campaign_objective", "")
+        if objective.strip():
+            get_ai_message_service().prefetch(objective, self.api_client)
+    
+    def _render_ai_messages(self, polling=False):
+        """Show AI suggestions for the objective, picking up background results"""
+        service = get_ai_message_service()
+        objective = st.session_state.get("campaign_objective", "")
+        pending = service.pending(objective)
+        
+        # Generation finished: rerun the page once so the fragment stops polling
+        if polling and not pending:
+            st.rerun()
+        
+        result = service.cached(objective) if objective.strip() else None
+        if result:
+            st.session_state.ai_messages = list(result["messages"])
+        elif pending:
+            st.caption("🤖 Generating personalized messages in the background...")
+        elif objective.strip() and service.failed(objective):
+            st.warning("⚠️ AI message generation failed. Try generating again.")
+        
+        # Display AI generated messages
+        if st.session_state.get("ai_messages"):
+            st.markdown("**🤖 AI Message Suggestions:**")
+            
+            for i, message in enumerate(st.session_state.ai_messages):
+                col1, col2 = st.columns([4, 1])
+                
+                with col1:
+                    st.code(message, language=None)
                 
-                if result:
-                    st.balloons()
-                    st.success("🎉 Campaign launched successfully!")
-                    
-                    # Show campaign summary
-                    st.markdown("### 📊 Campaign Summary")
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        st.metric("Campaign Name", campaign_name)
-                        st.metric("Target Audience", f"{result.get('audience_size', 0)} customers")
-                    
-                    with col2:
-                        st.metric("Message Template", f"{len(message_template)} chars")
-                        st.metric("Status", "Active 🟢")
-                    
-                    # Clear form
-                    if st.button("Create Another Campaign"):
-                        st.session_state.segment_rules = []
-                        if "ai_messages" in st.session_state:
-                            del st.session_state.ai_messages
-                        if "selected_message" in st.session_state:
-                            del st.session_state.selected_message
+                with col2:
+                    if st.button(f"Use #{i+1}", key=f"use_msg_{i}"):
+                        st.session_state.selected_message = message
+                        # The template field lives outside this fragment
                         st.rerun()
-                else:
-                    st.error("❌ Failed to launch campaign. Please try again.")
+    
+    def _estimate_job(self, segment_rules, message_template):
+        """Get the id of the job estimating delivery, submitting one when the rules, template or data change"""
+        if not segment_rules.get("rules"):
+            return None
+        
+        jobs = get_job_manager()
+        version = get_data_store().version("customers")
+        key = (rules_hash(segment_rules), message_template)
+        current = st.session_state.get("delivery_estimate")
+        
+        if current and current["key"] == key:
+            job = jobs.get(current["job"])
+            # An estimate that itself loaded the data is current for the version it loaded
+            loaded = job.result.get("data_version") if job is not None and job.done and job.result else None
+            if job is not None and version in (current["version"], loaded):
+                return job.id
+        
+        if current:
+            jobs.cancel(current["job"])
+        job = jobs.submit(
+            "delivery_estimate", self._estimate_delivery, segment_rules, message_template,
+            label="Delivery estimate", interactive=True
+        )
+        st.session_state.delivery_estimate = {"key": key, "version": version, "job": job.id}
+        return job.id
+    
+    def _estimate_delivery(self, job, segment_rules, message_template):
+        """Resolve the audience and size its messages, sampling large audiences (runs on a job worker thread)"""
+        job.update(message="📥 Loading customers...")
+        engine = get_segment_engine(self.api_client, silent=True)
+        job.update(message="📊 Estimating delivery...")
+        try:
+            rows = self._audience_rows(engine, segment_rules)
+        except SegmentError:
+            return None
+        if not len(rows):
+            return None
+        
+        sample = rows
+        if len(rows) > ESTIMATE_SAMPLE_SIZE:
+            sample = np.sort(np.random.default_rng(0).choice(rows, ESTIMATE_SAMPLE_SIZE, replace=False))
+        
+        estimate = delivery_estimate(message_template, engine.table.take(sample), total=len(rows))
+        estimate["preview"] = compile_template(message_template).render_column(engine.table.take(rows[:1]))[0]
+        estimate["data_version"] = engine.version
+        return estimate
+    
+    def _render_estimate_status(self, job_id, message_template, polling=False):
+        """Show the message preview, and the delivery estimate once its job finishes"""
+        job = get_job_manager().get(job_id) if job_id else None
+        snapshot = job.snapshot() if job is not None else None
+        
+        # Estimate finished: rerun the page once so the fragment stops polling
+        if polling and snapshot["done"]:
+            st.rerun()
+        
+        estimate = snapshot["result"] if snapshot and snapshot["done"] else None
+        if estimate:
+            st.success(f"📱 {estimate['preview']}")
+            self._render_delivery_estimate(estimate)
+            return
+        
+        st.success(f"📱 {compile_template(message_template).render(SAMPLE_CUSTOMER)}")
+        if snapshot is None:
+            return
+        if not snapshot["done"]:
+            st.caption(f"⏳ {snapshot['message'] or 'Estimating delivery...'}")
+        elif snapshot["status"] == FAILED:
+            st.warning(f"⚠️ Couldn't estimate delivery: {snapshot['error']}")
+    
+    def _render_delivery_estimate(self, stats):
+        """Show encoding, length distribution and SMS cost over the resolved audience"""
+        st.markdown("**📊 Delivery Estimate:**")
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric("Messages", f"{stats['messages']:,}")
+        
+        with col2:
+            st.metric("SMS Parts", f"{stats['total_segments']:,}")
+        
+        with col3:
+            st.metric("Estimated Cost", f"₹{stats['cost']:,.2f}")
+        
+        with col4:
+            st.metric("Encoding", UCS2 if stats["encodings"][UCS2] else GSM7)
+        
+        if stats["sample_size"] < stats["messages"]:
+            st.caption(f"🎲 Scaled up from a random sample of {stats['sample_size']:,} customers")
+        
+        if stats["non_gsm_characters"]:
+            st.caption(
+                f"🔤 Non-GSM characters ({' '.join(stats['non_gsm_characters'])}) force {UCS2} encoding: "
+                f"{SMS_LIMITS[UCS2][0]} characters per SMS instead of {SMS_LIMITS[GSM7][0]}"
+            )
+        elif stats["encodings"][UCS2]:
+            st.caption(f"🔤 {stats['encodings'][UCS2]:,} messages switch to {UCS2} because of characters in customer data")
+        
+        shortest, longest, median = stats["lengths"]
+        st.caption(f"📏 Personalized length: {shortest} – {longest} characters (median {median:.0f})")
+        
+        distribution = pd.DataFrame(
+            {"SMS parts": list(stats["segment_counts"]), "Messages": list(stats["segment_counts"].values())}
+        )
+        st.dataframe(distribution, hide_index=True, use_container_width=True)
+        
+        if len(stats["segment_counts"]) > 1:
+            st.caption(f"✂️ Longest message: {stats['longest_message']}")
+    
+    def _audience(self, segment_rules):
+        """Get the customers the rules target as a record table, None if not resolvable locally"""
+        if not segment_rules.get("rules"):
+            return None
+        try:
+            engine = get_segment_engine(self.api_client, silent=True)
+            return engine.table.take(self._audience_rows(engine, segment_rules))
+        except (SegmentError, RuntimeError):
+            return None
+    
+    def _audience_rows(self, engine, segment_rules):
+        """Get the table rows the rules target, from the snapshot shared by the estimate and the launch"""
+        return np.flatnonzero(np.isin(engine.table["id"], audience_snapshot(engine, segment_rules)))
 
 def create_campaign_creator():
     """Factory function to create campaign creator"""
@@ -1,4 +1,5 @@
 import streamlit as st
+import copy
 import sys
 import os
 
@@ -6,6 +7,16 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from utils.api_client import APIClient
+from utils.data_store import get_data_store
+from utils.helpers import fragment
+from utils.jobs import FAILED, get_job_manager
+from utils.segment_engine import IncrementalSegmentEvaluator, SegmentError, get_segment_engine
+from utils.segment_parser import parse_segment_text, parse_segment_text_local
+from utils.segment_rules import is_group, rules_hash
+from utils.segment_sketch import get_sketch_store
+
+# Seconds between checks on a running audience count
+PREVIEW_POLL = 0.5
 
 class SegmentBuilder:
     def __init__(self):
@@ -16,6 +27,10 @@ class SegmentBuilder:
             st.session_state.segment_rules = []
         if "logic_operator" not in st.session_state:
             st.session_state.logic_operator = "AND"
+        if "segment_rules_rev" not in st.session_state:
+            st.session_state.segment_rules_rev = 0
+        if "segment_evaluator" not in st.session_state:
+            st.session_state.segment_evaluator = IncrementalSegmentEvaluator()
     
     def render_rule_builder(self):
         st.markdown("## 🎯 Build Your Audience Segment")
@@ -53,19 +68,17 @@ class SegmentBuilder:
             generate_btn = st.button("🔮 Generate Rules", type="primary", disabled=not natural_text.strip())
         
         if generate_btn and natural_text.strip():
-            with st.spinner("🤖 AI is analyzing your description..."):
-                result = self.api_client.parse_segment_text(natural_text.strip())
+            result = self._parse_description(natural_text.strip())
+            
+            if result and "rules" in result:
+                parsed_rules = result["rules"]
                 
-                if result and "rules" in result:
-                    parsed_rules = result["rules"]
-                    
-                    if "rules" in parsed_rules and parsed_rules["rules"]:
-                        st.session_state.segment_rules = parsed_rules["rules"]
-                        st.session_state.logic_operator = parsed_rules.get("logic", "AND")
-                        st.success("✅ AI successfully converted your description into rules!")
-                        st.rerun()
-                    else:
-                        st.warning("⚠️ AI couldn't understand your description. Please try being more specific.")
+                if "rules" in parsed_rules and parsed_rules["rules"]:
+                    self.set_rules(parsed_rules["rules"], parsed_rules.get("logic", "AND"))
+                    st.success("✅ AI successfully converted your description into rules!")
+                    st.rerun()
+                else:
+                    st.warning("⚠️ AI couldn't understand your description. Please try being more specific.")
         
         # AI suggestions
         st.markdown("### 💡 AI Suggestions")
@@ -78,13 +91,19 @@ class SegmentBuilder:
         
         for suggestion in suggestions:
             if st.button(f"💡 {suggestion}", key=f"suggestion_{suggestion}"):
-                with st.spinner("Generating rules..."):
-                    result = self.api_client.parse_segment_text(suggestion)
-                    if result and "rules" in result:
-                        parsed_rules = result["rules"]
-                        st.session_state.segment_rules = parsed_rules["rules"]
-                        st.session_state.logic_operator = parsed_rules.get("logic", "AND")
-                        st.rerun()
+                result = self._parse_description(suggestion)
+                if result and "rules" in result:
+                    parsed_rules = result["rules"]
+                    self.set_rules(parsed_rules["rules"], parsed_rules.get("logic", "AND"))
+                    st.rerun()
+    
+    def _parse_description(self, text):
+        """Parse with the local grammar, only waiting on the AI for unrecognized text"""
+        if parse_segment_text_local(text):
+            return parse_segment_text(text, self.api_client)
+        
+        with st.spinner("🤖 AI is analyzing your description..."):
+            return parse_segment_text(text, self.api_client)
     
     def _render_manual_segment_builder(self):
         st.markdown("### 🔧 Manual Rule Builder")
@@ -99,6 +118,13 @@ class SegmentBuilder:
         # Add new rule section
         st.markdown("#### ➕ Add New Rule")
         
+        groups = [i for i, node in enumerate(st.session_state.segment_rules) if is_group(node)]
+        target = st.selectbox(
+            "Add to:",
+            [None] + groups,
+            format_func=lambda i: "Top level" if i is None else f"Group {i+1}"
+        )
+        
         col1, col2, col3, col4 = st.columns([3, 2, 2, 1])
         
         with col1:
@@ -121,53 +147,274 @@ class SegmentBuilder:
         
         if add_rule_btn:
             new_rule = {"field": field, "operator": operator, "value": value}
-            st.session_state.segment_rules.append(new_rule)
+            if target is None:
+                st.session_state.segment_rules.append(new_rule)
+            else:
+                st.session_state.segment_rules[target]["rules"].append(new_rule)
             st.success(f"✅ Added rule!")
             st.rerun()
+        
+        # Nested groups, e.g. (A AND B) OR NOT (C AND D)
+        st.markdown("#### 🧩 Add Rule Group")
+        
+        col1, col2, col3 = st.columns([3, 2, 1])
+        
+        with col1:
+            group_logic = st.selectbox("Combine group rules with:", ["AND", "OR"], key="new_group_logic")
+        
+        with col2:
+            st.markdown("&nbsp;")
+            group_negate = st.checkbox("NOT (exclude matches)", key="new_group_negate")
+        
+        with col3:
+            st.markdown("&nbsp;")
+            add_group_btn = st.button("🧩", key="add_group")
+        
+        if add_group_btn:
+            st.session_state.segment_rules.append({"logic": group_logic, "negate": group_negate, "rules": []})
+            st.success("✅ Added group! Add rules to it above.")
+            st.rerun()
+    
+    def set_rules(self, rules, logic=None):
+        """Replace the rule list, resetting the per-rule edit widgets"""
+        st.session_state.segment_rules = rules
+        st.session_state.segment_rules_rev += 1
+        if logic:
+            st.session_state.logic_operator = logic
     
     def _render_current_rules(self):
         if st.session_state.segment_rules:
             st.markdown("### 📋 Current Segment Rules")
+            rev = st.session_state.segment_rules_rev
             
-            for i, rule in enumerate(st.session_state.segment_rules):
-                col1, col2 = st.columns([4, 1])
-                
-                with col1:
-                    field_name = rule["field"].replace("_", " ").title()
-                    st.markdown(f"**{i+1}.** {field_name} {rule['operator']} {rule['value']}")
+            for i, node in enumerate(st.session_state.segment_rules):
+                if is_group(node):
+                    self._render_group(node, i, rev)
+                    continue
                 
-                with col2:
-                    if st.button("❌", key=f"delete_rule_{i}"):
-                        st.session_state.segment_rules.pop(i)
-                        st.rerun()
+                if self._render_rule(node, f"**{i+1}.**", f"{rev}_{i}"):
+                    rules = list(st.session_state.segment_rules)
+                    rules.pop(i)
+                    self.set_rules(rules)
+                    st.rerun()
             
             if st.button("🗑️ Clear All Rules"):
-                st.session_state.segment_rules = []
+                self.set_rules([])
                 st.rerun()
         else:
             st.info("📝 No rules defined yet. Use the AI assistant or manual builder above.")
     
+    def _render_group(self, group, i, rev):
+        """Render a nested group with its own logic, negation and rules"""
+        negate = "NOT " if group.get("negate") else ""
+        title = f"🧩 {i+1}. {negate}Group of {len(group['rules'])} rules joined with {group.get('logic', 'AND')}"
+        
+        with st.expander(title, expanded=True):
+            col1, col2, col3 = st.columns([3, 2, 1])
+            
+            with col1:
+                group["logic"] = st.selectbox(
+                    "Combine group rules with:",
+                    ["AND", "OR"],
+                    index=0 if group.get("logic", "AND") == "AND" else 1,
+                    key=f"group_logic_{rev}_{i}"
+                )
+            
+            with col2:
+                group["negate"] = st.checkbox(
+                    "NOT (exclude matches)",
+                    value=bool(group.get("negate")),
+                    key=f"group_negate_{rev}_{i}"
+                )
+            
+            with col3:
+                delete_group = st.button("🗑️", key=f"delete_group_{rev}_{i}")
+            
+            if not group["rules"]:
+                st.caption("Empty groups match everyone. Add rules to this group above.")
+            
+            for j, rule in enumerate(group["rules"]):
+                if is_group(rule):
+                    # Deeper nesting (e.g. from the AI) is shown but not edited here
+                    st.markdown(f"**{i+1}.{j+1}** 🧩 Nested group: `{rule}`")
+                    continue
+                
+                if self._render_rule(rule, f"**{i+1}.{j+1}**", f"{rev}_{i}_{j}"):
+                    rules = list(st.session_state.segment_rules)
+                    rules[i] = {**group, "rules": group["rules"][:j] + group["rules"][j+1:]}
+                    self.set_rules(rules)
+                    st.rerun()
+        
+        if delete_group:
+            rules = list(st.session_state.segment_rules)
+            rules.pop(i)
+            self.set_rules(rules)
+            st.rerun()
+    
+    def _render_rule(self, rule, label, key):
+        """Render one editable rule row, returning True if its delete button was pressed"""
+        col1, col2, col3, col4 = st.columns([3, 2, 2, 1])
+        
+        with col1:
+            field_name = rule["field"].replace("_", " ").title()
+            st.markdown(f"{label} {field_name}")
+        
+        # Edits update the rule in place; the preview below reflects them on this rerun
+        with col2:
+            operators = [">", ">=", "<", "<=", "="]
+            rule["operator"] = st.selectbox(
+                "Condition",
+                operators,
+                index=operators.index(rule["operator"]) if rule["operator"] in operators else 0,
+                key=f"rule_operator_{key}",
+                label_visibility="collapsed"
+            )
+        
+        with col3:
+            if rule["field"] == "total_spend":
+                value, min_value, step = float(rule["value"]), 0.0, 100.0
+            else:
+                value, min_value, step = int(rule["value"]), 0, 1
+            
+            rule["value"] = st.number_input(
+                "Value",
+                value=value,
+                min_value=min_value,
+                step=step,
+                key=f"rule_value_{key}",
+                label_visibility="collapsed"
+            )
+        
+        with col4:
+            return st.button("❌", key=f"delete_rule_{key}")
+    
     def _render_audience_preview(self):
         if st.session_state.segment_rules:
             st.markdown("### 👀 Audience Preview")
             
-            if st.button("🔍 Preview Audience", type="primary"):
-                rules_data = {
-                    "logic": st.session_state.logic_operator,
-                    "rules": st.session_state.segment_rules
-                }
-                
-                with st.spinner("🔄 Calculating audience size..."):
-                    preview = self.api_client.preview_segment(rules_data)
-                    
+            # Widgets edit the rules in place, so the job gets its own copy
+            rules_data = {
+                "logic": st.session_state.logic_operator,
+                "rules": copy.deepcopy(st.session_state.segment_rules)
+            }
+            
+            # The exact count runs as a job; the sketch estimate shows until it lands
+            jobs = get_job_manager()
+            job = jobs.get(self._preview_job(rules_data))
+            polling = job is not None and not job.done
+            counted = job is None or polling or job.result is not None
+            
+            preview_slot = st.container()
+            
+            if counted:
+                server_btn = st.button("🌐 Verify with Server")
+            else:
+                server_btn = st.button("🔍 Preview Audience", type="primary")
+            
+            with preview_slot:
+                if server_btn:
+                    with st.spinner("🔄 Calculating audience size..."):
+                        preview = self.api_client.preview_segment(rules_data)
                     if preview:
-                        audience_size = preview.get("audience_size", 0)
-                        st.success(f"🎯 **Audience Size: {audience_size} customers**")
-                        
-                        sample_customers = preview.get("sample_customers", [])
-                        if sample_customers:
-                            st.markdown("#### 👥 Sample Customers")
-                            for customer in sample_customers:
-                                st.write(f"👤 {customer['name']} - ₹{customer.get('total_spend', 0):,.0f}")
+                        self._render_preview_result(preview)
                     else:
                         st.warning("⚠️ No customers match your criteria.")
+                elif job is not None:
+                    fragment(run_every=PREVIEW_POLL if polling else None)(self._render_preview_status)(job.id, rules_data, polling)
+    
+    def _preview_job(self, rules_data):
+        """Get the id of the job counting this rule set, submitting one when the rules or data change"""
+        jobs = get_job_manager()
+        version = get_data_store().version("customers")
+        key = rules_hash(rules_data)
+        current = st.session_state.get("segment_preview")
+        
+        if current and current["key"] == key:
+            job = jobs.get(current["job"])
+            # A count that itself loaded the data is current for the version it loaded
+            loaded = job.result.get("data_version") if job is not None and job.done and job.result else None
+            if job is not None and version in (current["version"], loaded):
+                return job.id
+        
+        if current:
+            jobs.cancel(current["job"])
+        job = jobs.submit("segment_preview", self._count_audience, rules_data, label="Audience preview", interactive=True)
+        st.session_state.segment_preview = {"key": key, "version": version, "job": job.id}
+        return job.id
+    
+    def _count_audience(self, job, rules_data):
+        """Load customers if needed and count the audience exactly (runs on a job worker thread)"""
+        job.update(message="📥 Loading customers...")
+        engine = get_segment_engine(self.api_client, silent=True)
+        # The sketch is built as customers sync, so an estimate shows while the count runs
+        sketch = get_sketch_store().for_version(engine.table, engine.version)
+        job.update(message="🔢 Counting audience...", estimate=sketch.estimate(rules_data))
+        if not len(engine):
+            return None
+        try:
+            return IncrementalSegmentEvaluator().evaluate(engine, rules_data)
+        except SegmentError:
+            return None
+    
+    def _render_preview_status(self, job_id, rules_data, polling=False):
+        """Show the sketch estimate while the exact count runs, then the count"""
+        job = get_job_manager().get(job_id)
+        if job is None:
+            return
+        
+        snapshot = job.snapshot()
+        
+        # Count finished: rerun the page once so the fragment stops polling
+        if polling and snapshot["done"]:
+            st.rerun()
+        
+        if snapshot["done"]:
+            if snapshot["result"]:
+                self._render_preview_result(snapshot["result"])
+            elif snapshot["status"] == FAILED:
+                st.warning(f"⚠️ Couldn't count the audience locally: {snapshot['error']}")
+            return
+        
+        estimate = snapshot["details"].get("estimate")
+        if estimate is None:
+            sketch = get_sketch_store().latest()
+            estimate = sketch.estimate(rules_data) if sketch else None
+        
+        if estimate:
+            self._render_estimate(estimate)
+        else:
+            st.info(f"⏳ {snapshot['message'] or 'Counting audience...'}")
+    
+    def _render_estimate(self, estimate):
+        if estimate["method"] == "exact" or estimate["low"] == estimate["high"]:
+            st.info(f"⏳ **Estimated audience: {estimate['estimate']:,} customers** (exact from sketch, confirming...)")
+            return
+        
+        basis = "a row sample, 95% interval" if estimate["method"] == "sample" else "a histogram, hard bounds"
+        st.info(
+            f"⏳ **Estimated audience: ~{estimate['estimate']:,} customers** "
+            f"({estimate['low']:,} – {estimate['high']:,}, from {basis}; confirming...)"
+        )
+    
+    def _render_preview_result(self, preview):
+        audience_size = preview.get("audience_size", 0)
+        st.success(f"🎯 **Audience Size: {audience_size} customers**")
+        
+        if preview.get("source") == "local":
+            st.caption(
+                f"⚡ Computed locally in {preview['elapsed_ms']:.1f} ms over {preview['total_customers']} cached customers "
+                f"({preview.get('recomputed_rules', 0)} rule(s) recomputed)"
+            )
+            
+            cache_stats = preview.get("cache")
+            if cache_stats and cache_stats["hit_rate"] is not None:
+                st.caption(
+                    f"🧮 Shared rule cache: {cache_stats['hit_rate']:.0%} hit rate, "
+                    f"{cache_stats['entries']} bitmaps ({cache_stats['bytes'] / 1024:,.0f} KB)"
+                )
+        
+        sample_customers = preview.get("sample_customers", [])
+        if sample_customers:
+            st.markdown("#### 👥 Sample Customers")
+            for customer in sample_customers:
+                st.write(f"👤 {customer['name']} - ₹{customer.get('total_spend') or 0:,.0f}")
@@ -8,6 +8,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 
 from utils.api_client import APIClient
 from components.auth_component import AuthComponent
+from utils.helpers import SessionManager
+from utils.records import memory_report
 
 st.set_page_config(page_title="Customers - Mini CRM", page_icon="👥", layout="wide")
 
@@ -18,6 +20,9 @@ auth_component.require_auth()
 # Initialize API client
 api_client = APIClient()
 
+# Per-row UI flags (open forms, pending confirmations) are bounded and expire
+ui_flags = SessionManager.scope("customer_ui", max_keys=50, ttl=30 * 60)
+
 # Page header
 st.title("👥 Customer Management")
 st.markdown("Complete customer lifecycle management - Create, Read, Update, Delete")
@@ -126,11 +131,11 @@ with tab1:
                     
                     with col1:
                         if st.button(f"📦 View Orders", key=f"view_orders_btn_{customer_prefix}"):
-                            st.session_state[f'show_orders_{customer_prefix}'] = True
+                            ui_flags.set(f'show_orders_{customer_prefix}', True)
                     
                     with col2:
                         if st.button(f"➕ Add Order", key=f"add_order_btn_{customer_prefix}"):
-                            st.session_state[f'add_order_form_{customer_prefix}'] = True
+                            ui_flags.set(f'add_order_form_{customer_prefix}', True)
                     
                     with col3:
                         if st.button(f"🎯 Campaign", key=f"campaign_btn_{customer_prefix}"):
@@ -138,10 +143,10 @@ with tab1:
                     
                     with col4:
                         if st.button(f"🗑️ Delete", key=f"delete_btn_{customer_prefix}", type="secondary"):
-                            st.session_state[f'confirm_delete_{customer_prefix}'] = True
+                            ui_flags.set(f'confirm_delete_{customer_prefix}', True)
                     
                     # Show orders if requested
-                    if st.session_state.get(f'show_orders_{customer_prefix}', False):
+                    if ui_flags.get(f'show_orders_{customer_prefix}', False):
                         try:
                             orders = api_client.get_orders(customer_id=customer_id)
                             if orders:
@@ -152,13 +157,13 @@ with tab1:
                                 st.info("No orders found for this customer.")
                             
                             if st.button("✖️ Close", key=f"close_orders_btn_{customer_prefix}"):
-                                st.session_state[f'show_orders_{customer_prefix}'] = False
+                                ui_flags.delete(f'show_orders_{customer_prefix}')
                                 st.rerun()
                         except Exception as e:
                             st.error(f"Failed to load orders: {str(e)}")
                     
                     # Add order form
-                    if st.session_state.get(f'add_order_form_{customer_prefix}', False):
+                    if ui_flags.get(f'add_order_form_{customer_prefix}', False):
                         with st.form(f"add_order_form_{customer_prefix}"):
                             st.markdown("### 📦 Add New Order")
                             
@@ -192,16 +197,16 @@ with tab1:
                                     
                                     result = api_client.create_order(order_data)
                                     if result:
-                                        st.session_state[f'add_order_form_{customer_prefix}'] = False
+                                        ui_flags.delete(f'add_order_form_{customer_prefix}')
                                         st.rerun()
                             
                             with col2:
                                 if st.form_submit_button("❌ Cancel"):
-                                    st.session_state[f'add_order_form_{customer_prefix}'] = False
+                                    ui_flags.delete(f'add_order_form_{customer_prefix}')
                                     st.rerun()
                     
                     # Delete confirmation
-                    if st.session_state.get(f'confirm_delete_{customer_prefix}', False):
+                    if ui_flags.get(f'confirm_delete_{customer_prefix}', False):
                         st.markdown("---")
                         st.error(f"⚠️ **Confirm Deletion of {customer['name']}**")
                         st.write("This will permanently delete the customer and all their orders. This action cannot be undone.")
@@ -212,12 +217,12 @@ with tab1:
                             if st.button(f"🗑️ Yes, Delete", key=f"confirm_delete_yes_{customer_prefix}", type="primary"):
                                 result = api_client.delete_customer(customer_id)
                                 if result:
-                                    st.session_state[f'confirm_delete_{customer_prefix}'] = False
+                                    ui_flags.delete(f'confirm_delete_{customer_prefix}')
                                     st.rerun()
                         
                         with col2:
                             if st.button(f"❌ Cancel", key=f"confirm_delete_no_{customer_prefix}"):
-                                st.session_state[f'confirm_delete_{customer_prefix}'] = False
+                                ui_flags.delete(f'confirm_delete_{customer_prefix}')
                                 st.rerun()
         
         else:
@@ -340,9 +345,9 @@ with tab3:
                         
                         with col2:
                             if st.form_submit_button("🗑️ Delete Order", type="secondary"):
-                                st.session_state[f'delete_order_{order_prefix}'] = True
+                                ui_flags.set(f'delete_order_{order_prefix}', True)
                     
-                    if st.session_state.get(f'delete_order_{order_prefix}', False):
+                    if ui_flags.get(f'delete_order_{order_prefix}', False):
                         st.error("⚠️ **Confirm Order Deletion**")
                         st.write("This will permanently delete this order and update customer totals.")
                         
@@ -352,12 +357,12 @@ with tab3:
                             if st.button(f"🗑️ Yes, Delete", key=f"delete_order_confirm_{order_prefix}", type="primary"):
                                 result = api_client.delete_order(order_id)
                                 if result:
-                                    st.session_state[f'delete_order_{order_prefix}'] = False
+                                    ui_flags.delete(f'delete_order_{order_prefix}')
                                     st.rerun()
                         
                         with col2:
                             if st.button(f"❌ Cancel", key=f"delete_order_cancel_{order_prefix}"):
-                                st.session_state[f'delete_order_{order_prefix}'] = False
+                                ui_flags.delete(f'delete_order_{order_prefix}')
                                 st.rerun()
         
         else:
@@ -383,6 +388,16 @@ with tab4:
             st.metric("Total Orders", len(orders))
             st.metric("Total Campaigns", len(campaigns))
             
+            if customers:
+                with st.expander("🧠 Memory Footprint"):
+                    report = memory_report(customers)
+                    st.write(f"• Dict records: {report['dict_bytes'] / 1024:,.1f} KB ({report['dict_bytes_per_row']:,.0f} bytes/row)")
+                    st.write(f"• Columnar table: {report['table_bytes'] / 1024:,.1f} KB ({report['table_bytes_per_row']:,.0f} bytes/row)")
+                    st.write(f"• Savings: {report['savings_ratio']:.1f}x smaller")
+                    
+                    session_stats = SessionManager.stats()
+                    st.write(f"• Session state: {session_stats['keys']} keys, {session_stats['bytes'] / 1024:,.1f} KB")
+            
         except:
             st.error("Could not load data summary")
     
@@ -1,12 +1,27 @@
 import streamlit as st
+import numpy as np
+import pandas as pd
 import sys
 import os
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from utils.api_client import APIClient
 from components.auth_component import AuthComponent
+from utils.helpers import SessionManager, calculate_delivery_rate, format_campaign_status, fragment, parse_date_column, render_paged_table
+from utils.campaign_stats import get_campaign_stats_loader
+from utils.campaigns import BULK_TRANSITIONS, CAMPAIGN_STATUSES, bulk_transition, get_campaign_cache
+from utils.scheduler import SCHEDULE_TIMEZONES, available_recurrences, format_run_at, get_campaign_scheduler, schedule_timestamp
+from utils.jobs import FAILED, get_job_manager
+from utils.exports import EXPORT_FORMATS, export_campaigns
+from utils.ai_messages import get_ai_message_service
+from utils.segment_engine import get_segment_engine
+from utils.segment_overlap import audience_diff, campaign_rules, segment_overlap
+from utils.templates import placeholder_help, validate_template
 
 st.set_page_config(page_title="Campaigns - Mini CRM", page_icon="🎯", layout="wide")
 
@@ -17,12 +32,21 @@ auth_component.require_auth()
 # Initialize API client
 api_client = APIClient()
 
+# Per-row UI flags (open forms, pending confirmations) are bounded and expire
+ui_flags = SessionManager.scope("campaign_ui", max_keys=50, ttl=30 * 60)
+
 # Page header
 st.title("🎯 Campaign Management")
 st.markdown("Complete campaign lifecycle management - Create, Edit, Delete, Monitor")
 
+# Campaigns come from the shared cache and are shared by the management and overlap tabs
+campaigns = get_campaign_cache().get(api_client)
+
 # Tabs for campaign management
-tab1, tab2 = st.tabs(["📝 Create Campaign", "📊 Campaign Management"])
+tab1, tab2, tab3, tab4 = st.tabs(["📝 Create Campaign", "📊 Campaign Management", "🔀 Audience Overlap", "⏰ Scheduled"])
+
+# The scheduler's worker thread starts with the first page view and keeps running between reruns
+scheduler = get_campaign_scheduler()
 
 with tab1:
     st.header("📝 Create New Campaign")
@@ -55,7 +79,7 @@ with tab1:
             "Message Template *",
             value="Hi {name}, special offer just for you! 🎉",
             height=100,
-            help="Use {name} as placeholder for customer name"
+            help=placeholder_help()
         )
         
         # Character counter
@@ -74,24 +98,19 @@ with tab1:
         with col2:
             launch_campaign_btn = st.form_submit_button("🚀 Launch Campaign", type="primary")
         
-        # Handle AI message generation
+        # Handle AI message generation: runs in the background, results show below the form
         if generate_ai_btn and campaign_objective:
-            with st.spinner("🤖 Generating AI messages..."):
-                ai_result = api_client.generate_ai_message(campaign_objective)
-                if ai_result and "messages" in ai_result:
-                    st.session_state.ai_messages = ai_result["messages"]
-                    st.success("✅ AI generated message options!")
-                    st.rerun()
+            st.session_state.ai_objective = campaign_objective
+            get_ai_message_service().prefetch(campaign_objective, api_client)
         
         # Handle campaign launch
         if launch_campaign_btn:
             # Validation
             if not campaign_name.strip():
                 st.error("❌ Campaign name is required")
-            elif not message_template.strip():
-                st.error("❌ Message template is required")
-            elif "{name}" not in message_template:
-                st.error("❌ Message must include {name} placeholder")
+            elif validate_template(message_template):
+                for error in validate_template(message_template):
+                    st.error(f"❌ {error}")
             else:
                 # Create campaign
                 campaign_data = {
@@ -109,6 +128,30 @@ with tab1:
                             del st.session_state.ai_messages
                         st.success("🎉 Campaign launched successfully!")
     
+    def render_ai_messages(polling=False):
+        """Pick up background AI results for the submitted objective"""
+        service = get_ai_message_service()
+        objective = st.session_state.get("ai_objective", "")
+        pending = service.pending(objective)
+        
+        # Generation finished: rerun the page once so the fragment stops polling
+        if polling and not pending:
+            st.rerun()
+        
+        result = service.cached(objective) if objective else None
+        if result:
+            st.session_state.ai_messages = list(result["messages"])
+            del st.session_state.ai_objective
+        elif pending:
+            st.caption(f"🤖 Generating AI messages for \"{objective}\" in the background...")
+        elif objective and service.failed(objective):
+            st.warning("⚠️ AI message generation failed. Try generating again.")
+            del st.session_state.ai_objective
+    
+    if st.session_state.get("ai_objective"):
+        polling = get_ai_message_service().pending(st.session_state.ai_objective)
+        fragment(run_every=1 if polling else None)(render_ai_messages)(polling)
+    
     # Display AI messages outside the form
     if "ai_messages" in st.session_state:
         st.markdown("---")
@@ -123,7 +166,7 @@ with tab1:
             
             with col2:
                 if st.button("📋 Copy", key=f"copy_ai_msg_{i}"):
-                    st.session_state[f"copied_message_{i}"] = message
+                    ui_flags.set(f"copied_message_{i}", message)
                     st.success("✅ Copied!")
         
         if st.button("🗑️ Clear AI Messages"):
@@ -137,131 +180,336 @@ with tab2:
     col1, col2 = st.columns([1, 4])
     with col1:
         if st.button("🔄 Refresh", use_container_width=True, key="refresh_campaigns"):
+            get_campaign_cache().invalidate()
+            get_campaign_stats_loader().invalidate()
             st.rerun()
     
     try:
-        campaigns = api_client.get_campaigns()
-        
         if campaigns:
             st.success(f"📊 Found {len(campaigns)} campaigns")
             
-            # Sort campaigns by creation date (newest first)
-            campaigns.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+            # Filters and sorting run on the raw list; only the visible page and the opened campaign render
+            col1, col2, col3, col4, col5 = st.columns([2, 2, 2, 2, 1])
             
-            for campaign_index, campaign in enumerate(campaigns):
-                campaign_id = campaign['id']
-                campaign_prefix = f"campaign_{campaign_id}_idx_{campaign_index}"
+            with col1:
+                status_filter = st.multiselect("Status", sorted({c['status'] for c in campaigns}), key="campaign_status_filter")
+            
+            with col2:
+                creators = sorted({c.get('created_by') or 'Unknown' for c in campaigns})
+                creator_filter = st.selectbox("Created By", ["All"] + creators, key="campaign_creator_filter")
+            
+            with col3:
+                created_range = st.date_input("Created Between", value=(), key="campaign_date_filter")
+            
+            with col4:
+                name_filter = st.text_input("Search Name", placeholder="e.g., Black Friday", key="campaign_name_filter")
+            
+            with col5:
+                show_archived = st.checkbox("Show archived", key="campaign_show_archived")
+            
+            frame = pd.DataFrame(campaigns).reindex(
+                columns=["id", "name", "status", "audience_type", "audience_size", "created_by", "created_at"]
+            )
+            frame["audience_size"] = pd.to_numeric(frame["audience_size"], errors="coerce").fillna(0).astype(int)
+            mask = np.ones(len(frame), dtype=bool)
+            if status_filter:
+                mask &= frame["status"].isin(status_filter).to_numpy()
+            elif not show_archived:
+                mask &= (frame["status"] != "archived").to_numpy()
+            if creator_filter != "All":
+                mask &= (frame["created_by"].fillna("Unknown") == creator_filter).to_numpy()
+            if len(created_range) == 2:
+                created = parse_date_column(frame["created_at"].to_numpy()).astype("datetime64[D]")
+                mask &= (created >= np.datetime64(created_range[0])) & (created <= np.datetime64(created_range[1]))
+            if name_filter.strip():
+                mask &= frame["name"].fillna("").str.contains(name_filter.strip(), case=False, regex=False).to_numpy()
+            filtered = frame[mask]
+            
+            def delivery_rate(stats):
+                return calculate_delivery_rate(stats.get('delivered', 0), stats.get('total_sent', 0)) if stats else "—"
+            
+            def stats_columns(window):
+                # Stats load (batch or concurrent, cached briefly) for the visible page only
+                loaded = get_campaign_stats_loader().load(api_client, window["id"].tolist())
+                rows = [loaded.get(campaign_id) or {} for campaign_id in window["id"]]
+                return {
+                    "total_sent": pd.array([row.get('total_sent') for row in rows], dtype="Int64"),
+                    "delivered": pd.array([row.get('delivered') for row in rows], dtype="Int64"),
+                    "failed": pd.array([row.get('failed') for row in rows], dtype="Int64"),
+                    "delivery_rate": [delivery_rate(row) for row in rows],
+                }
+            
+            if filtered.empty:
+                st.info("📄 No campaigns match these filters.")
+                window = filtered
+            else:
+                window = render_paged_table(
+                    filtered, key="campaign_table", sort_by="created_at", descending=True, extra=stats_columns
+                )
+            
+            by_id = {c['id']: c for c in campaigns}
+            
+            # Bulk status changes over the filtered campaigns: status-only patches sent in parallel
+            with st.expander("⚡ Bulk Actions", expanded=False):
+                bulk_labels = {"pause": "⏸️ Pause", "resume": "▶️ Resume", "archive": "🗄️ Archive"}
+                col1, col2 = st.columns([1, 3])
                 
-                # Fixed: No key parameter for expander
-                with st.expander(f"📋 {campaign['name']} - {campaign['status'].title()}", expanded=False):
-                    
-                    # Campaign metrics
+                with col1:
+                    bulk_action = st.selectbox("Action", list(BULK_TRANSITIONS), format_func=bulk_labels.get, key="bulk_action")
+                
+                allowed, target = BULK_TRANSITIONS[bulk_action]
+                eligible = [campaign_id for campaign_id, status in zip(filtered["id"], filtered["status"]) if status in allowed]
+                
+                with col2:
+                    bulk_ids = st.multiselect(
+                        f"Campaigns ({len(eligible)} {' / '.join(sorted(allowed))} in the current filter)",
+                        eligible,
+                        format_func=lambda campaign_id: f"{by_id[campaign_id]['name']} (#{campaign_id})",
+                        key=f"bulk_ids_{bulk_action}"
+                    )
+                
+                select_all = st.checkbox(f"All {len(eligible)} eligible campaigns", key=f"bulk_all_{bulk_action}")
+                targets = eligible if select_all else bulk_ids
+                
+                if st.button(f"{bulk_labels[bulk_action]} {len(targets)} campaigns", type="primary", disabled=not targets, key="bulk_apply"):
+                    with st.spinner(f"Setting {len(targets)} campaigns to {target}..."):
+                        st.session_state.bulk_results = bulk_transition(
+                            api_client, [by_id[campaign_id] for campaign_id in targets], bulk_action, cache=get_campaign_cache()
+                        )
+                    st.rerun()
+                
+                if st.session_state.get("bulk_results"):
+                    results = pd.DataFrame(st.session_state.bulk_results)
+                    counts = results["result"].value_counts()
                     col1, col2, col3 = st.columns(3)
                     
                     with col1:
-                        st.metric("Audience Size", campaign.get('audience_size', 0))
+                        st.metric("Updated", int(counts.get("updated", 0)))
                     
                     with col2:
-                        status = campaign['status'].title()
-                        status_emoji = "🟢" if status == "Active" else "✅"
-                        st.metric("Status", f"{status} {status_emoji}")
+                        st.metric("Failed", int(counts.get("failed", 0)))
                     
                     with col3:
-                        created_date = campaign.get('created_at', 'Unknown')[:10]
-                        st.metric("Created", created_date)
+                        st.metric("Skipped", int(counts.get("skipped", 0)))
                     
-                    # Campaign details (read-only)
-                    st.markdown("**🎯 Current Details:**")
-                    st.write(f"**Audience Type:** {campaign.get('audience_type', 'All Customers')}")
-                    st.write(f"**Created By:** {campaign.get('created_by', 'Unknown')}")
-                    st.markdown("**📱 Message Template:**")
-                    st.code(campaign['message_template'])
+                    st.dataframe(results.sort_values("result"), hide_index=True, use_container_width=True)
                     
-                    # Edit campaign form
-                    st.markdown("---")
-                    st.markdown("### ✏️ Edit Campaign")
+                    if st.button("🧹 Clear Results", key="bulk_clear"):
+                        del st.session_state.bulk_results
+                        st.rerun()
+            
+            # Bulk export runs as a background job writing straight to a temporary file
+            with st.expander("📦 Export Campaigns", expanded=False):
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    export_format = st.radio("Format", list(EXPORT_FORMATS), format_func=str.upper, horizontal=True, key="export_format")
+                
+                with col2:
+                    include_audiences = st.checkbox(
+                        "Include audience lists",
+                        disabled=export_format == "csv",
+                        help="Customers each campaign targets, from the local customer store (NDJSON and ZIP only)",
+                        key="export_audiences"
+                    )
+                
+                if st.button(f"📦 Export {len(filtered)} campaigns", disabled=filtered.empty, key="export_start"):
+                    stats_loader = get_campaign_stats_loader()
                     
-                    with st.form(f"edit_campaign_form_{campaign_prefix}"):
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            new_name = st.text_input("Campaign Name", value=campaign['name'], key=f"edit_name_{campaign_prefix}")
-                            audience_options = ["All Customers", "High Value Customers", "Inactive Customers", "New Customers"]
-                            current_audience = campaign.get('audience_type', 'All Customers')
-                            audience_index = audience_options.index(current_audience) if current_audience in audience_options else 0
-                            
-                            new_audience_type = st.selectbox(
-                                "Audience Type",
-                                audience_options,
-                                index=audience_index,
-                                key=f"edit_audience_{campaign_prefix}"
-                            )
+                    def run_export(job, export_list, fmt, engine):
+                        def report(done, total):
+                            job.update(progress=done / total, message=f"📦 {done:,} of {total:,} campaigns written")
                         
-                        with col2:
-                            status_options = ["active", "paused", "completed", "draft"]
-                            current_status = campaign['status']
-                            status_index = status_options.index(current_status) if current_status in status_options else 0
-                            
-                            new_status = st.selectbox(
-                                "Status",
-                                status_options,
-                                index=status_index,
-                                key=f"edit_status_{campaign_prefix}"
-                            )
-                        
-                        new_message = st.text_area(
-                            "Message Template",
-                            value=campaign['message_template'],
-                            height=100,
-                            key=f"edit_message_{campaign_prefix}"
+                        path = export_campaigns(
+                            export_list, fmt,
+                            load_stats=lambda ids: stats_loader.load(api_client, ids),
+                            engine=engine,
+                            on_progress=report
                         )
+                        return {"path": path, "format": fmt, "campaigns": len(export_list)}
+                    
+                    job = get_job_manager().submit(
+                        "campaign_export", run_export,
+                        [by_id[campaign_id] for campaign_id in filtered["id"]],
+                        export_format,
+                        get_segment_engine(api_client) if include_audiences and export_format != "csv" else None,
+                        label=f"Export {len(filtered)} campaigns",
+                        owner=auth_component.get_user_email()
+                    )
+                    st.session_state.export_job = job.id
+                
+                def render_export(job_id, polling=False):
+                    """Show the export job's progress, then its download"""
+                    job = get_job_manager().get(job_id)
+                    if job is None:
+                        st.session_state.pop("export_job", None)
+                        return
+                    
+                    snapshot = job.snapshot()
+                    
+                    # Export finished: rerun the page once so the fragment stops polling
+                    if polling and snapshot["done"]:
+                        st.rerun()
+                    
+                    if not snapshot["done"]:
+                        st.progress(snapshot["progress"], text=snapshot["message"] or "⏳ Queued...")
+                        return
+                    
+                    if snapshot["status"] == FAILED:
+                        st.error(f"❌ Export failed: {snapshot['error']}")
+                        return
+                    
+                    result = snapshot["result"]
+                    if not result or not os.path.exists(result["path"]):
+                        st.warning("⚠️ This export has expired. Run it again.")
+                        return
+                    
+                    mime, extension = EXPORT_FORMATS[result["format"]]
+                    size_kb = os.path.getsize(result["path"]) / 1024
+                    
+                    # Called only when the button is clicked, so reruns never read the file
+                    def read_export(path=result["path"]):
+                        with open(path, "rb") as export_file:
+                            return export_file.read()
+                    
+                    st.download_button(
+                        label=f"💾 Download {result['campaigns']:,} campaigns ({size_kb:,.0f} KB)",
+                        data=read_export,
+                        file_name=f"campaigns_{datetime.now().strftime('%Y%m%d_%H%M')}.{extension}",
+                        mime=mime,
+                        key=f"export_download_{job_id}"
+                    )
+                
+                export_job = st.session_state.get("export_job")
+                if export_job:
+                    job = get_job_manager().get(export_job)
+                    polling = job is not None and not job.done
+                    fragment(run_every=1 if polling else None)(render_export)(export_job, polling)
+            
+            # Only the opened campaign gets its metrics, edit form and actions
+            opened = st.selectbox(
+                "📂 Open campaign",
+                [None] + window["id"].tolist(),
+                format_func=lambda campaign_id: "(select a campaign on this page)" if campaign_id is None else f"{by_id[campaign_id]['name']} (#{campaign_id})",
+                key="campaign_open"
+            )
+            
+            if opened is not None:
+                campaign = by_id[opened]
+                campaign_id = campaign['id']
+                campaign_prefix = f"campaign_{campaign_id}"
+                stats = get_campaign_stats_loader().load(api_client, [campaign_id])[campaign_id]
+                
+                st.markdown(f"### 📋 {campaign['name']} - {campaign['status'].title()} · {delivery_rate(stats)}")
+                
+                # Campaign metrics
+                col1, col2, col3 = st.columns(3)
+                
+                with col1:
+                    st.metric("Audience Size", campaign.get('audience_size', 0))
+                
+                with col2:
+                    st.metric("Status", format_campaign_status(campaign['status'])[0])
+                
+                with col3:
+                    created_date = campaign.get('created_at', 'Unknown')[:10]
+                    st.metric("Created", created_date)
+                
+                # Campaign details (read-only)
+                st.markdown("**🎯 Current Details:**")
+                st.write(f"**Audience Type:** {campaign.get('audience_type', 'All Customers')}")
+                st.write(f"**Created By:** {campaign.get('created_by', 'Unknown')}")
+                st.markdown("**📱 Message Template:**")
+                st.code(campaign['message_template'])
+                
+                # Edit campaign form
+                st.markdown("---")
+                st.markdown("### ✏️ Edit Campaign")
+                
+                with st.form(f"edit_campaign_form_{campaign_prefix}"):
+                    col1, col2 = st.columns(2)
+                    
+                    with col1:
+                        new_name = st.text_input("Campaign Name", value=campaign['name'], key=f"edit_name_{campaign_prefix}")
+                        audience_options = ["All Customers", "High Value Customers", "Inactive Customers", "New Customers"]
+                        current_audience = campaign.get('audience_type', 'All Customers')
+                        audience_index = audience_options.index(current_audience) if current_audience in audience_options else 0
                         
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            if st.form_submit_button("💾 Save Changes", type="primary"):
-                                if not new_name.strip():
-                                    st.error("❌ Campaign name is required")
-                                elif not new_message.strip():
-                                    st.error("❌ Message template is required")
-                                else:
-                                    update_data = {
-                                        "name": new_name.strip(),
-                                        "message_template": new_message.strip(),
-                                        "audience_type": new_audience_type,
-                                        "status": new_status
-                                    }
-                                    
-                                    result = api_client.update_campaign(campaign_id, update_data)
-                                    if result:
-                                        st.rerun()
+                        new_audience_type = st.selectbox(
+                            "Audience Type",
+                            audience_options,
+                            index=audience_index,
+                            key=f"edit_audience_{campaign_prefix}"
+                        )
+                    
+                    with col2:
+                        status_options = CAMPAIGN_STATUSES
+                        current_status = campaign['status']
+                        status_index = status_options.index(current_status) if current_status in status_options else 0
                         
-                        with col2:
-                            if st.form_submit_button("🗑️ Delete Campaign", type="secondary"):
-                                st.session_state[f'delete_campaign_{campaign_prefix}'] = True
+                        new_status = st.selectbox(
+                            "Status",
+                            status_options,
+                            index=status_index,
+                            key=f"edit_status_{campaign_prefix}"
+                        )
+                    
+                    new_message = st.text_area(
+                        "Message Template",
+                        value=campaign['message_template'],
+                        height=100,
+                        key=f"edit_message_{campaign_prefix}"
+                    )
                     
-                    # Campaign actions
-                    st.markdown("### 🔧 Campaign Actions")
-                    col1, col2, col3, col4 = st.columns(4)
+                    col1, col2 = st.columns(2)
                     
                     with col1:
-                        if st.button(f"📊 View Stats", key=f"stats_btn_{campaign_prefix}"):
-                            stats = api_client.get_campaign_stats(campaign_id)
-                            if stats:
-                                st.write("**📈 Campaign Statistics:**")
-                                st.write(f"• Total Sent: {stats['total_sent']}")
-                                st.write(f"• Delivered: {stats['delivered']}")
-                                st.write(f"• Failed: {stats['failed']}")
-                                st.write(f"• Delivery Rate: {stats['delivery_rate']:.1f}%")
+                        if st.form_submit_button("💾 Save Changes", type="primary"):
+                            if not new_name.strip():
+                                st.error("❌ Campaign name is required")
+                            elif validate_template(new_message, required=()):
+                                for error in validate_template(new_message, required=()):
+                                    st.error(f"❌ {error}")
+                            else:
+                                update_data = {
+                                    "name": new_name.strip(),
+                                    "message_template": new_message.strip(),
+                                    "audience_type": new_audience_type,
+                                    "status": new_status
+                                }
+                                
+                                result = api_client.update_campaign(campaign_id, update_data)
+                                if result:
+                                    st.rerun()
                     
                     with col2:
-                        if st.button(f"🔄 Duplicate", key=f"duplicate_btn_{campaign_prefix}"):
-                            st.session_state.duplicate_campaign = campaign
-                            st.info("💡 Switch to 'Create Campaign' tab to see the duplicated template.")
-                    
-                    with col3:
-                        if st.button(f"📤 Export", key=f"export_btn_{campaign_prefix}"):
-                            campaign_export_data = f"""Campaign Export
+                        if st.form_submit_button("🗑️ Delete Campaign", type="secondary"):
+                            ui_flags.set(f'delete_campaign_{campaign_prefix}', True)
+                
+                # Campaign actions
+                st.markdown("### 🔧 Campaign Actions")
+                col1, col2, col3, col4 = st.columns(4)
+                
+                with col1:
+                    if st.button(f"📊 Refresh Stats", key=f"stats_btn_{campaign_prefix}"):
+                        stats = get_campaign_stats_loader().load(api_client, [campaign_id], force=True)[campaign_id]
+                    if stats:
+                        st.write("**📈 Campaign Statistics:**")
+                        st.write(f"• Total Sent: {stats['total_sent']}")
+                        st.write(f"• Delivered: {stats['delivered']}")
+                        st.write(f"• Failed: {stats['failed']}")
+                        st.write(f"• Delivery Rate: {stats['delivery_rate']:.1f}%")
+                    else:
+                        st.caption("📊 Stats unavailable")
+                
+                with col2:
+                    if st.button(f"🔄 Duplicate", key=f"duplicate_btn_{campaign_prefix}"):
+                        st.session_state.duplicate_campaign = campaign
+                        st.info("💡 Switch to 'Create Campaign' tab to see the duplicated template.")
+                
+                with col3:
+                    if st.button(f"📤 Export", key=f"export_btn_{campaign_prefix}"):
+                        campaign_export_data = f"""Campaign Export
 Name: {campaign['name']}
 Status: {campaign['status']}
 Audience Type: {campaign.get('audience_type', 'All')}
@@ -272,57 +520,98 @@ Created By: {campaign.get('created_by', 'Unknown')}
 Message Template:
 {campaign['message_template']}
 """
-                            st.download_button(
-                                label="💾 Download",
-                                data=campaign_export_data,
-                                file_name=f"{campaign['name']}_campaign.txt",
-                                mime="text/plain",
-                                key=f"download_btn_{campaign_prefix}"
-                            )
+                        st.download_button(
+                            label="💾 Download",
+                            data=campaign_export_data,
+                            file_name=f"{campaign['name']}_campaign.txt",
+                            mime="text/plain",
+                            key=f"download_btn_{campaign_prefix}"
+                        )
+                
+                with col4:
+                    action = {"active": "pause", "paused": "resume"}.get(campaign['status'])
+                    if action and st.button(bulk_labels[action], key=f"{action}_btn_{campaign_prefix}"):
+                        result = bulk_transition(api_client, [campaign], action, cache=get_campaign_cache())[0]
+                        if result["result"] == "updated":
+                            st.rerun()
+                        st.error(f"❌ {result['error']}")
+                
+                # Scheduled launches of this campaign
+                st.markdown("### ⏰ Schedule Launch")
+                col1, col2, col3, col4, col5 = st.columns([2, 2, 2, 2, 1])
+                
+                with col3:
+                    timezone = st.selectbox("Time Zone", SCHEDULE_TIMEZONES, key=f"schedule_tz_{campaign_prefix}")
+                
+                # Date and time are wall-clock values in the chosen zone, not the server's
+                default_run = datetime.now(ZoneInfo(timezone)) + timedelta(hours=1)
+                
+                with col1:
+                    run_date = st.date_input("Date", value=default_run.date(), key=f"schedule_date_{campaign_prefix}")
+                
+                with col2:
+                    run_time = st.time_input("Time", value=default_run.time().replace(second=0, microsecond=0), key=f"schedule_time_{campaign_prefix}")
+                
+                with col4:
+                    recurrence = st.selectbox(
+                        "Repeat",
+                        available_recurrences(),
+                        format_func=str.title,
+                        help="Repeating launches need messages sent from this app (DELIVERY_ADAPTER)",
+                        key=f"schedule_repeat_{campaign_prefix}"
+                    )
+                
+                with col5:
+                    st.write("")
+                    schedule_clicked = st.button("⏰ Schedule", key=f"schedule_btn_{campaign_prefix}", use_container_width=True)
+                
+                if schedule_clicked:
+                    run_at = schedule_timestamp(run_date, run_time, timezone)
+                    if run_at <= time.time():
+                        st.error(f"❌ {format_run_at(run_at, timezone)} has already passed. Pick a later time.")
+                    else:
+                        scheduler.schedule(
+                            campaign_id,
+                            run_at,
+                            recurrence=recurrence,
+                            label=campaign['name'],
+                            created_by=auth_component.get_user_email(),
+                            timezone=timezone
+                        )
+                        st.success(f"✅ Scheduled for {format_run_at(run_at, timezone)}")
+                
+                for item in scheduler.upcoming(limit=10, campaign_id=campaign_id):
+                    col1, col2 = st.columns([4, 1])
                     
-                    with col4:
-                        if campaign['status'] == 'active':
-                            if st.button(f"⏸️ Pause", key=f"pause_btn_{campaign_prefix}"):
-                                update_data = {
-                                    "name": campaign['name'],
-                                    "message_template": campaign['message_template'],
-                                    "audience_type": campaign.get('audience_type'),
-                                    "status": "paused"
-                                }
-                                result = api_client.update_campaign(campaign_id, update_data)
-                                if result:
-                                    st.rerun()
-                        elif campaign['status'] == 'paused':
-                            if st.button(f"▶️ Resume", key=f"resume_btn_{campaign_prefix}"):
-                                update_data = {
-                                    "name": campaign['name'],
-                                    "message_template": campaign['message_template'],
-                                    "audience_type": campaign.get('audience_type'),
-                                    "status": "active"
-                                }
-                                result = api_client.update_campaign(campaign_id, update_data)
-                                if result:
-                                    st.rerun()
+                    with col1:
+                        st.write(f"⏰ {format_run_at(item['run_at'], item.get('timezone'))} · {item['recurrence'].title()}")
                     
-                    # Delete campaign confirmation
-                    if st.session_state.get(f'delete_campaign_{campaign_prefix}', False):
-                        st.markdown("---")
-                        st.error(f"⚠️ **Confirm Deletion of '{campaign['name']}'**")
-                        st.write("This will permanently delete this campaign. This action cannot be undone.")
-                        
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            if st.button(f"🗑️ Yes, Delete Campaign", key=f"confirm_delete_btn_{campaign_prefix}", type="primary"):
-                                result = api_client.delete_campaign(campaign_id)
-                                if result:
-                                    st.session_state[f'delete_campaign_{campaign_prefix}'] = False
-                                    st.rerun()
-                        
-                        with col2:
-                            if st.button(f"❌ Cancel", key=f"cancel_delete_btn_{campaign_prefix}"):
-                                st.session_state[f'delete_campaign_{campaign_prefix}'] = False
+                    with col2:
+                        if st.button("❌ Cancel", key=f"unschedule_{item['id']}"):
+                            scheduler.cancel(item['id'])
+                            st.rerun()
+                
+                # Delete campaign confirmation
+                if ui_flags.get(f'delete_campaign_{campaign_prefix}', False):
+                    st.markdown("---")
+                    st.error(f"⚠️ **Confirm Deletion of '{campaign['name']}'**")
+                    st.write("This will permanently delete this campaign. This action cannot be undone.")
+                    
+                    col1, col2 = st.columns(2)
+                    
+                    with col1:
+                        if st.button(f"🗑️ Yes, Delete Campaign", key=f"confirm_delete_btn_{campaign_prefix}", type="primary"):
+                            result = api_client.delete_campaign(campaign_id)
+                            if result:
+                                # Its launches would otherwise keep firing against a missing campaign
+                                scheduler.cancel_campaign(campaign_id)
+                                ui_flags.delete(f'delete_campaign_{campaign_prefix}')
                                 st.rerun()
+                    
+                    with col2:
+                        if st.button(f"❌ Cancel", key=f"cancel_delete_btn_{campaign_prefix}"):
+                            ui_flags.delete(f'delete_campaign_{campaign_prefix}')
+                            st.rerun()
         
         else:
             st.info("📄 No campaigns found. Create your first campaign using the 'Create Campaign' tab.")
@@ -330,6 +619,162 @@ Message Template:
     except Exception as e:
         st.error(f"Failed to load campaigns: {str(e)}")
 
+with tab3:
+    st.header("🔀 Audience Overlap")
+    st.markdown("See which customers several campaigns would reach, before they get the same offer twice.")
+    
+    # Campaigns saved with only an audience type are compared through equivalent rules
+    segments = {f"{c['name']} (#{c['id']})": campaign_rules(c) for c in campaigns}
+    segments = {name: rules for name, rules in segments.items() if rules is not None}
+    if st.session_state.get("segment_rules"):
+        segments["✏️ Draft segment (Campaign Creator)"] = {
+            "logic": st.session_state.get("logic_operator", "AND"),
+            "rules": st.session_state.segment_rules
+        }
+    
+    selected = st.multiselect(
+        "Campaigns to compare:",
+        list(segments),
+        default=list(segments)[:10],
+        key="overlap_campaigns"
+    )
+    
+    if len(selected) < 2:
+        st.info("📄 Select at least two campaigns to compare their audiences.")
+    else:
+        engine = get_segment_engine(api_client)
+        
+        if not len(engine):
+            st.warning("⚠️ No customer data available to compare audiences.")
+        else:
+            result = segment_overlap(engine, {name: segments[name] for name in selected})
+            names, matrix = result["names"], result["matrix"]
+            summary = result["summary"]
+            
+            col1, col2, col3, col4 = st.columns(4)
+            
+            with col1:
+                st.metric("Unique Customers Reached", f"{summary['unique']:,}")
+            
+            with col2:
+                st.metric("In 2+ Campaigns", f"{summary['overlapping']:,}")
+            
+            with col3:
+                st.metric("Total Messages", f"{summary['total_sends']:,}")
+            
+            with col4:
+                st.metric("Duplicate Messages", f"{summary['total_sends'] - summary['unique']:,}")
+            
+            st.caption(f"⚡ Compared {len(names)} audiences over {len(engine):,} customers in {result['elapsed_ms']:.0f} ms")
+            
+            if result["skipped"]:
+                st.warning(f"⚠️ Could not evaluate: {', '.join(result['skipped'])}")
+            
+            if len(names) >= 2:
+                # Share of each row's audience also targeted by the column's campaign
+                sizes = np.diag(matrix)
+                shares = matrix / np.maximum(sizes, 1)[:, None]
+                
+                st.markdown("#### 📊 Overlap Matrix")
+                st.caption("Each cell shows the share of the row campaign's audience that the column campaign also targets.")
+                st.dataframe(
+                    pd.DataFrame(shares, index=names, columns=names).style.format("{:.0%}"),
+                    use_container_width=True
+                )
+                
+                # Most overlapping pairs
+                pairs = []
+                for i in range(len(names)):
+                    for j in range(i + 1, len(names)):
+                        union = sizes[i] + sizes[j] - matrix[i, j]
+                        pairs.append({
+                            "Campaign A": names[i],
+                            "Campaign B": names[j],
+                            "Shared": int(matrix[i, j]),
+                            "Only A": int(sizes[i] - matrix[i, j]),
+                            "Only B": int(sizes[j] - matrix[i, j]),
+                            "Jaccard": matrix[i, j] / union if union else 0.0,
+                        })
+                pairs.sort(key=lambda pair: pair["Shared"], reverse=True)
+                
+                st.markdown("#### 🔝 Most Overlapping Pairs")
+                st.dataframe(
+                    pd.DataFrame(pairs[:10]).style.format({"Jaccard": "{:.0%}"}),
+                    use_container_width=True,
+                    hide_index=True
+                )
+                
+                # Drill into one pair
+                st.markdown("#### 🔍 Compare Two Audiences")
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    a = st.selectbox("Campaign A:", range(len(names)), format_func=lambda i: names[i], key="overlap_a")
+                
+                with col2:
+                    b = st.selectbox("Campaign B:", range(len(names)), index=1, format_func=lambda i: names[i], key="overlap_b")
+                
+                diff = audience_diff(result["bitmaps"][a], result["bitmaps"][b])
+                
+                col1, col2, col3 = st.columns(3)
+                
+                with col1:
+                    st.metric("Only A", f"{diff['only_a'].count():,}")
+                
+                with col2:
+                    st.metric("Both", f"{diff['both'].count():,}")
+                
+                with col3:
+                    st.metric("Only B", f"{diff['only_b'].count():,}")
+                
+                shared_sample = [engine.table[int(i)] for i in diff["both"].first(5)]
+                if shared_sample:
+                    st.markdown("**👥 Customers in both:**")
+                    for customer in shared_sample:
+                        st.write(f"👤 {customer['name']} - {customer.get('email') or ''}")
+
+with tab4:
+    st.header("⏰ Scheduled Launches")
+    st.markdown("Campaigns set to launch later or on a recurrence. Open a campaign under Campaign Management to schedule it.")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.metric("Scheduled Launches", f"{len(scheduler):,}")
+    
+    with col2:
+        running = get_job_manager().jobs(kind="scheduled_launch", active=True)
+        st.metric("Launching Now", len(running))
+    
+    upcoming = scheduler.upcoming(limit=50)
+    if upcoming:
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    "Campaign": item['label'],
+                    "Next Launch": format_run_at(item['run_at'], item.get('timezone')),
+                    "Repeat": item['recurrence'].title(),
+                    "Last Launch": format_run_at(item['last_run_at'], item.get('timezone')) if item['last_run_at'] else "Never",
+                    "Scheduled By": item.get('created_by') or "Unknown",
+                }
+                for item in upcoming
+            ]),
+            hide_index=True,
+            use_container_width=True
+        )
+        if len(scheduler) > len(upcoming):
+            st.caption(f"Showing the next {len(upcoming)} of {len(scheduler):,} scheduled launches")
+    else:
+        st.info("📄 Nothing scheduled yet.")
+    
+    # Recent scheduled launches with their progress
+    recent = get_job_manager().jobs(kind="scheduled_launch")[:10]
+    if recent:
+        st.markdown("### 📤 Recent Launches")
+        for job in recent:
+            snapshot = job.snapshot()
+            st.progress(snapshot['progress'], text=f"{snapshot['label']} · {snapshot['status']} · {snapshot['message'] or snapshot['error'] or ''}")
+
 # Footer
 st.markdown("---")
 st.markdown("💡 **Tip:** All campaigns are saved to the database with full edit/delete capabilities. Changes take effect immediately.")
@@ -7,6 +7,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 
 from utils.api_client import APIClient
 from components.auth_component import AuthComponent
+from utils.helpers import CUSTOMER_TIERS
+from utils.data_store import get_data_store
+from utils.analytics import SPEND_BUCKETS, get_customer_analytics
+from utils.revenue_cube import get_revenue_cube
 
 st.set_page_config(page_title="Analytics - Mini CRM", page_icon="📈", layout="wide")
 
@@ -118,34 +122,92 @@ try:
         st.markdown("## 👥 Customer Insights")
         
         try:
-            customers = api_client.get_customers()
-            if customers:
+            # Buckets, tiers and top spenders come from one pass, memoized per data version
+            insights = get_customer_analytics(api_client)
+            if insights["customers"]:
                 # Customer spend distribution
-                high_spend = len([c for c in customers if c['total_spend'] > 50000])
-                medium_spend = len([c for c in customers if 10000 < c['total_spend'] <= 50000])
-                low_spend = len([c for c in customers if c['total_spend'] <= 10000])
+                bucket_help = {
+                    "High": "Customers with >₹50,000 spend",
+                    "Medium": "Customers with ₹10,000-₹50,000 spend",
+                    "Low": "Customers with <₹10,000 spend",
+                }
                 
+                for col, (bucket, emoji, _) in zip(st.columns(len(SPEND_BUCKETS)), reversed(SPEND_BUCKETS)):
+                    with col:
+                        st.metric(f"{emoji} {bucket} Spenders", insights["spend_buckets"][bucket], help=bucket_help[bucket])
+                
+                # Customer tiers
+                st.markdown("### 🏅 Customer Tiers")
+                tier_counts = insights["tiers"]
+                
+                for col, (tier, emoji, _) in zip(st.columns(len(CUSTOMER_TIERS)), reversed(CUSTOMER_TIERS)):
+                    with col:
+                        st.metric(f"{emoji} {tier}", tier_counts[tier])
+                
+                # Top customers
+                st.markdown("### 🌟 Top Customers by Revenue")
+                
+                for i, customer in enumerate(insights["top_customers"]):
+                    st.write(f"**{i+1}. {customer['name']}** - ₹{customer['total_spend'] or 0:,.0f} ({customer['total_orders']} orders)")
+            
+        except Exception as e:
+            st.warning(f"Could not load customer insights: {str(e)}")
+        
+        # Revenue drill-down
+        st.markdown("## 💰 Revenue Explorer")
+        
+        try:
+            # Every figure is a lookup in the revenue cube, which order edits keep current
+            cube = get_revenue_cube(api_client)
+            if cube.total()["orders"]:
                 col1, col2, col3 = st.columns(3)
                 
                 with col1:
-                    st.metric("💎 High Spenders", high_spend, help="Customers with >₹50,000 spend")
+                    category = st.selectbox("Product Category", ["All"] + sorted(cube.categories), key="revenue_category")
                 
                 with col2:
-                    st.metric("⭐ Medium Spenders", medium_spend, help="Customers with ₹10,000-₹50,000 spend")
+                    status = st.selectbox("Order Status", ["All"] + sorted(cube.statuses), key="revenue_status")
                 
                 with col3:
-                    st.metric("👤 Low Spenders", low_spend, help="Customers with <₹10,000 spend")
+                    order_range = st.date_input("Ordered Between", value=(), key="revenue_dates")
                 
-                # Top customers
-                st.markdown("### 🌟 Top Customers by Revenue")
+                filters = {
+                    "category": None if category == "All" else category,
+                    "status": None if status == "All" else status,
+                    "start": order_range[0] if len(order_range) == 2 else None,
+                    "end": order_range[1] if len(order_range) == 2 else None,
+                }
+                totals = cube.total(**filters)
                 
-                top_customers = sorted(customers, key=lambda x: x['total_spend'], reverse=True)[:5]
+                col1, col2, col3 = st.columns(3)
+                
+                with col1:
+                    st.metric("💰 Revenue", f"₹{totals['revenue']:,.0f}")
+                
+                with col2:
+                    st.metric("📦 Orders", f"{totals['orders']:,}")
+                
+                with col3:
+                    average = totals["revenue"] / totals["orders"] if totals["orders"] else 0
+                    st.metric("🧾 Average Order", f"₹{average:,.0f}")
                 
-                for i, customer in enumerate(top_customers):
-                    st.write(f"**{i+1}. {customer['name']}** - ₹{customer['total_spend']:,.0f} ({customer['total_orders']} orders)")
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    st.markdown("### 📦 By Category")
+                    st.bar_chart(cube.breakdown("category", **filters).set_index("category")["revenue"])
+                
+                with col2:
+                    st.markdown("### 📋 By Status")
+                    st.bar_chart(cube.breakdown("status", **filters).set_index("status")["revenue"])
+                
+                st.markdown("### 📅 Daily Revenue")
+                st.line_chart(cube.breakdown("day", **filters).set_index("day")["revenue"])
+            else:
+                st.info("💰 No orders to analyze yet.")
             
         except Exception as e:
-            st.warning(f"Could not load customer insights: {str(e)}")
+            st.warning(f"Could not load revenue breakdown: {str(e)}")
     
     else:
         st.warning("⚠️ Analytics data not available. Please ensure the backend is running.")
@@ -157,6 +219,7 @@ except Exception as e:
 # Refresh data
 st.markdown("---")
 if st.button("🔄 Refresh Analytics", use_container_width=True):
+    get_data_store().invalidate()
     st.rerun()
 
 # Tips section
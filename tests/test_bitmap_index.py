@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from utils.bitmap_index import Bitmap, PredicateBitmapCache, popcount_rows
+
+@pytest.fixture
+def masks():
+    rng = np.random.default_rng(5)
+    return rng.random(1003) < 0.3, rng.random(1003) < 0.6
+
+def test_round_trip_and_count(masks):
+    a, _ = masks
+    bitmap = Bitmap.from_mask(a)
+    assert np.array_equal(bitmap.to_mask(), a)
+    assert bitmap.count() == a.sum()
+    assert len(bitmap) == len(a)
+
+def test_set_operations_match_masks(masks):
+    a, b = masks
+    assert np.array_equal((Bitmap.from_mask(a) & Bitmap.from_mask(b)).to_mask(), a & b)
+    assert np.array_equal((Bitmap.from_mask(a) | Bitmap.from_mask(b)).to_mask(), a | b)
+    assert np.array_equal((~Bitmap.from_mask(a)).to_mask(), ~a)
+
+def test_invert_clears_padding_bits():
+    bitmap = ~Bitmap.empty(10)
+    assert bitmap.count() == 10
+    assert Bitmap.full(10).count() == 10
+
+def test_first_rows(masks):
+    a, _ = masks
+    bitmap = Bitmap.from_mask(a)
+    assert np.array_equal(bitmap.first(7), np.flatnonzero(a)[:7])
+    assert len(Bitmap.empty(100).first(5)) == 0
+    assert len(bitmap.first(0)) == 0
+
+def test_popcount_rows():
+    rows = np.array([[0, 1], [3, 0xFFFFFFFFFFFFFFFF]], dtype=np.uint64)
+    assert popcount_rows(rows).tolist() == [1, 66]
+
+def test_cache_evicts_least_recently_used():
+    cache = PredicateBitmapCache(max_bytes=2 * 125)
+    for key in ("a", "b"):
+        cache.put((1, key), Bitmap.empty(1000))
+    cache.get((1, "a"))
+    cache.put((1, "c"), Bitmap.empty(1000))
+
+    assert cache.get((1, "b")) is None
+    assert cache.get((1, "a")) is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+def test_cache_invalidates_one_version():
+    cache = PredicateBitmapCache()
+    cache.put((1, "a"), Bitmap.empty(8))
+    cache.put((2, "a"), Bitmap.empty(8))
+    cache.invalidate(1)
+    assert cache.get((1, "a")) is None
+    assert cache.get((2, "a")) is not None
+    assert cache.stats()["bytes"] == 1
+
+def test_get_or_compute_computes_once():
+    cache = PredicateBitmapCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return np.ones(16, dtype=bool)
+
+    assert cache.get_or_compute("k", compute).count() == 16
+    assert cache.get_or_compute("k", compute).count() == 16
+    assert len(calls) == 1
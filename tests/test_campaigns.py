@@ -0,0 +1,102 @@
+from utils.api_client import APIClient
+from utils.campaigns import CampaignCache, bulk_transition
+
+class FakeClient:
+    def __init__(self, campaigns):
+        self.campaigns = campaigns
+        self.fetches = 0
+        self.failing_ids = set()
+
+    def get_campaigns(self, empty_on_error=True):
+        self.fetches += 1
+        if self.campaigns is None:
+            return [] if empty_on_error else None
+        return self.campaigns
+
+    def update_campaign_status(self, campaign_id, status, campaign=None):
+        return None if campaign_id in self.failing_ids else {"id": campaign_id, "status": status}
+
+def campaigns():
+    return [
+        {"id": 1, "name": "A", "status": "active"},
+        {"id": 2, "name": "B", "status": "paused"},
+        {"id": 3, "name": "C", "status": "active"},
+    ]
+
+def test_list_is_reused_until_invalidated():
+    client = FakeClient(campaigns())
+    cache = CampaignCache()
+    cache.get(client)
+    cache.get(client)
+    assert client.fetches == 1
+
+    cache.invalidate()
+    cache.get(client)
+    assert client.fetches == 2
+
+def test_failed_fetches_keep_the_last_list():
+    client = FakeClient(campaigns())
+    cache = CampaignCache(ttl=0)
+    assert len(cache.get(client)) == 3
+
+    client.campaigns = None
+    assert len(cache.get(client)) == 3
+    # The failure isn't cached, so the next access tries again
+    client.campaigns = campaigns()[:1]
+    assert len(cache.get(client)) == 1
+
+def test_failed_first_fetch_returns_an_empty_list():
+    assert CampaignCache().get(FakeClient(None)) == []
+
+def test_callers_get_copies():
+    client = FakeClient(campaigns())
+    cache = CampaignCache()
+    cache.get(client)[0]["status"] = "changed"
+    assert cache.get(client)[0]["status"] == "active"
+
+def test_bulk_pause_skips_ineligible_and_rolls_back_failures():
+    client = FakeClient(campaigns())
+    client.failing_ids = {3}
+    cache = CampaignCache()
+    cache.get(client)
+
+    results = {result["id"]: result for result in bulk_transition(client, campaigns(), "pause", cache)}
+
+    assert results[1]["result"] == "updated" and results[1]["to"] == "paused"
+    assert results[2]["result"] == "skipped"
+    assert results[3]["result"] == "failed" and results[3]["to"] == "active"
+    assert {c["id"]: c["status"] for c in cache.get(client)} == {1: "paused", 2: "paused", 3: "active"}
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = {"content-type": "application/json"}
+
+    def json(self):
+        return self.body
+
+class FakeSession:
+    def __init__(self, patch_status):
+        self.patch_status = patch_status
+        self.calls = []
+
+    def patch(self, url, **kwargs):
+        self.calls.append("PATCH")
+        return FakeResponse(self.patch_status, {"status": "paused"})
+
+    def put(self, url, **kwargs):
+        self.calls.append("PUT")
+        return FakeResponse(200, {"status": "paused"})
+
+def status_update(patch_status):
+    client = APIClient()
+    client.session = FakeSession(patch_status)
+    result = client.update_campaign_status(1, "paused", campaign={"name": "A", "message_template": "Hi {name}"})
+    return result, client.session.calls
+
+def test_status_updates_fall_back_to_put_only_without_patch_support():
+    assert status_update(200) == ({"status": "paused"}, ["PATCH"])
+    assert status_update(405) == ({"status": "paused"}, ["PATCH", "PUT"])
+    assert status_update(404)[1] == ["PATCH", "PUT"]
+    assert status_update(503) == (None, ["PATCH"])
@@ -0,0 +1,43 @@
+import pytest
+
+from utils.data_store import DataStore
+
+class FakeClient:
+    def __init__(self, customers):
+        self.customers = customers
+
+    def get_customers(self, search=None, silent=False, empty_on_error=True):
+        if self.customers is None:
+            return [] if empty_on_error else None
+        return self.customers
+
+def test_versions_change_only_with_the_contents():
+    client = FakeClient([{"id": 1, "name": "A"}])
+    store = DataStore(ttl=0)
+    store.customers(client)
+    store.customers(client)
+    assert store.version("customers") == 1
+
+    client.customers = [{"id": 1, "name": "B"}]
+    store.customers(client)
+    assert store.version("customers") == 2
+
+def test_listeners_see_each_new_version():
+    loaded = []
+    client = FakeClient([{"id": 1, "name": "A"}])
+    store = DataStore(ttl=0)
+    store.on_load(lambda name, table, version: loaded.append((name, version)))
+    store.customers(client)
+    store.customers(client)
+    assert loaded == [("customers", 1)]
+
+def test_silent_loads_raise_and_keep_the_cached_table():
+    client = FakeClient([{"id": 1, "name": "A"}])
+    store = DataStore(ttl=0)
+    table = store.customers(client)
+
+    client.customers = None
+    with pytest.raises(RuntimeError):
+        store.customers(client, silent=True)
+    assert store.peek("customers") is table
+    assert store.version("customers") == 1
@@ -0,0 +1,149 @@
+import threading
+
+import pytest
+
+from utils.dispatch import (
+    ACCEPTED, DELIVERED, FAILED, APIDeliveryAdapter, CampaignDispatcher, DispatchProgress,
+    StubDeliveryAdapter, TokenBucket, get_delivery_adapter,
+)
+
+def audience(size, phone="+919800000000"):
+    return [{"id": i, "name": f"Asha {i}", "phone": phone, "total_spend": 1000.0} for i in range(size)]
+
+def test_stub_dispatch_counts_every_message():
+    adapter = StubDeliveryAdapter(failure_rate=0.1, latency=0, seed=1)
+    dispatcher = CampaignDispatcher(adapter, rate=100_000, chunk_size=50)
+    snapshots = []
+
+    progress = dispatcher.dispatch("Hi {name}", audience(1000), on_progress=snapshots.append)
+    result = progress.snapshot()
+
+    assert result["total_sent"] == 1000
+    assert result["delivered"] + result["failed"] == 1000
+    assert 0 < result["failed"] < 200
+    assert result["errors"] == {"Vendor rejected message": result["failed"]}
+    assert result["done"] and not result["cancelled"]
+    # Counters only ever grow while the dispatch runs
+    sent = [snapshot["total_sent"] for snapshot in snapshots]
+    assert sent == sorted(sent) and sent[-1] == 1000
+
+def test_stub_fails_messages_without_a_phone():
+    dispatcher = CampaignDispatcher(StubDeliveryAdapter(failure_rate=0, latency=0), rate=100_000)
+    result = dispatcher.dispatch("Hi {name}", audience(20, phone=None)).snapshot()
+    assert result["failed"] == 20
+    assert result["errors"] == {"No phone number": 20}
+
+def test_messages_are_rendered_per_customer():
+    sent = []
+
+    class Recorder(StubDeliveryAdapter):
+        def send(self, messages):
+            sent.extend(messages)
+            return super().send(messages)
+
+    CampaignDispatcher(Recorder(failure_rate=0, latency=0), rate=100_000, chunk_size=3).dispatch("Hi {name}", audience(7))
+    assert sorted(message["body"] for message in sent) == sorted(f"Hi Asha {i}" for i in range(7))
+    assert {message["customer_id"] for message in sent} == set(range(7))
+
+def test_adapter_exceptions_fail_their_chunk_only():
+    class Flaky(StubDeliveryAdapter):
+        def send(self, messages):
+            if messages[0]["customer_id"] == 0:
+                raise RuntimeError("vendor down")
+            return super().send(messages)
+
+    result = CampaignDispatcher(Flaky(failure_rate=0, latency=0), rate=100_000, chunk_size=10).dispatch("Hi", audience(30)).snapshot()
+    assert result["failed"] == 10
+    assert result["delivered"] == 20
+    assert result["errors"] == {"vendor down": 10}
+
+def test_concurrency_stays_bounded():
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    class Counting(StubDeliveryAdapter):
+        def send(self, messages):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            try:
+                return super().send(messages)
+            finally:
+                with lock:
+                    active[0] -= 1
+
+    CampaignDispatcher(Counting(failure_rate=0, latency=0.01), rate=100_000, chunk_size=5, max_workers=3).dispatch("Hi", audience(200))
+    assert 1 <= peak[0] <= 3
+
+def test_cancel_stops_before_the_next_chunk():
+    cancel = threading.Event()
+    dispatcher = CampaignDispatcher(StubDeliveryAdapter(failure_rate=0, latency=0), rate=100_000, chunk_size=10, max_workers=1, cancel=cancel)
+
+    def stop_after_first(snapshot):
+        if snapshot["total_sent"] >= 10:
+            cancel.set()
+
+    result = dispatcher.dispatch("Hi", audience(1000), on_progress=stop_after_first).snapshot()
+    assert result["cancelled"]
+    assert result["total_sent"] < 1000
+
+def test_token_bucket_limits_bursts():
+    bucket = TokenBucket(rate=10, capacity=5)
+    assert bucket.try_acquire(5)
+    assert not bucket.try_acquire(1)
+
+def test_token_bucket_acquire_returns_false_when_cancelled():
+    bucket = TokenBucket(rate=0.001, capacity=1)
+    bucket.try_acquire(1)
+    cancel = threading.Event()
+    cancel.set()
+    assert bucket.acquire(1, cancel=cancel) is False
+
+class FakeClient:
+    base_url = "https://crm.example.com"
+
+    def __init__(self, response):
+        self.response = response
+
+    def send_campaign_messages(self, campaign_id, messages):
+        return self.response
+
+def test_accepted_batches_are_not_counted_as_delivered():
+    adapter = APIDeliveryAdapter(FakeClient({"status": "queued"}), 1)
+    result = CampaignDispatcher(adapter, rate=100_000).dispatch("Hi", audience(10)).snapshot()
+    assert result["accepted"] == 10
+    assert result["delivered"] == 0 and result["failed"] == 0
+
+def test_per_message_results_are_passed_through():
+    results = [{"customer_id": 0, "status": DELIVERED, "error": None}, {"customer_id": 1, "status": FAILED, "error": "Bounced"}]
+    adapter = APIDeliveryAdapter(FakeClient({"results": results}), 1)
+    assert adapter.send([{"customer_id": 0}, {"customer_id": 1}]) == results
+
+def test_failed_requests_fail_the_batch():
+    adapter = APIDeliveryAdapter(FakeClient(None), 1)
+    messages = [{"customer_id": i, "to": "+919800000000", "body": "Hi"} for i in range(3)]
+    assert {result["status"] for result in adapter.send(messages)} == {FAILED}
+
+def test_progress_counts_by_status():
+    progress = DispatchProgress(3)
+    progress.record([
+        {"customer_id": 1, "status": DELIVERED},
+        {"customer_id": 2, "status": ACCEPTED},
+        {"customer_id": 3, "status": FAILED, "error": "Bounced"},
+    ])
+    snapshot = progress.snapshot()
+    assert (snapshot["delivered"], snapshot["accepted"], snapshot["failed"]) == (1, 1, 1)
+    assert progress.failed_ids == [3]
+
+@pytest.mark.parametrize("setting, expected", [
+    (None, type(None)),
+    ("", type(None)),
+    ("stub", StubDeliveryAdapter),
+    ("api", APIDeliveryAdapter),
+])
+def test_client_side_sending_is_opt_in(monkeypatch, setting, expected):
+    if setting is None:
+        monkeypatch.delenv("DELIVERY_ADAPTER", raising=False)
+    else:
+        monkeypatch.setenv("DELIVERY_ADAPTER", setting)
+    assert isinstance(get_delivery_adapter(FakeClient(None), 1), expected)
@@ -0,0 +1,34 @@
+import csv
+import json
+
+from utils.exports import CAMPAIGN_COLUMNS, campaign_record, export_campaigns
+from utils.segment_overlap import AUDIENCE_TYPE_RULES
+
+STORED = {"logic": "AND", "rules": [{"field": "total_spend", "operator": ">", "value": 100}]}
+
+def test_stored_rules_are_exported_as_is():
+    record = campaign_record({"id": 1, "segment_rules": STORED, "audience_type": "High Value Customers"})
+    assert record["segment_rules"] is STORED
+    assert record["derived_rules"] is None
+
+def test_derived_rules_get_their_own_key():
+    record = campaign_record({"id": 1, "audience_type": "All Customers"})
+    assert record["segment_rules"] is None
+    assert record["derived_rules"] == AUDIENCE_TYPE_RULES["All Customers"]
+
+def test_exports_keep_the_two_apart():
+    campaigns = [
+        {"id": 1, "name": "Stored", "segment_rules": STORED},
+        {"id": 2, "name": "Derived", "audience_type": "All Customers"},
+    ]
+
+    with open(export_campaigns(campaigns, "ndjson")) as f:
+        lines = [json.loads(line) for line in f]
+    assert [line["segment_rules"] for line in lines] == [STORED, None]
+    assert [line["derived_rules"] is None for line in lines] == [True, False]
+
+    with open(export_campaigns(campaigns, "csv"), newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == CAMPAIGN_COLUMNS
+    assert json.loads(rows[0]["segment_rules"]) == STORED
+    assert rows[1]["segment_rules"] == ""
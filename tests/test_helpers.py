@@ -0,0 +1,190 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from utils.helpers import (
+    CUSTOMER_STATUSES, CUSTOMER_TIERS, SessionManager, calculate_days_ago, classify_customers, count_customer_statuses,
+    count_customer_tiers, estimate_size, get_customer_status, get_customer_tier, calculate_days_ago_column, format_date, format_date_column,
+    format_datetime, format_datetime_column, format_days_ago, format_days_ago_column, parse_date_column,
+)
+
+def iso(days_ago, suffix="+00:00"):
+    return (datetime.now(timezone.utc) - timedelta(days=days_ago, hours=1)).strftime("%Y-%m-%dT%H:%M:%S") + suffix
+
+# Repeats, missing and unparseable values, offsets and every relative-label range
+DATES = [
+    iso(0), iso(0), iso(1), iso(3, "Z"), iso(10), iso(45), iso(45), iso(400), iso(800),
+    "2024-01-15", "2024-01-15T10:30:00+05:30", None, "", "not a date", "2024-13-45",
+]
+
+def test_date_columns_match_the_per_value_helpers():
+    assert list(format_date_column(DATES)) == [format_date(value) for value in DATES]
+    assert list(format_datetime_column(DATES)) == [format_datetime(value) for value in DATES]
+    assert list(format_days_ago_column(DATES)) == [format_days_ago(value) for value in DATES]
+
+    days = calculate_days_ago_column(DATES)
+    expected = [calculate_days_ago(value) for value in DATES]
+    assert [None if np.isnan(day) else int(day) for day in days] == expected
+
+def test_missing_and_invalid_dates():
+    parsed = parse_date_column([None, "", "not a date", "2024-01-15T10:30:00Z"])
+    assert np.isnat(parsed[:3]).all()
+    assert parsed[3] == np.datetime64("2024-01-15T10:30:00")
+    assert list(format_date_column([None, "", "garbage"])) == ["Never", "Never", "Invalid Date"]
+    assert list(format_days_ago_column([None, "garbage"])) == ["Never", "Never"]
+
+def test_dates_are_normalized_to_utc():
+    assert parse_date_column(["2024-01-15T10:30:00+05:30"])[0] == np.datetime64("2024-01-15T05:00:00")
+
+def baseline_status(customer):
+    """get_customer_status as it was before classification was vectorized"""
+    last_order_days = calculate_days_ago(customer.get('last_order_date'))
+    if not last_order_days:
+        return "New", "🆕", "#17a2b8"
+    elif last_order_days <= 30:
+        return "Active", "🟢", "#28a745"
+    elif last_order_days <= 90:
+        return "At Risk", "🟡", "#ffc107"
+    else:
+        return "Inactive", "🔴", "#dc3545"
+
+def baseline_tier(customer):
+    """get_customer_tier as it was before classification was vectorized"""
+    total_spend = customer.get('total_spend', 0)
+    total_orders = customer.get('total_orders', 0)
+    if total_spend >= 50000 or total_orders >= 10:
+        return "VIP", "💎", "#8e24aa"
+    elif total_spend >= 20000 or total_orders >= 5:
+        return "Premium", "⭐", "#ff9800"
+    elif total_spend >= 5000 or total_orders >= 2:
+        return "Regular", "👤", "#2196f3"
+    else:
+        return "New", "🆕", "#9e9e9e"
+
+def classified_customers():
+    # Thresholds and their neighbours, plus missing, invalid and future dates
+    customers = []
+    for days in (None, "", "garbage", -2, 0, 1, 29, 30, 31, 89, 90, 91, 365):
+        for spend, orders in ((0, 0), (4999, 1), (5000, 0), (0, 2), (19999.5, 4), (20000, 5), (49999, 9), (50000, 0), (0, 10)):
+            last_order = days if days in (None, "", "garbage") else iso(days)
+            customers.append({"last_order_date": last_order, "total_spend": spend, "total_orders": orders})
+    return customers
+
+def test_classification_matches_the_baseline_row_by_row():
+    customers = classified_customers()
+    status_codes, tier_codes = classify_customers(customers)
+
+    assert [CUSTOMER_STATUSES[code] for code in status_codes] == [baseline_status(c) for c in customers]
+    assert [CUSTOMER_TIERS[code] for code in tier_codes] == [baseline_tier(c) for c in customers]
+    assert [get_customer_status(c) for c in customers] == [baseline_status(c) for c in customers]
+    assert [get_customer_tier(c) for c in customers] == [baseline_tier(c) for c in customers]
+
+def test_counts_follow_the_table_order():
+    customers = classified_customers()
+    tiers = count_customer_tiers(customers)
+    assert list(tiers) == [label for label, _, _ in CUSTOMER_TIERS]
+    assert tiers == {label: sum(baseline_tier(c)[0] == label for c in customers) for label in tiers}
+
+    statuses = count_customer_statuses(customers)
+    assert statuses == {label: sum(baseline_status(c)[0] == label for c in customers) for label in statuses}
+
+def test_missing_spend_and_orders_count_as_zero():
+    _, tier_codes = classify_customers([{"total_spend": None, "total_orders": None}, {}])
+    assert list(tier_codes) == [0, 0]
+
+def test_custom_thresholds():
+    customer = {"last_order_date": iso(40), "total_spend": 6000, "total_orders": 0}
+    assert get_customer_status(customer, {"active": 60})[0] == "Active"
+    assert get_customer_tier(customer, {"Regular": (10000, 2)})[0] == "New"
+
+def test_parsed_columns_pass_through():
+    parsed = parse_date_column(["2024-01-15", None])
+    assert np.array_equal(parse_date_column(parsed), parsed, equal_nan=True)
+
+def two_tables():
+    from utils.helpers import render_paged_table
+
+    rows = [{"id": i, "name": f"Customer {i}"} for i in range(60)]
+    render_paged_table(rows, key="first")
+    render_paged_table(rows[:5], key="second")
+
+def test_keyed_tables_page_independently():
+    app = AppTest.from_function(two_tables).run()
+    assert not app.exception
+    app.number_input(key="first_page").set_value(3).run()
+
+    assert not app.exception
+    assert [caption.value for caption in app.caption] == [
+        "Showing 51-60 of 60 rows (page 3 of 3)",
+        "Showing 1-5 of 5 rows (page 1 of 1)",
+    ]
+
+@pytest.fixture
+def session():
+    st.session_state.clear()
+    yield st.session_state
+    st.session_state.clear()
+
+def test_scopes_are_namespaced(session):
+    flags, other = SessionManager.scope("flags"), SessionManager.scope("other")
+    flags.set("open", True)
+    assert flags.get("open") is True
+    assert other.get("open") is None
+    assert "open" not in session
+
+def test_least_recently_used_keys_are_evicted(session):
+    scope = SessionManager.scope("lru", max_keys=2)
+    scope.set("a", 1)
+    scope.set("b", 2)
+    scope.get("a")
+    scope.set("c", 3)
+    assert scope.keys() == ["a", "c"]
+
+def test_idle_keys_expire(session):
+    scope = SessionManager.scope("ttl", ttl=60)
+    scope.set("old", 1)
+    scope.set("fresh", 2)
+    scope._entries["old"]["accessed"] -= 120
+
+    assert not scope.has("old")
+    assert scope.get("old", "gone") == "gone"
+    scope.evict()
+    assert scope.keys() == ["fresh"]
+
+def test_byte_limits_evict_oldest_first(session):
+    scope = SessionManager.scope("bytes", max_bytes=50_000)
+    for key in "abc":
+        scope.set(key, "x" * 20_000)
+    assert scope.keys() == ["b", "c"]
+    assert scope.size_bytes() <= 50_000
+
+def test_session_limit_spans_every_scope(session):
+    first, second = SessionManager.scope("first"), SessionManager.scope("second")
+    first.set("old", "x" * 20_000)
+    second.set("new", "x" * 20_000)
+
+    assert SessionManager.enforce_memory_limit(30_000) <= 30_000
+    assert not first.has("old")
+    assert second.has("new")
+
+def test_cleared_and_deleted_keys_are_gone(session):
+    scope = SessionManager.scope("cleanup")
+    scope.set("a", 1)
+    scope.set("b", 2)
+    scope.delete("a")
+    assert scope.keys() == ["b"]
+
+    scope.clear()
+    assert len(scope) == 0
+    assert SessionManager.stats()["scopes"]["cleanup"] == {"keys": 0, "bytes": 0}
+
+def test_estimate_size_counts_buffers_once():
+    array = np.zeros(10_000)
+    assert estimate_size(array) < 2 * array.nbytes
+    assert estimate_size(pd.Series(array)) < 2 * array.nbytes
+    # Shared objects are only counted the first time they're seen
+    assert estimate_size([array, array]) < 2 * array.nbytes
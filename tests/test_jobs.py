@@ -0,0 +1,50 @@
+import threading
+
+from utils.jobs import CANCELLED, FAILED, SUCCEEDED, JobCancelled, JobManager
+
+def test_jobs_report_their_result():
+    job = JobManager().submit("sum", lambda job, a, b: a + b, 2, 3)
+    assert job.wait(5) == 5
+    assert job.status == SUCCEEDED and job.progress == 1.0
+
+def test_failures_are_kept_on_the_job():
+    def fail(job):
+        raise RuntimeError("boom")
+
+    job = JobManager().submit("fail", fail)
+    job.wait(5)
+    assert job.status == FAILED and job.error == "boom"
+
+def test_cancelled_jobs_stop():
+    started = threading.Event()
+
+    def work(job):
+        started.set()
+        job.cancel_event.wait(5)
+        raise JobCancelled()
+
+    jobs = JobManager()
+    job = jobs.submit("work", work)
+    started.wait(5)
+    assert jobs.cancel(job.id)
+    job.wait(5)
+    assert job.status == CANCELLED
+
+def test_long_jobs_dont_starve_interactive_ones():
+    release = threading.Event()
+    jobs = JobManager(max_workers=2, interactive_workers=1)
+    long_jobs = [jobs.submit("export", lambda job: release.wait(5)) for _ in range(4)]
+
+    quick = jobs.submit("ai_messages", lambda job: "done", interactive=True)
+    assert quick.wait(2) == "done"
+
+    release.set()
+    for job in long_jobs:
+        job.wait(5)
+
+def test_jobs_filter_by_kind_and_activity():
+    jobs = JobManager()
+    done = jobs.submit("a", lambda job: None)
+    done.wait(5)
+    assert jobs.jobs(kind="a", active=False) == [done]
+    assert jobs.jobs(kind="b") == []
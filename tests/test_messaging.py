@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from utils.messaging import (
+    GSM7, SMS_COST_PER_SEGMENT, UCS2, delivery_estimate, message_encoding, message_stats, message_units, personalize,
+    segment_count, sms_segments,
+)
+from utils.records import CustomerTable
+
+CUSTOMERS = [
+    {"name": "Asha", "total_spend": 12500, "total_orders": 4},
+    {"name": "Zoë", "total_spend": None, "total_orders": 0},
+    {"name": "राहुल", "total_spend": 999999, "total_orders": 12},
+    {"name": None, "total_spend": 50, "total_orders": 1},
+    {"name": "A" * 200, "total_spend": 1, "total_orders": 1},
+]
+
+TEMPLATE = "Hi {name}, you've spent {total_spend} over {total_orders} orders. Use code {{SAVE10}} today!"
+
+def test_encoding_and_units():
+    assert message_encoding("Hello {name}") == GSM7
+    assert message_encoding("Hello 😀") == UCS2
+    # Extension characters take two septets, emoji a surrogate pair
+    assert message_units("[€]", GSM7) == 6
+    assert message_units("😀", UCS2) == 2
+
+@pytest.mark.parametrize("units, encoding, segments", [
+    (0, GSM7, 0), (160, GSM7, 1), (161, GSM7, 2), (306, GSM7, 2), (307, GSM7, 3),
+    (70, UCS2, 1), (71, UCS2, 2), (134, UCS2, 2), (135, UCS2, 3),
+])
+def test_segment_boundaries(units, encoding, segments):
+    assert segment_count(units, encoding) == segments
+
+def test_stats_match_rendering_every_message():
+    messages = list(personalize(TEMPLATE, CUSTOMERS))
+    stats = message_stats(TEMPLATE, CUSTOMERS, cost_per_segment=0.5)
+
+    expected = [sms_segments(message) for message in messages]
+    assert stats["messages"] == len(CUSTOMERS)
+    assert list(stats["lengths"]) == [len(message) for message in messages]
+    assert list(stats["units"]) == [units for _, units, _ in expected]
+    assert list(stats["segments"]) == [segments for _, _, segments in expected]
+    assert stats["encodings"] == {
+        GSM7: sum(encoding == GSM7 for encoding, _, _ in expected),
+        UCS2: sum(encoding == UCS2 for encoding, _, _ in expected),
+    }
+    assert stats["cost"] == sum(segments for _, _, segments in expected) * 0.5
+    assert stats["longest_message"] == max(messages, key=len)
+
+def test_stats_accept_record_tables():
+    table = CustomerTable.from_records([{"id": i + 1, **customer} for i, customer in enumerate(CUSTOMERS)])
+    stats = message_stats(TEMPLATE, table)
+    assert list(stats["segments"]) == list(message_stats(TEMPLATE, CUSTOMERS)["segments"])
+
+def test_empty_audiences_cost_nothing():
+    stats = message_stats(TEMPLATE, [])
+    assert stats["messages"] == stats["total_segments"] == 0
+    assert stats["longest_message"] is None
+
+def test_estimate_summarizes_the_whole_audience():
+    stats = message_stats(TEMPLATE, CUSTOMERS)
+    estimate = delivery_estimate(TEMPLATE, CUSTOMERS)
+
+    assert estimate["messages"] == estimate["sample_size"] == len(CUSTOMERS)
+    assert estimate["total_segments"] == stats["total_segments"]
+    assert estimate["segment_counts"] == stats["segment_counts"]
+    assert estimate["lengths"] == (stats["lengths"].min(), stats["lengths"].max(), float(np.median(stats["lengths"])))
+
+def test_estimate_scales_a_sample_up():
+    estimate = delivery_estimate("Hi {name}", CUSTOMERS[:2], total=1000)
+    assert estimate["messages"] == 1000 and estimate["sample_size"] == 2
+    # Asha fits GSM-7 and Zoë doesn't, so half the audience is estimated to need UCS-2
+    assert estimate["encodings"] == {GSM7: 500, UCS2: 500}
+    assert estimate["total_segments"] == 1000
+    assert estimate["cost"] == 1000 * SMS_COST_PER_SEGMENT
+
+def test_personalize_renders_in_chunks():
+    assert list(personalize("Hi {name}", CUSTOMERS, chunk_size=2))[:2] == ["Hi Asha", "Hi Zoë"]
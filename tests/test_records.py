@@ -0,0 +1,57 @@
+import numpy as np
+
+from utils.records import CustomerTable, OrderTable, RecordView, memory_report
+
+CUSTOMERS = [
+    {"id": 1, "name": "Asha", "email": "asha@example.com", "phone": None, "total_spend": 12500.0,
+     "total_orders": 4, "last_order_date": "2024-01-15T10:30:00+00:00", "is_active": True,
+     "created_at": "2023-06-01T09:00:00+00:00", "segment": "gold"},
+    {"id": 2, "name": "Ravi", "email": "ravi@example.com", "phone": "+91 98765 43210", "total_spend": None,
+     "total_orders": 0, "last_order_date": None, "is_active": False, "created_at": "2023-07-01T09:00:00+00:00"},
+]
+
+def test_rows_read_back_as_the_api_returned_them():
+    table = CustomerTable.from_records(CUSTOMERS)
+    assert len(table) == 2
+    assert isinstance(table[0], RecordView)
+    for record, row in zip(CUSTOMERS, table):
+        assert {field: row[field] for field in record} == record
+    # Fields the schema doesn't know are kept
+    assert table[0]["segment"] == "gold"
+    assert table[1]["segment"] is None
+
+def test_columns_are_typed_arrays():
+    table = CustomerTable.from_records(CUSTOMERS)
+    assert table["total_orders"].dtype == np.int64
+    assert np.isnan(table["total_spend"][1])
+    assert np.isnat(table["last_order_date"][1])
+
+def test_negative_indices_slices_and_take():
+    table = CustomerTable.from_records(CUSTOMERS)
+    assert table[-1]["id"] == 2
+    assert [row["id"] for row in table[1:]] == [2]
+    assert table.take([1, 0])[0]["name"] == "Ravi"
+
+def test_categories_decode_missing_values():
+    orders = OrderTable.from_records([
+        {"id": 1, "status": "completed", "product_category": "Books"},
+        {"id": 2, "status": None, "product_category": "Books"},
+    ])
+    assert list(orders["status"]) == ["completed", None]
+    assert list(orders.codes("product_category")) == [0, 0]
+    assert orders.to_frame()["status"].isna().tolist() == [False, True]
+
+def test_fingerprint_tracks_contents():
+    table = CustomerTable.from_records(CUSTOMERS)
+    assert table.fingerprint() == CustomerTable.from_records(CUSTOMERS).fingerprint()
+    changed = [dict(CUSTOMERS[0], total_orders=5), CUSTOMERS[1]]
+    assert table.fingerprint() != CustomerTable.from_records(changed).fingerprint()
+
+def test_tables_are_smaller_than_dicts():
+    records = [dict(CUSTOMERS[0], id=i, name=f"Customer {i}") for i in range(2000)]
+    assert memory_report(records)["savings_ratio"] > 1
+
+def test_empty_tables():
+    table = CustomerTable.from_records(None)
+    assert len(table) == 0
+    assert table.to_dicts() == []
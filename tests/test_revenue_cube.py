@@ -0,0 +1,158 @@
+import random
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from utils.records import OrderTable
+from utils.revenue_cube import DEFAULT_CATEGORY, DEFAULT_STATUS, RevenueCube, RevenueCubeStore
+
+CATEGORIES = ["Electronics", "Fashion", "Books", None]
+STATUSES = ["completed", "pending", "cancelled", None]
+
+def make_order(rng, order_id):
+    day = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T10:00:00"
+    return {
+        "id": order_id,
+        "customer_id": rng.randint(1, 50),
+        "order_value": rng.choice([rng.uniform(1, 5000), None]),
+        "product_category": rng.choice(CATEGORIES),
+        "status": rng.choice(STATUSES),
+        "order_date": rng.choice([day, day, None]),
+        "created_at": day,
+    }
+
+def brute_force(orders, category=None, status=None, start=None, end=None):
+    revenue = count = 0
+    for order in orders.values():
+        day = pd.Timestamp(order["order_date"] or order["created_at"]).date()
+        if category and (order["product_category"] or DEFAULT_CATEGORY) != category:
+            continue
+        if status and (order["status"] or DEFAULT_STATUS) != status:
+            continue
+        if (start and day < start) or (end and day > end):
+            continue
+        revenue += order["order_value"] or 0.0
+        count += 1
+    return revenue, count
+
+QUERIES = [
+    {},
+    {"category": "Books"},
+    {"category": DEFAULT_CATEGORY, "status": DEFAULT_STATUS},
+    {"status": "pending", "start": date(2024, 3, 1), "end": date(2024, 6, 30)},
+    {"start": date(2023, 1, 1), "end": date(2030, 1, 1)},
+    {"category": "Toys"},
+]
+
+def assert_matches(cube, orders):
+    for query in QUERIES:
+        revenue, count = brute_force(orders, **query)
+        total = cube.total(**query)
+        assert total["orders"] == count, query
+        assert total["revenue"] == pytest.approx(revenue), query
+        for by in ("category", "status", "day"):
+            breakdown = cube.breakdown(by, **query)
+            assert breakdown["orders"].sum() == count, (query, by)
+            assert breakdown["revenue"].sum() == pytest.approx(revenue), (query, by)
+
+@pytest.fixture
+def orders():
+    rng = random.Random(1)
+    return {i: make_order(rng, i) for i in range(1, 2001)}
+
+def test_build_matches_brute_force(orders):
+    cube = RevenueCube.build(OrderTable.from_records(list(orders.values())))
+    assert_matches(cube, orders)
+
+def test_mutations_match_a_rebuild(orders):
+    rng = random.Random(2)
+    cube = RevenueCube.build(OrderTable.from_records(list(orders.values())))
+
+    for _ in range(1000):
+        roll = rng.random()
+        if roll < 0.4:
+            order = make_order(rng, max(orders) + 1)
+            orders[order["id"]] = order
+            cube.apply(order)
+        elif roll < 0.8:
+            order_id = rng.choice(list(orders))
+            # Partial updates, like the order edit form sends
+            patch = {"order_value": rng.uniform(1, 9000), "status": rng.choice(["completed", "refunded"]), "product_category": rng.choice(["Books", "Garden"])}
+            orders[order_id] = {**orders[order_id], **patch}
+            cube.apply({**patch, "id": order_id})
+        else:
+            order_id = rng.choice(list(orders))
+            del orders[order_id]
+            cube.remove(order_id)
+
+    assert_matches(cube, orders)
+    rebuilt = RevenueCube.build(OrderTable.from_records(list(orders.values())))
+    assert cube.total() == pytest.approx(rebuilt.total())
+
+@pytest.mark.parametrize("day", ["2019-05-05T00:00:00", "2030-05-05T00:00:00"])
+def test_orders_outside_the_day_range_grow_the_cube(orders, day):
+    cube = RevenueCube.build(OrderTable.from_records(list(orders.values())))
+    order = {**make_order(random.Random(3), 10_000), "order_date": day}
+    orders[order["id"]] = order
+    cube.apply(order)
+
+    assert_matches(cube, orders)
+    assert cube.total(start=day[:10], end=day[:10])["orders"] == 1
+
+def test_updates_keep_fields_they_dont_send(orders):
+    cube = RevenueCube.build(OrderTable.from_records(list(orders.values())))
+    order = orders[1]
+    cube.apply({"id": 1, "status": "refunded"})
+
+    category = order["product_category"] or DEFAULT_CATEGORY
+    assert cube.total(category=category, status="refunded") == {"revenue": pytest.approx(order["order_value"] or 0.0), "orders": 1}
+
+def test_removing_unknown_orders_is_a_no_op(orders):
+    cube = RevenueCube.build(OrderTable.from_records(list(orders.values())))
+    before = cube.total()
+    cube.remove(99_999)
+    assert cube.total() == before
+    assert cube.mutations == 0
+
+def test_reconciling_a_reload_matches_a_rebuild(orders):
+    rng = random.Random(4)
+    cube = RevenueCube.build(OrderTable.from_records(list(orders.values())), version=1)
+
+    for order_id in rng.sample(list(orders), 300):
+        del orders[order_id]
+    for order_id in rng.sample(list(orders), 300):
+        orders[order_id] = {**make_order(rng, order_id), "product_category": rng.choice(["Garden", "Books"])}
+    for order_id in range(5000, 5300):
+        orders[order_id] = make_order(rng, order_id)
+
+    changed = cube.reconcile(OrderTable.from_records(list(orders.values())), version=2)
+
+    assert 600 <= changed <= 900
+    assert cube.version == 2
+    assert_matches(cube, orders)
+
+def test_syncs_after_local_mutations_touch_nothing(orders):
+    store = RevenueCubeStore()
+    cube = store.sync(OrderTable.from_records(list(orders.values())), version=1)
+
+    order = make_order(random.Random(5), 9_000)
+    orders[order["id"]] = order
+    cube.apply(order)
+    patch = {"order_value": 123.0, "status": "refunded"}
+    orders[1] = {**orders[1], **patch}
+    cube.apply({**patch, "id": 1})
+    del orders[2]
+    cube.remove(2)
+
+    # The next TTL sync returns exactly what was already applied
+    store.on_load("orders", OrderTable.from_records(list(orders.values())), 2)
+    assert store.latest() is cube
+    assert cube.version == 2
+    assert cube.reconcile(OrderTable.from_records(list(orders.values())), version=3) == 0
+    assert_matches(cube, orders)
+
+def test_unknown_dimension_is_rejected(orders):
+    cube = RevenueCube.build(OrderTable.from_records(list(orders.values())))
+    with pytest.raises(ValueError):
+        cube.breakdown("customer")
@@ -0,0 +1,273 @@
+import threading
+import time
+
+import pytest
+
+from datetime import date, time as clock
+
+from utils import scheduler as scheduler_module
+from utils.jobs import JobManager
+from utils.scheduler import CampaignGone, CampaignScheduler, ScheduleJournal, launch_campaign, next_run, schedule_timestamp
+
+HOUR = 60 * 60
+
+def test_one_off_launches_dont_repeat():
+    assert next_run(1000, "once") is None
+
+def test_missed_runs_are_skipped():
+    assert next_run(0, "hourly", now=3.5 * HOUR) == 4 * HOUR
+    assert next_run(10 * HOUR, "daily", now=0) == 10 * HOUR
+
+def test_journal_replays_puts_and_deletes(tmp_path):
+    path = str(tmp_path / "schedule.jsonl")
+    journal = ScheduleJournal(path)
+    journal.put({"id": "a", "run_at": 1})
+    journal.put({"id": "b", "run_at": 2})
+    journal.put({"id": "a", "run_at": 3})
+    journal.delete("b")
+
+    assert ScheduleJournal(path).load() == {"a": {"id": "a", "run_at": 3}}
+
+def test_journal_skips_a_torn_last_line(tmp_path):
+    path = tmp_path / "schedule.jsonl"
+    ScheduleJournal(str(path)).put({"id": "a", "run_at": 1})
+    with open(path, "a") as f:
+        f.write('{"op": "put", "item": {"id"')
+
+    assert list(ScheduleJournal(str(path)).load()) == ["a"]
+
+def test_journal_compacts_to_live_items(tmp_path):
+    path = str(tmp_path / "schedule.jsonl")
+    journal = ScheduleJournal(path)
+    items = {}
+    for i in range(1200):
+        items["a"] = {"id": "a", "run_at": i}
+        journal.put(items["a"])
+        journal.maybe_compact(items)
+
+    with open(path) as f:
+        assert len(f.readlines()) < 1200
+    assert ScheduleJournal(path).load() == items
+
+@pytest.fixture
+def client_side(monkeypatch):
+    # Recurring launches are only accepted when this app sends the messages
+    monkeypatch.setenv("DELIVERY_ADAPTER", "stub")
+
+@pytest.fixture
+def make_scheduler(tmp_path):
+    schedulers = []
+
+    def make(launcher, jobs=None, **kwargs):
+        scheduler = CampaignScheduler(ScheduleJournal(str(tmp_path / "schedule.jsonl")), launcher, jobs or JobManager(), **kwargs)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.stop()
+
+def soon():
+    return time.time() + 0.05
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+def test_due_items_launch_once(make_scheduler):
+    launched = []
+    scheduler = make_scheduler(lambda job, item: launched.append(item["campaign_id"]))
+    scheduler.schedule(7, soon())
+    scheduler.start()
+
+    assert wait_for(lambda: launched == [7])
+    assert wait_for(lambda: len(scheduler) == 0)
+
+def test_recurring_items_are_rearmed(make_scheduler, client_side):
+    scheduler = make_scheduler(lambda job, item: None)
+    item = scheduler.schedule(7, soon(), recurrence="hourly")
+    scheduler.start()
+
+    assert wait_for(lambda: scheduler.upcoming() and scheduler.upcoming()[0]["last_run_at"])
+    assert scheduler.upcoming()[0]["run_at"] == pytest.approx(item["run_at"] + HOUR)
+
+def test_cancelled_items_never_launch(make_scheduler):
+    launched = []
+    scheduler = make_scheduler(lambda job, item: launched.append(item))
+    item = scheduler.schedule(7, time.time() + 0.2)
+    assert scheduler.cancel(item["id"])
+    scheduler.start()
+
+    time.sleep(0.4)
+    assert launched == []
+    assert not scheduler.cancel(item["id"])
+
+def test_upcoming_is_soonest_first(make_scheduler):
+    scheduler = make_scheduler(lambda job, item: None)
+    now = time.time()
+    for offset in (300, 100, 200):
+        scheduler.schedule(offset, now + offset)
+    assert [item["campaign_id"] for item in scheduler.upcoming()] == [100, 200, 300]
+    assert [item["campaign_id"] for item in scheduler.upcoming(campaign_id=200)] == [200]
+
+def test_schedules_survive_a_restart(make_scheduler, client_side):
+    first = make_scheduler(lambda job, item: None)
+    item = first.schedule(7, time.time() + HOUR, recurrence="daily")
+
+    second = make_scheduler(lambda job, item: None)
+    assert [entry["id"] for entry in second.upcoming()] == [item["id"]]
+
+def test_concurrent_launches_are_capped(make_scheduler):
+    release = threading.Event()
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def launcher(job, item):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        release.wait(5)
+        with lock:
+            running[0] -= 1
+
+    scheduler = make_scheduler(launcher, max_concurrent=2)
+    for campaign_id in range(4):
+        scheduler.schedule(campaign_id, soon())
+    scheduler.start()
+
+    assert wait_for(lambda: running[0] == 2)
+    time.sleep(0.1)
+    assert peak[0] == 2
+    release.set()
+    assert wait_for(lambda: len(scheduler) == 0 and running[0] == 0)
+
+def test_unknown_recurrence_is_rejected(make_scheduler):
+    with pytest.raises(ValueError):
+        make_scheduler(lambda job, item: None).schedule(1, time.time(), recurrence="monthly")
+
+def test_past_launch_times_are_rejected(make_scheduler):
+    with pytest.raises(ValueError):
+        make_scheduler(lambda job, item: None).schedule(1, time.time() - 1)
+
+def test_launch_times_are_read_in_the_given_timezone():
+    assert schedule_timestamp(date(2024, 1, 1), clock(5, 30), "Asia/Kolkata") == schedule_timestamp(date(2024, 1, 1), clock(0, 0), "UTC")
+
+def test_a_job_cancelled_while_queued_frees_its_slot(make_scheduler):
+    jobs = JobManager(max_workers=1)
+    release = threading.Event()
+    jobs.submit("blocker", lambda job: release.wait(5))
+    launched = []
+    scheduler = make_scheduler(lambda job, item: launched.append(item["campaign_id"]), jobs=jobs, max_concurrent=1)
+    scheduler.schedule(1, soon())
+    scheduler.start()
+
+    assert wait_for(lambda: jobs.jobs(kind="scheduled_launch"))
+    jobs.cancel(jobs.jobs(kind="scheduled_launch")[0].id)
+    release.set()
+    scheduler.schedule(2, soon())
+
+    assert wait_for(lambda: launched == [2])
+
+def test_a_failed_submit_is_retried_without_leaking_its_slot(make_scheduler, monkeypatch):
+    monkeypatch.setattr(scheduler_module, "SCHEDULER_RETRY_DELAY", 0.05)
+    jobs = JobManager()
+    submit, failures = jobs.submit, [RuntimeError("pool shut down")]
+
+    def flaky_submit(*args, **kwargs):
+        if failures:
+            raise failures.pop()
+        return submit(*args, **kwargs)
+
+    jobs.submit = flaky_submit
+    launched = []
+    scheduler = make_scheduler(lambda job, item: launched.append(item["campaign_id"]), jobs=jobs, max_concurrent=1)
+    scheduler.schedule(1, soon())
+    scheduler.schedule(2, soon())
+    scheduler.start()
+
+    assert wait_for(lambda: sorted(launched) == [1, 2])
+
+def test_schedules_of_a_gone_campaign_are_dropped(make_scheduler, client_side):
+    def launcher(job, item):
+        raise CampaignGone("deleted")
+
+    scheduler = make_scheduler(launcher)
+    scheduler.schedule(7, soon(), recurrence="hourly")
+    scheduler.start()
+
+    assert wait_for(lambda: len(scheduler) == 0)
+
+def test_cancel_campaign_removes_all_its_launches(make_scheduler, client_side):
+    scheduler = make_scheduler(lambda job, item: None)
+    for recurrence in ("once", "daily"):
+        scheduler.schedule(7, time.time() + HOUR, recurrence=recurrence)
+    scheduler.schedule(8, time.time() + HOUR)
+
+    assert scheduler.cancel_campaign(7) == 2
+    assert [item["campaign_id"] for item in scheduler.upcoming()] == [8]
+
+class FakeAPI:
+    def __init__(self, campaigns, reachable=True):
+        self.campaigns = {campaign["id"]: campaign for campaign in campaigns}
+        self.reachable = reachable
+        self.activated = []
+
+    def get_campaign(self, campaign_id, silent=False):
+        return self.campaigns.get(campaign_id) if self.reachable else None
+
+    def get_campaigns(self, empty_on_error=True, silent=False):
+        return list(self.campaigns.values()) if self.reachable else None
+
+    def update_campaign_status(self, campaign_id, status, campaign=None):
+        self.activated.append(campaign_id)
+        return {"id": campaign_id, "status": status}
+
+def launch(api, campaign_id):
+    job = JobManager().submit("scheduled_launch", launch_campaign, api, None, {"campaign_id": campaign_id})
+    job.wait(5)
+    return job
+
+def test_a_deleted_campaign_is_told_from_an_unreachable_backend():
+    with pytest.raises(CampaignGone):
+        launch_campaign(None, FakeAPI([]), None, {"campaign_id": 7})
+    with pytest.raises(RuntimeError) as error:
+        launch_campaign(None, FakeAPI([{"id": 7}], reachable=False), None, {"campaign_id": 7})
+    assert not isinstance(error.value, CampaignGone)
+
+def test_campaigns_without_stored_rules_are_not_dispatched(monkeypatch):
+    monkeypatch.setenv("DELIVERY_ADAPTER", "stub")
+    api = FakeAPI([{"id": 7, "status": "draft", "audience_type": "all"}])
+    job = launch(api, 7)
+
+    assert job.status == "failed"
+    assert "stored segment rules" in job.error
+    assert api.activated == []
+
+def test_without_an_adapter_the_campaign_is_only_activated(monkeypatch):
+    monkeypatch.delenv("DELIVERY_ADAPTER", raising=False)
+    api = FakeAPI([{"id": 7, "status": "draft"}])
+    job = launch(api, 7)
+
+    assert job.status == "succeeded"
+    assert api.activated == [7]
+
+def test_recurring_launches_need_client_side_sending(make_scheduler, monkeypatch):
+    monkeypatch.delenv("DELIVERY_ADAPTER", raising=False)
+    scheduler = make_scheduler(lambda job, item: None)
+    with pytest.raises(ValueError):
+        scheduler.schedule(7, time.time() + HOUR, recurrence="daily")
+    assert scheduler.schedule(7, time.time() + HOUR)["recurrence"] == "once"
+
+def test_active_campaigns_without_an_adapter_report_not_sent(monkeypatch):
+    monkeypatch.delenv("DELIVERY_ADAPTER", raising=False)
+    api = FakeAPI([{"id": 7, "status": "active"}])
+    job = launch(api, 7)
+
+    assert job.status == "succeeded"
+    assert job.result["sent"] is False
+    assert job.message.startswith("⚠️ Not sent")
+    assert api.activated == []
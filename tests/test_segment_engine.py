@@ -0,0 +1,157 @@
+import operator
+import random
+
+import numpy as np
+import pytest
+
+from utils.bitmap_index import PredicateBitmapCache
+from utils.records import CustomerTable
+from utils.segment_engine import (
+    IncrementalSegmentEvaluator, QueryPlanner, SegmentEngine, SegmentError, compile_rule, compile_rules,
+)
+from utils.segment_sketch import SegmentSketch
+
+COMPARE = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le, "=": operator.eq}
+FIELDS = ("total_spend", "total_orders", "days_since_last_order")
+
+def customers(count=500, seed=3):
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        ordered = rng.random() > 0.1
+        records.append({
+            "id": i + 1,
+            "name": f"Customer {i}",
+            "total_spend": None if rng.random() < 0.05 else round(rng.uniform(0, 50000)),
+            "total_orders": rng.randint(0, 20) if ordered else 0,
+            "last_order_date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}" if ordered else None,
+        })
+    return records
+
+@pytest.fixture(scope="module")
+def engine():
+    return SegmentEngine(CustomerTable.from_records(customers()), version=1)
+
+def random_rule(rng, columns):
+    field = rng.choice(FIELDS)
+    known = columns[field][~np.isnan(columns[field].astype(float))]
+    # Values below, inside and above the data give empty and all-match predicates too
+    value = rng.choice([-1.0, 1e9, float(rng.choice(known))])
+    return {"field": field, "operator": rng.choice(list(COMPARE)), "value": value}
+
+def random_group(rng, columns, max_depth=0, depth=0):
+    rules = []
+    for _ in range(rng.randint(0, 4)):
+        if depth < max_depth and rng.random() < 0.3:
+            rules.append(random_group(rng, columns, max_depth, depth + 1))
+        else:
+            rules.append(random_rule(rng, columns))
+    group = {"logic": rng.choice(["AND", "OR"]), "rules": rules}
+    if depth:
+        group["negate"] = rng.random() < 0.3
+    return group
+
+def brute_force(group, row):
+    """Evaluate rules for one row of plain Python values"""
+    results = []
+    for node in group["rules"]:
+        if "rules" in node:
+            results.append(brute_force(node, row))
+        else:
+            value = row[node["field"]]
+            # Unknown values never match, whatever the operator
+            results.append(value == value and COMPARE[node["operator"]](value, float(node["value"])))
+    # An empty group matches everyone, whatever its logic
+    matched = not results or (all(results) if group.get("logic", "AND") == "AND" else any(results))
+    return not matched if group.get("negate") else matched
+
+def expected_mask(engine, group):
+    columns = engine.columns()
+    return np.array([
+        brute_force(group, {field: float(columns[field][i]) for field in FIELDS})
+        for i in range(len(engine))
+    ])
+
+def test_compiled_rules_match_row_by_row_evaluation(engine):
+    rng = random.Random(11)
+    for _ in range(100):
+        group = random_group(rng, engine.columns())
+        assert np.array_equal(engine.mask(group), expected_mask(engine, group)), group
+
+def test_empty_rules_match_everyone(engine):
+    assert engine.mask({"logic": "AND", "rules": []}).all()
+    assert engine.evaluate({"logic": "OR", "rules": []})["audience_size"] == len(engine)
+
+def test_unknown_spend_never_matches(engine):
+    unknown = np.isnan(engine.columns()["total_spend"])
+    assert unknown.any()
+    for op in COMPARE:
+        assert not engine.mask({"logic": "AND", "rules": [{"field": "total_spend", "operator": op, "value": 0}]})[unknown].any()
+
+@pytest.mark.parametrize("rule", [
+    {"field": "age", "operator": ">", "value": 1},
+    {"field": "total_spend", "operator": "!=", "value": 1},
+    {"field": "total_spend", "operator": ">", "value": "lots"},
+])
+def test_invalid_rules_raise(rule):
+    with pytest.raises(SegmentError):
+        compile_rule(rule)
+
+def test_unknown_logic_raises():
+    with pytest.raises(SegmentError):
+        compile_rules({"logic": "XOR", "rules": []})
+
+def test_preview_is_shaped_like_the_server_preview(engine):
+    preview = engine.evaluate({"logic": "AND", "rules": [{"field": "total_orders", "operator": ">=", "value": 10}]}, sample_size=3)
+    assert preview["audience_size"] == int((engine.columns()["total_orders"] >= 10).sum())
+    assert len(preview["sample_customers"]) == 3
+    assert all(customer["total_orders"] >= 10 for customer in preview["sample_customers"])
+
+def rule(field, op, value):
+    return {"field": field, "operator": op, "value": value}
+
+def test_nested_groups_match_row_by_row_evaluation(engine):
+    rng = random.Random(13)
+    for _ in range(100):
+        group = random_group(rng, engine.columns(), max_depth=2)
+        assert np.array_equal(engine.mask(group), expected_mask(engine, group)), group
+
+def test_planned_evaluation_matches_unplanned(engine):
+    rng = random.Random(17)
+    evaluator = IncrementalSegmentEvaluator(PredicateBitmapCache())
+    for _ in range(200):
+        group = random_group(rng, engine.columns(), max_depth=2)
+        planned = evaluator.bitmap(engine, group).to_mask()
+        assert np.array_equal(planned, engine.mask(group)), group
+
+@pytest.mark.parametrize("logic", ["AND", "OR"])
+def test_empty_and_all_match_predicates_plan_correctly(engine, logic):
+    evaluator = IncrementalSegmentEvaluator(PredicateBitmapCache())
+    nobody, everybody = rule("total_orders", "<", -1), rule("total_orders", ">=", 0)
+    some = rule("total_spend", ">", 25000)
+    for rules in ([nobody, some], [everybody, some], [nobody, everybody], [some]):
+        group = {"logic": logic, "rules": rules}
+        assert np.array_equal(evaluator.bitmap(engine, group).to_mask(), engine.mask(group)), group
+
+def test_and_groups_run_the_most_selective_rule_first(engine):
+    planner = QueryPlanner(SegmentSketch(engine.columns(), engine.version))
+    broad, narrow = rule("total_spend", ">=", 0), rule("total_spend", ">", 45000)
+    assert planner.order({"logic": "AND", "rules": [broad, narrow]}) == [narrow, broad]
+    assert planner.order({"logic": "OR", "rules": [narrow, broad]}) == [broad, narrow]
+
+def test_and_groups_stop_once_nothing_survives(engine):
+    evaluator = IncrementalSegmentEvaluator(PredicateBitmapCache())
+    # Satisfiable as written, so only evaluation finds it empty
+    nobody = rule("total_spend", ">", 1e9)
+    group = {"logic": "AND", "rules": [rule("total_spend", ">", 100), nobody, rule("total_orders", ">", 2)]}
+
+    assert not evaluator.bitmap(engine, group).any()
+    assert evaluator.recomputed == 1
+
+def test_or_groups_stop_once_everyone_matches(engine):
+    evaluator = IncrementalSegmentEvaluator(PredicateBitmapCache())
+    everybody = rule("total_orders", ">=", 0)
+    group = {"logic": "OR", "rules": [rule("total_spend", ">", 100), everybody, rule("total_orders", ">", 2)]}
+
+    assert evaluator.bitmap(engine, group).count() == len(engine)
+    assert evaluator.recomputed == 1
@@ -0,0 +1,44 @@
+import pytest
+
+from utils.segment_parser import normalize_text, parse_segment_text_local
+
+def rules(*triples, logic="AND"):
+    return {"logic": logic, "rules": [{"field": f, "operator": o, "value": v} for f, o, v in triples]}
+
+@pytest.mark.parametrize("text, expected", [
+    ("People who spent more than ₹10,000", rules(("total_spend", ">", 10000.0))),
+    ("Customers with less than 3 orders", rules(("total_orders", "<", 3))),
+    ("5 or more orders", rules(("total_orders", ">=", 5))),
+    ("spent over 1.5 lakh and at least 5 orders", rules(("total_spend", ">", 150000.0), ("total_orders", ">=", 5))),
+    ("spent over 10k or more than 3 orders", rules(("total_spend", ">", 10000.0), ("total_orders", ">", 3), logic="OR")),
+])
+def test_known_phrasings(text, expected):
+    assert parse_segment_text_local(text) == expected
+
+def test_inactivity_maps_to_days_since_last_order():
+    parsed = parse_segment_text_local("Inactive customers who haven't ordered in 90 days")
+    assert [(r["field"], r["value"]) for r in parsed["rules"]] == [("days_since_last_order", 90)]
+    assert parsed["rules"][0]["operator"] in (">", ">=")
+
+@pytest.mark.parametrize("text", [
+    "customers over 30 years old",
+    "signed up more than 6 months ago",
+    "members for over 2 years",
+])
+def test_time_spans_without_an_order_cue_are_left_to_the_ai(text):
+    assert parse_segment_text_local(text) is None
+
+def test_recency_needs_an_order_or_activity_cue():
+    assert parse_segment_text_local("purchased in the last 2 weeks") == rules(("days_since_last_order", "<=", 14))
+    assert parse_segment_text_local("active within 30 days") == rules(("days_since_last_order", "<=", 30))
+
+def test_unrecognized_text_is_left_to_the_ai():
+    assert parse_segment_text_local("hello there") is None
+
+def test_results_are_independent_copies():
+    first = parse_segment_text_local("Customers with less than 3 orders")
+    first["rules"].clear()
+    assert parse_segment_text_local("Customers with less than 3 orders")["rules"]
+
+def test_normalization_ignores_case_and_spacing():
+    assert normalize_text("  Spent   OVER 10k. ") == normalize_text("spent over 10k")
@@ -0,0 +1,86 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from utils.records import CustomerTable
+from utils.segment_engine import SegmentEngine
+from utils.segment_rules import canonicalize
+
+def rule(field, operator, value):
+    return {"field": field, "operator": operator, "value": value}
+
+@pytest.fixture(scope="module")
+def engine():
+    rng = np.random.default_rng(3)
+    customers = [
+        {
+            "id": i,
+            "name": f"C{i}",
+            "total_spend": float(rng.integers(0, 200)) if i % 17 else None,
+            "total_orders": int(rng.integers(0, 12)),
+            "last_order_date": None,
+        }
+        for i in range(2000)
+    ]
+    return SegmentEngine(CustomerTable.from_records(customers), 1)
+
+def test_integer_bounds_are_made_inclusive():
+    a = canonicalize({"logic": "AND", "rules": [rule("total_orders", ">", 4)]})
+    b = canonicalize({"logic": "AND", "rules": [rule("total_orders", ">=", 5)]})
+    assert a.key == b.key
+
+def test_rule_order_and_duplicates_dont_matter():
+    rules = [rule("total_spend", ">", 100), rule("total_orders", "<", 3)]
+    a = canonicalize({"logic": "AND", "rules": rules})
+    b = canonicalize({"logic": "AND", "rules": rules[::-1] + [rules[0]]})
+    assert a.key == b.key
+
+def test_and_intersects_ranges():
+    canonical = canonicalize({"logic": "AND", "rules": [rule("total_spend", ">", 50), rule("total_spend", ">", 100)]})
+    assert canonical.rules["rules"] == [rule("total_spend", ">", 100.0)]
+
+def test_or_merges_ranges():
+    canonical = canonicalize({"logic": "OR", "rules": [rule("total_spend", ">", 100), rule("total_spend", ">", 50)]})
+    assert canonical.rules["rules"] == [rule("total_spend", ">", 50.0)]
+
+def test_contradictions_are_unsatisfiable():
+    canonical = canonicalize({"logic": "AND", "rules": [rule("total_orders", ">", 4), rule("total_orders", "<", 3)]})
+    assert not canonical.satisfiable
+
+def test_single_nested_group_is_unwrapped():
+    inner = {"logic": "OR", "rules": [rule("total_spend", ">", 100), rule("total_orders", ">", 5)]}
+    assert canonicalize({"logic": "AND", "rules": [inner]}).key == canonicalize(inner).key
+
+VALUES = {"total_spend": [0, 50, 100.5, 150], "total_orders": [0, 3, 5, 11]}
+
+def sample_rules():
+    atoms = [
+        rule(field, operator, value)
+        for field, values in VALUES.items()
+        for operator in (">", ">=", "<", "<=", "=")
+        for value in values
+    ]
+    rng = np.random.default_rng(11)
+    for _ in range(300):
+        picked = [atoms[i] for i in rng.choice(len(atoms), size=rng.integers(1, 5), replace=False)]
+        logic = "AND" if rng.random() < 0.5 else "OR"
+        if rng.random() < 0.3:
+            yield {"logic": logic, "rules": [{"logic": "OR" if logic == "AND" else "AND", "negate": bool(rng.random() < 0.5), "rules": picked[:2]}] + picked[2:]}
+        else:
+            yield {"logic": logic, "rules": picked}
+
+def test_canonical_rules_select_the_same_customers(engine):
+    for segment in sample_rules():
+        canonical = canonicalize(segment)
+        expected = engine.mask(segment)
+        if not canonical.satisfiable:
+            assert not expected.any(), segment
+        else:
+            assert np.array_equal(engine.mask(canonical.rules), expected), segment
+
+def test_unknown_spend_never_matches(engine):
+    spend = engine.table["total_spend"]
+    below = engine.mask({"logic": "AND", "rules": [rule("total_spend", "<", 1000)]})
+    assert np.isnan(spend).any()
+    assert not below[np.isnan(spend)].any()
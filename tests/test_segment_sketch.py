@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from utils.segment_sketch import FieldSketch, SegmentSketch
+
+OPERATORS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "=": np.equal,
+}
+
+@pytest.fixture(scope="module")
+def spend():
+    return np.round(np.random.default_rng(7).lognormal(8, 1, 100_000))
+
+@pytest.fixture(scope="module")
+def sketch(spend):
+    sketch = FieldSketch(spend)
+    assert not sketch.exact
+    return sketch
+
+@pytest.mark.parametrize("operator", list(OPERATORS))
+def test_bounds_hold_on_bin_edges(spend, sketch, operator):
+    for value in sketch.edges:
+        estimate, low, high = sketch.bounds(operator, value)
+        true = int(OPERATORS[operator](spend, value).sum())
+        assert low <= true <= high, (operator, value, low, true, high)
+        assert low <= estimate <= high
+
+@pytest.mark.parametrize("operator", list(OPERATORS))
+def test_bounds_hold_between_and_outside_edges(spend, sketch, operator):
+    values = list((sketch.edges[:-1] + sketch.edges[1:]) / 2) + [sketch.edges[0] - 1, sketch.edges[-1] + 1]
+    for value in values:
+        _, low, high = sketch.bounds(operator, value)
+        true = int(OPERATORS[operator](spend, value).sum())
+        assert low <= true <= high, (operator, value, low, true, high)
+
+def test_values_outside_the_histogram_are_exact(spend, sketch):
+    assert sketch.bounds(">", sketch.edges[-1] + 1) == (0, 0, 0)
+    assert sketch.bounds("<", sketch.edges[0] - 1) == (0, 0, 0)
+    assert sketch.bounds(">=", sketch.edges[0] - 1) == (len(spend),) * 3
+
+def test_low_cardinality_fields_are_exact():
+    values = np.array([0, 1, 1, 2, 3, np.nan])
+    assert FieldSketch(values).bounds(">=", 1) == (4, 4, 4)
+
+def test_estimate_ignores_unknown_values():
+    columns = {
+        "total_spend": np.array([10.0, np.nan, 30.0, 40.0]),
+        "total_orders": np.array([1.0, 0.0, 3.0, 4.0]),
+        "days_since_last_order": np.array([1.0, np.nan, 3.0, 4.0]),
+    }
+    sketch = SegmentSketch(columns)
+    result = sketch.estimate({"logic": "AND", "rules": [{"field": "total_spend", "operator": "<", "value": 35}]})
+    assert result["estimate"] == result["low"] == result["high"] == 2
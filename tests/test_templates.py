@@ -0,0 +1,69 @@
+import pytest
+
+from utils.templates import (
+    SAMPLE_CUSTOMER, TemplateError, compile_template, placeholder_help, validate_template,
+)
+
+def render(template, customer):
+    return compile_template(template).render(customer)
+
+@pytest.mark.parametrize("template, expected", [
+    ("Hi {name}", "Hi John Doe"),
+    ("Hi {name:first}", "Hi John"),
+    ("Hi {name:upper}", "Hi JOHN DOE"),
+    ("Spent {total_spend}", "Spent ₹12,500"),
+    ("{total_orders} orders", "4 orders"),
+    ("Use {{CODE}} now", "Use {CODE} now"),
+])
+def test_render(template, expected):
+    assert render(template, SAMPLE_CUSTOMER) == expected
+
+def test_missing_values_use_fallbacks():
+    assert render("Hi {name}, {total_spend} over {total_orders}", {}) == "Hi Customer, ₹0 over 0"
+    assert render("Email: {email}", {"email": None}) == "Email: "
+
+def test_render_column_matches_rendering_one_by_one():
+    customers = [SAMPLE_CUSTOMER, {"name": "  Zoë  Ray ", "total_spend": 99.6}, {}]
+    compiled = compile_template("Hi {name:first} ({name:title}), {total_spend:currency}")
+    assert list(compiled.render_column(customers)) == [compiled.render(customer) for customer in customers]
+
+def test_templates_are_compiled_once():
+    assert compile_template("Hi {name}") is compile_template("Hi {name}")
+
+@pytest.mark.parametrize("template, problem", [
+    ("Hi {nickname}", "Unknown placeholder {nickname}"),
+    ("Hi {name:shout}", "Unknown formatter 'shout'"),
+    ("Hi {name!r}", "Conversions like !r"),
+    ("Hi {name", "Malformed template"),
+    ("Hi name}", "Malformed template"),
+])
+def test_invalid_templates(template, problem):
+    with pytest.raises(TemplateError, match=problem):
+        compile_template(template)
+    errors = validate_template(template, extended=True)
+    assert errors and any(problem in error for error in errors)
+
+def test_every_problem_is_reported():
+    assert len(validate_template("{nickname} {name:shout}", extended=True)) == 2
+
+def test_required_placeholders():
+    assert validate_template("Hello there", extended=True) == ["Message must include {name} placeholder"]
+    assert validate_template("Hello there", required=(), extended=True) == []
+    assert validate_template("  ") == ["Message template is required"]
+
+def test_extended_placeholders_need_client_side_sending():
+    template = "Hi {name:first}, you've spent {total_spend}. Code {{SAVE}}"
+    assert validate_template(template, extended=True) == []
+
+    errors = validate_template(template, extended=False)
+    assert len(errors) == 3
+    assert validate_template("Hi {name}, special offer!", extended=False) == []
+
+def test_the_configuration_picks_the_placeholders(monkeypatch):
+    monkeypatch.delenv("DELIVERY_ADAPTER", raising=False)
+    assert validate_template("Hi {name} {total_spend}")
+    assert "{total_spend}" not in placeholder_help()
+
+    monkeypatch.setenv("DELIVERY_ADAPTER", "stub")
+    assert validate_template("Hi {name} {total_spend}") == []
+    assert "{total_spend}" in placeholder_help()
@@ -0,0 +1,84 @@
+"""
+AI message generation cached by objective and prefetched in the background
+"""
+
+import re
+import threading
+
+import streamlit as st
+
+from utils.helpers import TTLCache
+from utils.jobs import get_job_manager
+
+# Seconds generated messages are reused for the same normalized objective
+AI_MESSAGE_TTL = 30 * 60
+
+def normalize_objective(objective):
+    """Normalize an objective so equivalent phrasings share cache entries"""
+    text = re.sub(r"\s+", " ", (objective or "").lower()).strip()
+    return text.strip(" .!?")
+
+class AIMessageService:
+    """Generate campaign messages once per objective, off the script thread.
+
+    Results are kept in a TTL cache keyed by normalized objective. prefetch()
+    submits a background job and returns at once, so pages can keep
+    rendering and pick the result up on a later (fragment) rerun.
+    """
+
+    def __init__(self, jobs, ttl=AI_MESSAGE_TTL):
+        self.jobs = jobs
+        self.cache = TTLCache(maxsize=512, ttl=ttl)
+        # Recent failures, so pages can report them instead of waiting forever
+        self.failures = TTLCache(maxsize=256, ttl=60)
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def cached(self, objective):
+        """Get generated messages for an objective if they're ready, else None"""
+        key = normalize_objective(objective)
+        return self.cache.get(key) if key else None
+
+    def failed(self, objective):
+        """Whether the last generation for the objective failed recently"""
+        return self.failures.get(normalize_objective(objective)) is not None
+
+    def pending(self, objective):
+        """Whether a generation for the objective is running"""
+        with self._lock:
+            return normalize_objective(objective) in self._pending
+
+    def prefetch(self, objective, api_client):
+        """Start a generation job unless cached or already running, returning the job"""
+        key = normalize_objective(objective)
+        if not key or self.cache.get(key) is not None:
+            return None
+
+        with self._lock:
+            job = self._pending.get(key)
+            if job is None:
+                job = self.jobs.submit(
+                    "ai_messages", self._generate, key, objective.strip(), api_client,
+                    label=f"AI messages: {objective.strip()}", interactive=True
+                )
+                self._pending[key] = job
+            return job
+
+    def _generate(self, job, key, objective, api_client):
+        try:
+            job.update(message="Generating messages")
+            result = api_client.generate_ai_message(objective, silent=True)
+            if result and result.get("messages"):
+                self.cache.set(key, result)
+                self.failures.delete(key)
+            else:
+                self.failures.set(key, True)
+            return result
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+@st.cache_resource
+def get_ai_message_service():
+    """Get the AI message service shared by every session"""
+    return AIMessageService(get_job_manager())
@@ -0,0 +1,76 @@
+"""
+Customer analytics computed in one vectorized pass, memoized per data version
+"""
+
+import numpy as np
+import streamlit as st
+
+from utils.data_store import get_data_store
+from utils.helpers import CUSTOMER_TIERS, count_by_code, get_customer_tier_codes
+
+# (label, emoji, upper spend bound inclusive) of each spend bucket, lowest first
+SPEND_BUCKETS = [
+    ("Low", "👤", 10000),
+    ("Medium", "⭐", 50000),
+    ("High", "💎", None),
+]
+
+# Customers listed in the top spenders
+TOP_K = 5
+
+def top_k_indices(values, k):
+    """Get the indices of the k largest values, largest first.
+
+    A partition finds the k-th largest value in O(n); only the k rows
+    selected are then sorted, ties keeping row order like a stable
+    descending sort would.
+    """
+    k = min(k, len(values))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Rows tied with the k-th value are taken in row order
+    kth = -np.partition(-values, k - 1)[k - 1]
+    above = np.flatnonzero(values > kth)
+    tied = np.flatnonzero(values == kth)[:k - len(above)]
+    chosen = np.concatenate([above, tied])
+    return chosen[np.lexsort((chosen, -values[chosen]))]
+
+def customer_analytics(customers, top_k=TOP_K):
+    """Get spend buckets, tier counts, totals and top spenders of a customer table.
+
+    Every figure comes from the same spend/order columns in a single pass
+    of numpy operations; no per-customer Python loop runs.
+    """
+    spend = np.nan_to_num(np.asarray(customers["total_spend"], dtype=float))
+    orders = np.nan_to_num(np.asarray(customers["total_orders"], dtype=float))
+
+    edges = [bound for _, _, bound in SPEND_BUCKETS[:-1]]
+    bucket_codes = np.searchsorted(edges, spend, side="left")
+    bucket_counts = np.bincount(bucket_codes, minlength=len(SPEND_BUCKETS))
+
+    tier_codes = get_customer_tier_codes(spend, orders)
+
+    top = top_k_indices(spend, top_k)
+    return {
+        "customers": len(spend),
+        "total_spend": float(spend.sum()),
+        "average_spend": float(spend.mean()) if len(spend) else 0.0,
+        "spend_buckets": {label: int(count) for (label, _, _), count in zip(SPEND_BUCKETS, bucket_counts)},
+        "tiers": count_by_code(tier_codes, CUSTOMER_TIERS),
+        "top_customers": [customers[int(i)].to_dict() for i in top],
+    }
+
+@st.cache_resource(max_entries=4)
+def _analytics_for(version, top_k, _table):
+    return customer_analytics(_table, top_k)
+
+def get_customer_analytics(api_client, top_k=TOP_K):
+    """Get customer analytics for the current version of the shared customer table.
+
+    Results are shared across sessions and reruns until the data changes,
+    so callers must treat them as read-only.
+    """
+    store = get_data_store()
+    table = store.customers(api_client)
+    return _analytics_for(store.version("customers"), top_k, table)
@@ -2,23 +2,34 @@ import streamlit as st
 import requests
 import os
 
+from utils.segment_rules import canonicalize, get_preview_cache
+from utils.campaigns import get_campaign_cache
+from utils.revenue_cube import get_revenue_cube_store
+
 class APIClient:
-    def __init__(self):
+    def __init__(self, silent=False):
         # Use environment variable for backend URL (Render deployment)
         self.base_url = os.getenv("BACKEND_URL", "http://localhost:8000")
         
-        if "localhost" not in self.base_url:
-            st.success(f"✅ Connected to Render backend: {self.base_url}")
-        else:
-            st.warning("⚠️ Using localhost backend (development mode)")
+        # silent=True is for clients owned by background workers rather than a page
+        if not silent:
+            if "localhost" not in self.base_url:
+                st.success(f"✅ Connected to Render backend: {self.base_url}")
+            else:
+                st.warning("⚠️ Using localhost backend (development mode)")
         
         self.session = requests.Session()
+        # Bulk operations and dispatch workers share this session concurrently
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=16)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self.session.headers.update({
             'Content-Type': 'application/json',
             'Accept': 'application/json'
         })
     
-    def _make_request(self, method, endpoint, data=None, params=None, success_message=None):
+    def _make_request(self, method, endpoint, data=None, params=None, success_message=None, silent=False):
+        # silent=True skips the Streamlit messages, for calls made off the script thread
         try:
             url = f"{self.base_url}{endpoint}"
             
@@ -28,32 +39,38 @@ class APIClient:
                 response = self.session.post(url, json=data, params=params, timeout=30)
             elif method.upper() == 'PUT':
                 response = self.session.put(url, json=data, params=params, timeout=30)
+            elif method.upper() == 'PATCH':
+                response = self.session.patch(url, json=data, params=params, timeout=30)
             elif method.upper() == 'DELETE':
                 response = self.session.delete(url, timeout=30)
             
             if response.status_code == 200:
-                if success_message:
+                if success_message and not silent:
                     st.success(success_message)
                 return response.json()
             else:
                 error_detail = response.json().get('detail', 'Unknown error') if 'application/json' in response.headers.get('content-type', '') else f"HTTP {response.status_code}"
-                st.error(f"❌ API Error: {error_detail}")
+                if not silent:
+                    st.error(f"❌ API Error: {error_detail}")
                 return None
             
         except requests.exceptions.ConnectionError:
-            st.error(f"❌ Cannot connect to backend server at {self.base_url}")
+            if not silent:
+                st.error(f"❌ Cannot connect to backend server at {self.base_url}")
             return None
         except Exception as e:
-            st.error(f"❌ Request failed: {str(e)}")
+            if not silent:
+                st.error(f"❌ Request failed: {str(e)}")
             return None
     
     # ================================
     # CUSTOMER CRUD METHODS
     # ================================
     
-    def get_customers(self, search=None):
+    def get_customers(self, search=None, silent=False, empty_on_error=True):
         params = {'search': search} if search else None
-        return self._make_request('GET', '/customers', params=params) or []
+        result = self._make_request('GET', '/customers', params=params, silent=silent)
+        return [] if result is None and empty_on_error else result
     
     def get_customer(self, customer_id):
         return self._make_request('GET', f'/customers/{customer_id}')
@@ -79,42 +96,98 @@ class APIClient:
         return self._make_request('GET', f'/orders/{order_id}')
     
     def create_order(self, order_data):
-        return self._make_request('POST', '/orders', data=order_data, success_message="✅ Order created!")
+        result = self._make_request('POST', '/orders', data=order_data, success_message="✅ Order created!")
+        if isinstance(result, dict):
+            get_revenue_cube_store().order_saved({**order_data, **result})
+        return result
     
     def update_order(self, order_id, order_data):
-        return self._make_request('PUT', f'/orders/{order_id}', data=order_data, success_message="✅ Order updated!")
+        result = self._make_request('PUT', f'/orders/{order_id}', data=order_data, success_message="✅ Order updated!")
+        if result:
+            # The revenue cube folds the change in instead of being rebuilt
+            saved = result if isinstance(result, dict) else {}
+            get_revenue_cube_store().order_saved({**order_data, **saved, "id": order_id})
+        return result
     
     def delete_order(self, order_id):
-        return self._make_request('DELETE', f'/orders/{order_id}', success_message="🗑️ Order deleted!")
+        result = self._make_request('DELETE', f'/orders/{order_id}', success_message="🗑️ Order deleted!")
+        if result:
+            get_revenue_cube_store().order_deleted(order_id)
+        return result
     
     # ================================
     # CAMPAIGN CRUD METHODS
     # ================================
     
-    def get_campaigns(self):
-        return self._make_request('GET', '/campaigns') or []
+    def get_campaigns(self, empty_on_error=True, silent=False):
+        # empty_on_error=False returns None on failure, so caches can keep their last list
+        result = self._make_request('GET', '/campaigns', silent=silent)
+        return [] if result is None and empty_on_error else result
     
-    def get_campaign(self, campaign_id):
-        return self._make_request('GET', f'/campaigns/{campaign_id}')
+    def get_campaign(self, campaign_id, silent=False):
+        return self._make_request('GET', f'/campaigns/{campaign_id}', silent=silent)
     
-    def create_campaign(self, campaign_data):
-        return self._make_request('POST', '/campaigns', data=campaign_data, success_message="🚀 Campaign launched!")
+    def create_campaign(self, campaign_data, silent=False):
+        if campaign_data.get("segment_rules"):
+            campaign_data = {**campaign_data, "segment_rules": canonicalize(campaign_data["segment_rules"]).rules}
+        result = self._make_request('POST', '/campaigns', data=campaign_data, success_message="🚀 Campaign launched!", silent=silent)
+        if result:
+            # Every page reads the shared campaign list, so it reloads after any change
+            get_campaign_cache().invalidate()
+        return result
     
     def update_campaign(self, campaign_id, campaign_data):
-        return self._make_request('PUT', f'/campaigns/{campaign_id}', data=campaign_data, success_message="✅ Campaign updated!")
+        result = self._make_request('PUT', f'/campaigns/{campaign_id}', data=campaign_data, success_message="✅ Campaign updated!")
+        if result:
+            get_campaign_cache().invalidate()
+        return result
+    
+    def update_campaign_status(self, campaign_id, status, campaign=None):
+        # Status-only PATCH; only backends without it (404/405) get a full PUT, so outages never double the writes
+        try:
+            response = self.session.patch(f"{self.base_url}/campaigns/{campaign_id}", json={'status': status}, timeout=30)
+            if response.status_code == 200:
+                return response.json()
+        except (requests.exceptions.RequestException, ValueError):
+            return None
+        
+        if response.status_code not in (404, 405) or campaign is None:
+            return None
+        update_data = {
+            "name": campaign['name'],
+            "message_template": campaign['message_template'],
+            "audience_type": campaign.get('audience_type'),
+            "status": status
+        }
+        return self._make_request('PUT', f'/campaigns/{campaign_id}', data=update_data, silent=True)
     
     def delete_campaign(self, campaign_id):
-        return self._make_request('DELETE', f'/campaigns/{campaign_id}', success_message="🗑️ Campaign deleted!")
+        result = self._make_request('DELETE', f'/campaigns/{campaign_id}', success_message="🗑️ Campaign deleted!")
+        if result:
+            get_campaign_cache().invalidate()
+        return result
+    
+    def get_campaign_stats(self, campaign_id, silent=False):
+        return self._make_request('GET', f'/campaigns/{campaign_id}/stats', silent=silent)
     
-    def get_campaign_stats(self, campaign_id):
-        return self._make_request('GET', f'/campaigns/{campaign_id}/stats')
+    def get_campaign_stats_batch(self, campaign_ids):
+        # Older backends have no batch endpoint; callers fall back to get_campaign_stats
+        ids = ",".join(str(campaign_id) for campaign_id in campaign_ids)
+        return self._make_request('GET', '/campaigns/stats', params={'ids': ids}, silent=True)
+    
+    def send_campaign_messages(self, campaign_id, messages):
+        # Called from dispatch worker threads, so failures are returned rather than shown
+        return self._make_request('POST', f'/campaigns/{campaign_id}/deliveries', data={'messages': messages}, silent=True)
     
     # ================================
     # AI & ANALYTICS METHODS
     # ================================
     
-    def generate_ai_message(self, objective):
-        return self._make_request('GET', '/ai/generate-message', params={'objective': objective})
+    def generate_ai_message(self, objective, silent=False):
+        return self._make_request('GET', '/ai/generate-message', params={'objective': objective}, silent=silent)
+    
+    def parse_segment_text(self, text):
+        return self._make_request('POST', '/ai/parse-segment', data={'text': text})
     
     def get_dashboard_stats(self):
         return self._make_request('GET', '/analytics/dashboard')
@@ -123,4 +196,12 @@ class APIClient:
         return self._make_request('GET', '/analytics/customer-segments')
     
     def preview_segment(self, rules):
-        return self._make_request('POST', '/segments/preview', data=rules)
+        # Equivalent rule sets share one cached preview across reruns and users
+        canonical = canonicalize(rules)
+        if not canonical.satisfiable:
+            return {"audience_size": 0, "sample_customers": []}
+        
+        return get_preview_cache().get_or_set(
+            canonical.key,
+            lambda: self._make_request('POST', '/segments/preview', data=canonical.rules)
+        )
@@ -0,0 +1,179 @@
+"""
+Packed bitmaps for segment predicates, cached across sessions
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import streamlit as st
+
+# Default memory budget of the shared predicate cache
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def _popcount(bits):
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(bits).sum(dtype=np.int64))
+    return int(_POPCOUNT[bits].sum(dtype=np.int64))
+
+def popcount_rows(bits):
+    """Number of set bits in each row of a 2-D unsigned integer array"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bits).sum(axis=1, dtype=np.int64)
+    rows = np.ascontiguousarray(bits).view(np.uint8).reshape(len(bits), -1)
+    return _POPCOUNT[rows].sum(axis=1, dtype=np.int64)
+
+class Bitmap:
+    """Set of customer rows packed 8 per byte"""
+
+    __slots__ = ('bits', 'size')
+
+    def __init__(self, bits, size):
+        self.bits = bits
+        self.size = size
+
+    @classmethod
+    def from_mask(cls, mask):
+        """Pack a boolean mask"""
+        mask = np.asarray(mask, dtype=bool)
+        return cls(np.packbits(mask), len(mask))
+
+    @classmethod
+    def empty(cls, size):
+        """Bitmap with no rows set"""
+        return cls(np.zeros((size + 7) // 8, dtype=np.uint8), size)
+
+    @classmethod
+    def full(cls, size):
+        """Bitmap with every row set"""
+        return ~cls.empty(size)
+
+    def to_mask(self):
+        """Unpack into a boolean mask"""
+        return np.unpackbits(self.bits, count=self.size).astype(bool)
+
+    def count(self):
+        """Number of rows set"""
+        return _popcount(self.bits)
+
+    def any(self):
+        """Whether any row is set"""
+        return bool(self.bits.any())
+
+    def first(self, k):
+        """Row indices of the first k rows set"""
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        # Only unpack the leading non-empty bytes that can hold k rows
+        nonzero = np.flatnonzero(self.bits)
+        rows = []
+        found = 0
+        for byte_index in nonzero:
+            byte_rows = np.flatnonzero(np.unpackbits(self.bits[byte_index:byte_index + 1])) + byte_index * 8
+            rows.append(byte_rows)
+            found += len(byte_rows)
+            if found >= k:
+                break
+
+        if not rows:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(rows)[:k]
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def __and__(self, other):
+        return Bitmap(np.bitwise_and(self.bits, other.bits), self.size)
+
+    def __or__(self, other):
+        return Bitmap(np.bitwise_or(self.bits, other.bits), self.size)
+
+    def __invert__(self):
+        bits = np.invert(self.bits)
+        # Clear the padding bits past the last row
+        padding = len(bits) * 8 - self.size
+        if padding:
+            bits[-1] &= (0xFF << padding) & 0xFF
+        return Bitmap(bits, self.size)
+
+    def __len__(self):
+        return self.size
+
+class PredicateBitmapCache:
+    """LRU cache of predicate bitmaps shared by every session.
+
+    Keys combine the customer data version with a normalized predicate, so
+    marketers building overlapping segments reuse each other's work. The
+    cache is bounded by total bitmap bytes and tracks hit rates.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._bitmaps = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Get a cached bitmap or None"""
+        with self._lock:
+            bitmap = self._bitmaps.get(key)
+            if bitmap is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._bitmaps.move_to_end(key)
+            return bitmap
+
+    def put(self, key, bitmap):
+        """Store a bitmap, evicting least recently used ones over the budget"""
+        with self._lock:
+            old = self._bitmaps.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+
+            self._bitmaps[key] = bitmap
+            self._bytes += bitmap.nbytes
+
+            while self._bytes > self.max_bytes and len(self._bitmaps) > 1:
+                _, evicted = self._bitmaps.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Get a bitmap, building it from compute() -> mask on a miss"""
+        bitmap = self.get(key)
+        if bitmap is None:
+            bitmap = Bitmap.from_mask(compute())
+            self.put(key, bitmap)
+        return bitmap
+
+    def invalidate(self, version=None):
+        """Drop bitmaps of one data version (or all of them)"""
+        with self._lock:
+            for key in [k for k in self._bitmaps if version is None or k[0] == version]:
+                self._bytes -= self._bitmaps.pop(key).nbytes
+
+    def stats(self):
+        """Describe cache usage and how often it saved a recomputation"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._bitmaps),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+@st.cache_resource
+def get_bitmap_cache():
+    """Get the predicate bitmap cache shared by this server process"""
+    return PredicateBitmapCache()
@@ -0,0 +1,91 @@
+"""
+Delivery stats of many campaigns, loaded in batches or concurrently and cached
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from utils.helpers import TTLCache
+
+# Seconds loaded stats are reused before they're fetched again
+CAMPAIGN_STATS_TTL = 60
+
+# Per-campaign stats requests in flight at once when there's no batch endpoint
+CAMPAIGN_STATS_WORKERS = 8
+
+# Seconds before a backend without the batch endpoint is probed again
+BATCH_RETRY_AFTER = 10 * 60
+
+def _by_campaign(response, campaign_ids):
+    """Map a batch response ({id: stats} or [stats with campaign_id]) to {id: stats}"""
+    wanted = {str(campaign_id): campaign_id for campaign_id in campaign_ids}
+    if isinstance(response, dict):
+        response = response.get("stats", response)
+    if isinstance(response, dict):
+        items = response.items()
+    elif isinstance(response, list):
+        items = ((stats.get("campaign_id"), stats) for stats in response if isinstance(stats, dict))
+    else:
+        return None
+
+    return {wanted[str(key)]: stats for key, stats in items if str(key) in wanted and isinstance(stats, dict)}
+
+class CampaignStatsLoader:
+    """Load stats for a list of campaigns in one go.
+
+    Stats come from the batch endpoint when the backend has one, otherwise
+    from concurrent per-campaign requests. Loaded stats are cached for
+    CAMPAIGN_STATS_TTL seconds; failed loads are not cached.
+    """
+
+    def __init__(self, ttl=CAMPAIGN_STATS_TTL, max_workers=CAMPAIGN_STATS_WORKERS):
+        self.cache = TTLCache(maxsize=4096, ttl=ttl)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="campaign-stats")
+        self._batch_unsupported_at = None
+        self._lock = threading.Lock()
+
+    def load(self, api_client, campaign_ids, force=False):
+        """Get {campaign_id: stats or None} for every id"""
+        if force:
+            self.invalidate(campaign_ids)
+
+        stats = {campaign_id: self.cache.get(campaign_id) for campaign_id in campaign_ids}
+        missing = [campaign_id for campaign_id, value in stats.items() if value is None]
+        if missing:
+            loaded = self._load_batch(api_client, missing)
+            if loaded is None:
+                loaded = dict(zip(missing, self._executor.map(
+                    lambda campaign_id: api_client.get_campaign_stats(campaign_id, silent=True), missing
+                )))
+            for campaign_id, value in loaded.items():
+                if value:
+                    self.cache.set(campaign_id, value)
+                    stats[campaign_id] = value
+        return stats
+
+    def invalidate(self, campaign_ids=None):
+        """Drop cached stats of some campaigns, or all of them"""
+        if campaign_ids is None:
+            self.cache.clear()
+            return
+        for campaign_id in campaign_ids:
+            self.cache.delete(campaign_id)
+
+    def _load_batch(self, api_client, campaign_ids):
+        """Load through the batch endpoint, None when the backend doesn't have one"""
+        with self._lock:
+            if self._batch_unsupported_at and time.time() - self._batch_unsupported_at < BATCH_RETRY_AFTER:
+                return None
+
+        loaded = _by_campaign(api_client.get_campaign_stats_batch(campaign_ids), campaign_ids)
+        with self._lock:
+            self._batch_unsupported_at = None if loaded is not None else time.time()
+        return loaded
+
+@st.cache_resource
+def get_campaign_stats_loader():
+    """Get the campaign stats loader shared by every session"""
+    return CampaignStatsLoader()
@@ -0,0 +1,109 @@
+"""
+Shared campaign list cache and bulk status transitions
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+# Seconds the campaign list is reused before it's fetched again
+CAMPAIGN_CACHE_TTL = 30
+
+# Status patches in flight at once during a bulk transition
+BULK_WORKERS = 16
+
+CAMPAIGN_STATUSES = ["active", "paused", "completed", "draft", "archived"]
+
+# Bulk action: (statuses it applies to, status it sets)
+BULK_TRANSITIONS = {
+    "pause": ({"active"}, "paused"),
+    "resume": ({"paused"}, "active"),
+    "archive": ({"active", "paused", "completed", "draft"}, "archived"),
+}
+
+class CampaignCache:
+    """Hold the campaign list for every session, patched in place after status changes"""
+
+    def __init__(self, ttl=CAMPAIGN_CACHE_TTL):
+        self.ttl = ttl
+        self._campaigns = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def get(self, api_client, force=False):
+        """Get a copy of the campaign list, reloading it when stale"""
+        with self._lock:
+            fresh = self._campaigns is not None and time.time() - self._loaded_at < self.ttl
+            if fresh and not force:
+                return [dict(campaign) for campaign in self._campaigns]
+
+        campaigns = api_client.get_campaigns(empty_on_error=False)
+        with self._lock:
+            if campaigns is None:
+                # A failed fetch isn't cached: keep serving the last list and retry next time
+                return [dict(campaign) for campaign in self._campaigns or []]
+            self._campaigns = [dict(campaign) for campaign in campaigns]
+            self._loaded_at = time.time()
+        return [dict(campaign) for campaign in campaigns]
+
+    def apply(self, updates):
+        """Patch cached campaigns with {campaign_id: {field: value}}"""
+        with self._lock:
+            for campaign in self._campaigns or []:
+                if campaign.get("id") in updates:
+                    campaign.update(updates[campaign["id"]])
+
+    def invalidate(self):
+        """Force a reload on next access"""
+        with self._lock:
+            self._loaded_at = 0
+
+@st.cache_resource
+def get_campaign_cache():
+    """Get the campaign list cache shared by every session"""
+    return CampaignCache()
+
+def bulk_transition(api_client, campaigns, action, cache=None, max_workers=BULK_WORKERS):
+    """Apply a bulk action ("pause", "resume" or "archive") to many campaigns.
+
+    Campaigns the action doesn't apply to are skipped. The new status is
+    applied to the cache up front and rolled back for campaigns whose patch
+    failed. Returns one {id, name, from, to, result, error} per campaign,
+    result being "updated", "failed" or "skipped".
+    """
+    allowed, target = BULK_TRANSITIONS[action]
+    eligible = [campaign for campaign in campaigns if campaign.get("status") in allowed]
+    results = [
+        {"id": c.get("id"), "name": c.get("name"), "from": c.get("status"), "to": c.get("status"),
+         "result": "skipped", "error": f"Can't {action} a {c.get('status')} campaign"}
+        for c in campaigns if c.get("status") not in allowed
+    ]
+
+    if cache is not None:
+        cache.apply({campaign["id"]: {"status": target} for campaign in eligible})
+
+    def patch(campaign):
+        return api_client.update_campaign_status(campaign["id"], target, campaign=campaign)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        responses = list(pool.map(patch, eligible))
+
+    rollback = {}
+    for campaign, response in zip(eligible, responses):
+        ok = response is not None
+        results.append({
+            "id": campaign["id"],
+            "name": campaign.get("name"),
+            "from": campaign.get("status"),
+            "to": target if ok else campaign.get("status"),
+            "result": "updated" if ok else "failed",
+            "error": None if ok else "Status update request failed",
+        })
+        if not ok:
+            rollback[campaign["id"]] = {"status": campaign.get("status")}
+
+    if cache is not None and rollback:
+        cache.apply(rollback)
+    return results
@@ -0,0 +1,105 @@
+"""
+Process-wide cache of customer and order data shared by all sessions
+"""
+
+import threading
+import time
+
+import streamlit as st
+
+from utils.records import CustomerTable, OrderTable
+
+# Seconds before cached tables are reloaded from the backend
+DEFAULT_TTL = 60
+
+class DataStore:
+    """Hold one columnar copy of customers/orders for every session.
+
+    Each dataset carries a version number that only changes when a reload
+    returns different contents, so derived caches can key on it.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._listeners = []
+
+    def customers(self, api_client, force=False, silent=False):
+        """Get the shared CustomerTable, reloading it when stale.
+
+        silent=True is for job worker threads: a failed load raises
+        RuntimeError instead of showing a Streamlit error.
+        """
+        if silent:
+            loader = lambda: api_client.get_customers(silent=True, empty_on_error=False)
+        else:
+            loader = api_client.get_customers
+        return self._get("customers", loader, CustomerTable, force)
+
+    def orders(self, api_client, force=False):
+        """Get the shared OrderTable, reloading it when stale"""
+        return self._get("orders", api_client.get_orders, OrderTable, force)
+
+    def version(self, name):
+        """Get the current data version of a dataset (0 if never loaded)"""
+        entry = self._entries.get(name)
+        return entry["version"] if entry else 0
+
+    def loaded_at(self, name):
+        """Get when a dataset was last loaded (epoch seconds)"""
+        entry = self._entries.get(name)
+        return entry["loaded_at"] if entry else None
+
+    def peek(self, name):
+        """Get a cached table without triggering a reload"""
+        entry = self._entries.get(name)
+        return entry["table"] if entry else None
+
+    def invalidate(self, name=None):
+        """Force a reload on next access"""
+        with self._lock:
+            for key, entry in self._entries.items():
+                if name is None or key == name:
+                    entry["loaded_at"] = 0
+
+    def on_load(self, callback):
+        """Register callback(name, table, version) run after a new version loads"""
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def _get(self, name, loader, table_cls, force):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry and not force and time.time() - entry["loaded_at"] < self.ttl:
+                return entry["table"]
+
+            records = loader()
+            if records is None:
+                # Only silent loaders return None; the cached table stays as it was
+                raise RuntimeError(f"{name} couldn't be loaded from the backend")
+            table = table_cls.from_records(records)
+            fingerprint = table.fingerprint()
+
+            if entry and entry["fingerprint"] == fingerprint:
+                entry["loaded_at"] = time.time()
+                return entry["table"]
+
+            version = entry["version"] + 1 if entry else 1
+            self._entries[name] = {
+                "table": table,
+                "version": version,
+                "fingerprint": fingerprint,
+                "loaded_at": time.time(),
+            }
+
+            for callback in self._listeners:
+                callback(name, table, version)
+
+            return table
+
+@st.cache_resource
+def get_data_store():
+    """Get the DataStore shared by every session of this server process"""
+    return DataStore()
@@ -0,0 +1,277 @@
+"""
+Chunked, rate-limited campaign dispatch through pluggable delivery adapters
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+from utils.templates import compile_template
+
+# Messages per delivery request
+DISPATCH_CHUNK_SIZE = 100
+
+# Messages per second allowed through the token bucket
+DISPATCH_RATE = 200
+
+# Delivery requests in flight at once
+DISPATCH_WORKERS = 4
+
+# ACCEPTED: handed to the backend, which reports delivery through campaign stats
+DELIVERED, ACCEPTED, FAILED = "delivered", "accepted", "failed"
+
+class DeliveryAdapter:
+    """Send batches of rendered messages to a delivery vendor.
+
+    send() takes a list of {customer_id, to, body} dicts and returns one
+    {customer_id, status, error} result per message, status being
+    DELIVERED, ACCEPTED or FAILED. It is called from worker threads, so adapters
+    must not touch Streamlit.
+    """
+
+    name = "base"
+
+    def send(self, messages):
+        raise NotImplementedError
+
+class StubDeliveryAdapter(DeliveryAdapter):
+    """Local stand-in vendor: waits a little and fails a share of messages"""
+
+    name = "stub"
+
+    def __init__(self, failure_rate=0.05, latency=0.02, seed=None):
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def send(self, messages):
+        time.sleep(self.latency)
+        results = []
+        with self._lock:
+            for message in messages:
+                if not message.get("to"):
+                    results.append({"customer_id": message["customer_id"], "status": FAILED, "error": "No phone number"})
+                elif self._random.random() < self.failure_rate:
+                    results.append({"customer_id": message["customer_id"], "status": FAILED, "error": "Vendor rejected message"})
+                else:
+                    results.append({"customer_id": message["customer_id"], "status": DELIVERED, "error": None})
+        return results
+
+class APIDeliveryAdapter(DeliveryAdapter):
+    """Hand batches to the backend's delivery endpoint for one campaign"""
+
+    name = "api"
+
+    def __init__(self, api_client, campaign_id):
+        self.api_client = api_client
+        self.campaign_id = campaign_id
+
+    def send(self, messages):
+        response = self.api_client.send_campaign_messages(self.campaign_id, messages)
+        if response is None:
+            return [{"customer_id": m["customer_id"], "status": FAILED, "error": "Delivery request failed"} for m in messages]
+
+        # The backend reports per-message results, or just accepts the batch;
+        # an accepted message isn't known to be delivered yet
+        results = response.get("results") if isinstance(response, dict) else None
+        if results is None:
+            return [{"customer_id": m["customer_id"], "status": ACCEPTED, "error": None} for m in messages]
+        return results
+
+def delivery_adapter_name():
+    """Get the configured DELIVERY_ADAPTER ("stub" or "api"), None when the backend sends"""
+    adapter = os.getenv("DELIVERY_ADAPTER", "").strip().lower()
+    return adapter if adapter in ("stub", "api") else None
+
+def get_delivery_adapter(api_client, campaign_id):
+    """Pick the delivery adapter from DELIVERY_ADAPTER ("stub" or "api").
+
+    Client-side sending is opt-in: when DELIVERY_ADAPTER isn't set this
+    returns None and callers leave sending to the backend.
+    """
+    adapter = delivery_adapter_name()
+    if adapter == "stub":
+        return StubDeliveryAdapter()
+    if adapter == "api":
+        return APIDeliveryAdapter(api_client, campaign_id)
+    return None
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if available right now"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1, cancel=None):
+        """Block until tokens are available (or `cancel` is set), returning whether they were taken"""
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait_for = (tokens - self._tokens) / self.rate
+            if cancel is not None and cancel.wait(wait_for):
+                return False
+            if cancel is None:
+                time.sleep(wait_for)
+
+class DispatchProgress:
+    """Live counters of one dispatch, safe to read while it runs"""
+
+    def __init__(self, total):
+        self.total = total
+        self.total_sent = 0
+        self.delivered = 0
+        self.accepted = 0
+        self.failed = 0
+        self.errors = {}
+        self.failed_ids = []
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self.cancelled = False
+        self._lock = threading.Lock()
+
+    def record(self, results):
+        """Count one batch of delivery results"""
+        with self._lock:
+            for result in results:
+                self.total_sent += 1
+                if result.get("status") == DELIVERED:
+                    self.delivered += 1
+                elif result.get("status") == ACCEPTED:
+                    self.accepted += 1
+                else:
+                    self.failed += 1
+                    self.failed_ids.append(result.get("customer_id"))
+                    error = result.get("error") or "Unknown error"
+                    self.errors[error] = self.errors.get(error, 0) + 1
+
+    def snapshot(self):
+        """Get the counters plus throughput and ETA"""
+        with self._lock:
+            elapsed = (self.finished_at or time.monotonic()) - self.started_at
+            rate = self.total_sent / elapsed if elapsed > 0 else 0.0
+            remaining = self.total - self.total_sent
+            return {
+                "total": self.total,
+                "total_sent": self.total_sent,
+                "delivered": self.delivered,
+                "accepted": self.accepted,
+                "failed": self.failed,
+                "errors": dict(self.errors),
+                "elapsed_s": elapsed,
+                "rate_per_s": rate,
+                "eta_s": remaining / rate if rate and self.finished_at is None else None,
+                "done": self.finished_at is not None,
+                "cancelled": self.cancelled,
+            }
+
+def _values(data, field):
+    """Get one field as plain Python values from a list of dicts or a record table"""
+    if isinstance(data, list):
+        return [row.get(field) for row in data]
+    return np.asarray(data[field]).tolist()
+
+class CampaignDispatcher:
+    """Render and send a campaign's messages in rate-limited chunks.
+
+    The audience is rendered one chunk at a time with the compiled template,
+    each chunk waits for tokens in the bucket and is handed to a worker
+    pool with at most `max_workers` requests in flight. Progress callbacks
+    run on the calling thread, which may itself be a background job.
+    """
+
+    def __init__(self, adapter, rate=DISPATCH_RATE, chunk_size=DISPATCH_CHUNK_SIZE, max_workers=DISPATCH_WORKERS, cancel=None):
+        self.adapter = adapter
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.bucket = TokenBucket(rate, capacity=max(rate, chunk_size))
+        # An outside event (such as a job's) can cancel the dispatch too
+        self._cancel = cancel or threading.Event()
+
+    def cancel(self):
+        """Stop submitting new chunks; chunks in flight still finish"""
+        self._cancel.set()
+
+    def _messages(self, compiled, chunk):
+        bodies = compiled.render_column(chunk).tolist()
+        ids = _values(chunk, "id")
+        phones = _values(chunk, "phone")
+        return [{"customer_id": c, "to": to, "body": body} for c, to, body in zip(ids, phones, bodies)]
+
+    def _send(self, messages):
+        try:
+            return self.adapter.send(messages)
+        except Exception as e:
+            return [{"customer_id": m["customer_id"], "status": FAILED, "error": str(e) or type(e).__name__} for m in messages]
+
+    def dispatch(self, template, audience, on_progress=None, progress=None):
+        """Send `template` to every customer of `audience` (list of dicts or record table).
+
+        Returns the DispatchProgress, whose counters are also passed to
+        on_progress(snapshot) after every completed chunk.
+        """
+        compiled = compile_template(template)
+        progress = progress or DispatchProgress(len(audience))
+        in_flight = set()
+
+        def collect(block):
+            if block:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            else:
+                done = {future for future in in_flight if future.done()}
+            for future in done:
+                in_flight.discard(future)
+                progress.record(future.result())
+                if on_progress:
+                    on_progress(progress.snapshot())
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for start in range(0, len(audience), self.chunk_size):
+                if self._cancel.is_set():
+                    break
+
+                chunk = audience[start:start + self.chunk_size]
+                messages = self._messages(compiled, chunk)
+
+                while len(in_flight) >= self.max_workers:
+                    collect(block=True)
+                if not self.bucket.acquire(len(messages), cancel=self._cancel):
+                    break
+
+                in_flight.add(pool.submit(self._send, messages))
+                collect(block=False)
+
+            while in_flight:
+                collect(block=True)
+
+        progress.cancelled = self._cancel.is_set()
+        progress.finished_at = time.monotonic()
+        if on_progress:
+            on_progress(progress.snapshot())
+        return progress
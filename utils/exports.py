@@ -0,0 +1,176 @@
+"""
+Bulk campaign exports streamed to NDJSON, CSV or ZIP files
+"""
+
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+
+from utils.segment_overlap import campaign_rules
+
+# Format: (MIME type, file extension)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "zip": ("application/zip", "zip"),
+}
+
+# Campaigns whose stats are loaded per request
+EXPORT_BATCH_SIZE = 100
+
+# Audience rows materialized at a time
+AUDIENCE_CHUNK_SIZE = 10000
+
+# Seconds export files are kept before later exports delete them
+EXPORT_RETENTION = 30 * 60
+
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "mini-crm-exports")
+
+CAMPAIGN_COLUMNS = [
+    "id", "name", "status", "audience_type", "audience_size", "created_by", "created_at",
+    "message_template", "segment_rules", "derived_rules", "total_sent", "delivered", "failed", "delivery_rate",
+]
+
+AUDIENCE_COLUMNS = ["id", "name", "email", "phone", "total_spend", "total_orders"]
+
+def campaign_record(campaign, stats=None):
+    """Flatten a campaign and its stats into one export record.
+
+    segment_rules is exported as stored; when a campaign has none, the
+    rules its audience type maps to go under derived_rules instead.
+    """
+    stats = stats or {}
+    rules = campaign_rules(campaign)
+    return {
+        "id": campaign.get("id"),
+        "name": campaign.get("name"),
+        "status": campaign.get("status"),
+        "audience_type": campaign.get("audience_type"),
+        "audience_size": campaign.get("audience_size"),
+        "created_by": campaign.get("created_by"),
+        "created_at": campaign.get("created_at"),
+        "message_template": campaign.get("message_template"),
+        "segment_rules": campaign.get("segment_rules"),
+        "derived_rules": None if rules is campaign.get("segment_rules") else rules,
+        "total_sent": stats.get("total_sent"),
+        "delivered": stats.get("delivered"),
+        "failed": stats.get("failed"),
+        "delivery_rate": stats.get("delivery_rate"),
+    }
+
+def campaign_records(campaigns, load_stats=None, on_progress=None):
+    """Yield export records, loading stats a batch of campaigns at a time"""
+    for start in range(0, len(campaigns), EXPORT_BATCH_SIZE):
+        batch = campaigns[start:start + EXPORT_BATCH_SIZE]
+        stats = load_stats([campaign["id"] for campaign in batch]) if load_stats else {}
+        for campaign in batch:
+            yield campaign_record(campaign, stats.get(campaign["id"]))
+        if on_progress:
+            on_progress(start + len(batch), len(campaigns))
+
+def audience_chunks(engine, campaign):
+    """Yield a campaign's audience as record tables of AUDIENCE_CHUNK_SIZE rows"""
+    rules = campaign_rules(campaign)
+    if engine is None or rules is None:
+        return
+    rows = np.flatnonzero(engine.mask(rules))
+    for start in range(0, len(rows), AUDIENCE_CHUNK_SIZE):
+        yield engine.table.take(rows[start:start + AUDIENCE_CHUNK_SIZE])
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return "" if value is None else value
+
+def write_ndjson(out, campaigns, load_stats=None, engine=None, on_progress=None):
+    """Write one JSON line per campaign, with its audience ids when an engine is given"""
+    for record in campaign_records(campaigns, load_stats, on_progress):
+        if engine is not None and campaign_rules(record) is not None:
+            # Ids go out chunk by chunk inside the line, never as one big list
+            out.write(json.dumps(record)[:-1] + ', "audience_ids": [')
+            first = True
+            for chunk in audience_chunks(engine, record):
+                ids = ", ".join(str(int(customer_id)) for customer_id in chunk["id"])
+                if ids:
+                    out.write(ids if first else ", " + ids)
+                    first = False
+            out.write("]}\n")
+        else:
+            out.write(json.dumps(record) + "\n")
+
+def write_csv(out, campaigns, load_stats=None, on_progress=None):
+    """Write one CSV row per campaign (segment rules as JSON)"""
+    writer = csv.DictWriter(out, fieldnames=CAMPAIGN_COLUMNS)
+    writer.writeheader()
+    for record in campaign_records(campaigns, load_stats, on_progress):
+        writer.writerow({key: _csv_value(value) for key, value in record.items()})
+
+def write_zip(out, campaigns, load_stats=None, engine=None, on_progress=None):
+    """Write campaigns.csv and campaigns.ndjson, plus audiences/<id>.csv per campaign when an engine is given"""
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open("campaigns.csv", "w") as raw, io.TextIOWrapper(raw, encoding="utf-8", newline="") as text:
+            write_csv(text, campaigns, load_stats, on_progress)
+
+        with archive.open("campaigns.ndjson", "w") as raw, io.TextIOWrapper(raw, encoding="utf-8") as text:
+            write_ndjson(text, campaigns, load_stats)
+
+        if engine is None:
+            return
+
+        for campaign in campaigns:
+            name = f"audiences/{campaign['id']}.csv"
+            with archive.open(name, "w") as raw, io.TextIOWrapper(raw, encoding="utf-8", newline="") as text:
+                header = True
+                for chunk in audience_chunks(engine, campaign):
+                    frame = chunk.to_frame().reindex(columns=AUDIENCE_COLUMNS)
+                    frame.to_csv(text, header=header, index=False)
+                    header = False
+                if header:
+                    text.write(",".join(AUDIENCE_COLUMNS) + "\n")
+
+def _prune_exports(now=None):
+    """Delete export files older than EXPORT_RETENTION"""
+    now = time.time() if now is None else now
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > EXPORT_RETENTION:
+                os.remove(path)
+        except OSError:
+            continue
+
+def export_campaigns(campaigns, fmt, load_stats=None, engine=None, on_progress=None):
+    """Stream an export of campaigns to a temporary file and return its path.
+
+    Records are written as they're built, a stats batch and an audience
+    chunk at a time, so memory stays flat however many campaigns or
+    customers are exported. Pass an engine to include audience lists
+    (NDJSON and ZIP only).
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'")
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    _prune_exports()
+    fd, path = tempfile.mkstemp(prefix="campaigns-", suffix="." + EXPORT_FORMATS[fmt][1], dir=EXPORT_DIR)
+
+    try:
+        if fmt == "zip":
+            with os.fdopen(fd, "wb") as out:
+                write_zip(out, campaigns, load_stats, engine, on_progress)
+        else:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as out:
+                if fmt == "ndjson":
+                    write_ndjson(out, campaigns, load_stats, engine, on_progress)
+                else:
+                    write_csv(out, campaigns, load_stats, on_progress)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
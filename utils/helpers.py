@@ -3,8 +3,18 @@ Helper utility functions for the Mini CRM Platform frontend
 """
 
 import streamlit as st
-from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 import re
+import sys
+import threading
+import time
+
+# Upper bound on distinct ISO strings kept by the date parsing cache
+DATE_CACHE_SIZE = 65536
 
 def format_currency(amount):
     """Format amount as Indian Rupees"""
@@ -12,13 +22,21 @@ def format_currency(amount):
         return "₹0"
     return f"₹{amount:,.0f}"
 
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _parse_iso(date_string):
+    """Parse ISO date string once, repeated strings are served from the cache"""
+    try:
+        return datetime.fromisoformat(date_string.replace('Z', '+00:00'))
+    except Exception:
+        return None
+
 def format_date(date_string):
     """Format ISO date string for display"""
     if not date_string:
         return "Never"
     
     try:
-        date_obj = datetime.fromisoformat(date_string.replace('Z', '+00:00'))
+        date_obj = _parse_iso(date_string)
         return date_obj.strftime("%d %b %Y")
     except:
         return "Invalid Date"
@@ -29,7 +47,7 @@ def format_datetime(datetime_string):
         return "Never"
     
     try:
-        dt_obj = datetime.fromisoformat(datetime_string.replace('Z', '+00:00'))
+        dt_obj = _parse_iso(datetime_string)
         return dt_obj.strftime("%d %b %Y, %I:%M %p")
     except:
         return "Invalid Date"
@@ -40,7 +58,7 @@ def calculate_days_ago(date_string):
         return None
     
     try:
-        date_obj = datetime.fromisoformat(date_string.replace('Z', '+00:00'))
+        date_obj = _parse_iso(date_string)
         days_diff = (datetime.now(date_obj.tzinfo) - date_obj).days
         return days_diff
     except:
@@ -48,8 +66,10 @@ def calculate_days_ago(date_string):
 
 def format_days_ago(date_string):
     """Format date as 'X days ago' or 'Today' etc."""
-    days = calculate_days_ago(date_string)
-    
+    return _days_ago_label(calculate_days_ago(date_string))
+
+def _days_ago_label(days):
+    """Turn a day count into a relative label"""
     if days is None:
         return "Never"
     elif days == 0:
@@ -68,6 +88,95 @@ def format_days_ago(date_string):
         years = days // 365
         return f"{years} year{'s' if years > 1 else ''} ago"
 
+# ================================
+# COLUMNAR DATE HELPERS
+# ================================
+
+_DATE_VALID, _DATE_MISSING, _DATE_INVALID = 0, 1, 2
+
+def _factorize_dates(values):
+    """Parse each distinct value of a date column once.
+
+    Returns the row codes plus per-unique parsed datetimes and states. The
+    arrays carry one extra trailing slot for missing values so that code -1
+    (pandas' NA sentinel) indexes straight into it.
+    """
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    parsed = [None] * (len(uniques) + 1)
+    states = np.full(len(uniques) + 1, _DATE_MISSING, dtype=np.int8)
+    
+    for i, value in enumerate(uniques):
+        if not value:
+            continue
+        parsed[i] = _parse_iso(str(value))
+        states[i] = _DATE_INVALID if parsed[i] is None else _DATE_VALID
+    
+    return codes, parsed, states
+
+def _to_utc64(date_obj):
+    """Convert a datetime to naive UTC datetime64 (naive input is local time)"""
+    try:
+        return np.datetime64(date_obj.astimezone(timezone.utc).replace(tzinfo=None), 'ns')
+    except (OverflowError, ValueError, OSError):
+        return np.datetime64('NaT', 'ns')
+
+def parse_date_column(values):
+    """Parse a column of ISO strings into UTC datetime64 (NaT if missing/invalid)"""
+    if isinstance(values, np.ndarray) and np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]')
+    
+    codes, parsed, states = _factorize_dates(values)
+    uniques = np.array(
+        [_to_utc64(d) if d is not None else np.datetime64('NaT', 'ns') for d in parsed],
+        dtype='datetime64[ns]'
+    )
+    return uniques[codes]
+
+def calculate_days_ago_column(values, now=None):
+    """Calculate days between each date and now (NaN if missing/invalid)"""
+    if now is None:
+        now = datetime.now(timezone.utc)
+    now = _to_utc64(now)
+    
+    delta = now - parse_date_column(values)
+    return np.floor(delta / np.timedelta64(1, 'D'))
+
+def _format_column(values, fmt):
+    """Format a date column with strftime, once per distinct value"""
+    codes, parsed, states = _factorize_dates(values)
+    labels = np.empty(len(parsed), dtype=object)
+    
+    for i, date_obj in enumerate(parsed):
+        if states[i] == _DATE_VALID:
+            labels[i] = date_obj.strftime(fmt)
+        elif states[i] == _DATE_INVALID:
+            labels[i] = "Invalid Date"
+        else:
+            labels[i] = "Never"
+    
+    return labels[codes]
+
+def format_date_column(values):
+    """Format a column of ISO date strings for display"""
+    return _format_column(values, "%d %b %Y")
+
+def format_datetime_column(values):
+    """Format a column of ISO datetime strings for display"""
+    return _format_column(values, "%d %b %Y, %I:%M %p")
+
+def format_days_ago_column(values, now=None):
+    """Format a column of dates as 'X days ago' labels"""
+    days = calculate_days_ago_column(values, now=now)
+    known = ~np.isnan(days)
+    
+    # Labels only depend on the day count, so build one per distinct count
+    counts, inverse = np.unique(days[known].astype(np.int64), return_inverse=True)
+    labels = np.array([_days_ago_label(int(d)) for d in counts], dtype=object)
+    
+    result = np.full(len(days), "Never", dtype=object)
+    result[known] = labels[inverse.ravel()]
+    return result
+
 def validate_email(email):
     """Validate email format"""
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -84,34 +193,125 @@ def validate_phone(phone):
     # Should be 10 digits (Indian mobile) or 11 digits (with country code)
     return len(digits_only) in [10, 11]
 
-def get_customer_status(customer):
+# Days since last order at which a customer stops being Active / At Risk
+STATUS_THRESHOLDS = {"active": 30, "at_risk": 90}
+
+# Minimum (total_spend, total_orders) for each tier, either one qualifies
+TIER_THRESHOLDS = {
+    "VIP": (50000, 10),
+    "Premium": (20000, 5),
+    "Regular": (5000, 2),
+}
+
+# Status and tier codes index into these tables
+CUSTOMER_STATUSES = [
+    ("New", "🆕", "#17a2b8"),
+    ("Active", "🟢", "#28a745"),
+    ("At Risk", "🟡", "#ffc107"),
+    ("Inactive", "🔴", "#dc3545"),
+]
+
+CUSTOMER_TIERS = [
+    ("New", "🆕", "#9e9e9e"),
+    ("Regular", "👤", "#2196f3"),
+    ("Premium", "⭐", "#ff9800"),
+    ("VIP", "💎", "#8e24aa"),
+]
+
+def get_customer_status(customer, thresholds=None):
     """Get customer status based on activity"""
+    thresholds = {**STATUS_THRESHOLDS, **(thresholds or {})}
     last_order_days = calculate_days_ago(customer.get('last_order_date'))
-    total_spend = customer.get('total_spend', 0)
-    total_orders = customer.get('total_orders', 0)
     
     if not last_order_days:
-        return "New", "🆕", "#17a2b8"
-    elif last_order_days <= 30:
-        return "Active", "🟢", "#28a745"
-    elif last_order_days <= 90:
-        return "At Risk", "🟡", "#ffc107"
+        return CUSTOMER_STATUSES[0]
+    elif last_order_days <= thresholds["active"]:
+        return CUSTOMER_STATUSES[1]
+    elif last_order_days <= thresholds["at_risk"]:
+        return CUSTOMER_STATUSES[2]
     else:
-        return "Inactive", "🔴", "#dc3545"
+        return CUSTOMER_STATUSES[3]
 
-def get_customer_tier(customer):
+def get_customer_tier(customer, thresholds=None):
     """Get customer tier based on spend and orders"""
+    thresholds = {**TIER_THRESHOLDS, **(thresholds or {})}
     total_spend = customer.get('total_spend', 0)
     total_orders = customer.get('total_orders', 0)
     
-    if total_spend >= 50000 or total_orders >= 10:
-        return "VIP", "💎", "#8e24aa"
-    elif total_spend >= 20000 or total_orders >= 5:
-        return "Premium", "⭐", "#ff9800"
-    elif total_spend >= 5000 or total_orders >= 2:
-        return "Regular", "👤", "#2196f3"
-    else:
-        return "New", "🆕", "#9e9e9e"
+    for code in range(len(CUSTOMER_TIERS) - 1, 0, -1):
+        min_spend, min_orders = thresholds[CUSTOMER_TIERS[code][0]]
+        if total_spend >= min_spend or total_orders >= min_orders:
+            return CUSTOMER_TIERS[code]
+    return CUSTOMER_TIERS[0]
+
+# ================================
+# VECTORIZED CLASSIFICATION
+# ================================
+
+def _get_column(data, key, default=None):
+    """Get one column from a list of dicts or a columnar frame"""
+    if isinstance(data, list):
+        return [row.get(key, default) for row in data]
+    return data[key]
+
+def classify_activity(days_since_last_order, thresholds=None):
+    """Get status codes (index into CUSTOMER_STATUSES) from days since last order"""
+    thresholds = {**STATUS_THRESHOLDS, **(thresholds or {})}
+    days = np.asarray(days_since_last_order, dtype=float)
+    
+    codes = np.full(len(days), 3, dtype=np.int8)
+    codes[days <= thresholds["at_risk"]] = 2
+    codes[days <= thresholds["active"]] = 1
+    # Same as get_customer_status: no orders, or an order placed today, is New
+    codes[np.isnan(days) | (days == 0)] = 0
+    return codes
+
+def get_customer_status_codes(last_order_dates, thresholds=None, now=None):
+    """Get status codes for a whole last_order_date column"""
+    return classify_activity(calculate_days_ago_column(last_order_dates, now=now), thresholds)
+
+def get_customer_tier_codes(total_spend, total_orders, thresholds=None):
+    """Get tier codes (index into CUSTOMER_TIERS) for whole spend/order columns"""
+    thresholds = {**TIER_THRESHOLDS, **(thresholds or {})}
+    spend = np.nan_to_num(np.asarray(total_spend, dtype=float))
+    orders = np.nan_to_num(np.asarray(total_orders, dtype=float))
+    
+    codes = np.zeros(len(spend), dtype=np.int8)
+    for code in range(1, len(CUSTOMER_TIERS)):
+        min_spend, min_orders = thresholds[CUSTOMER_TIERS[code][0]]
+        codes[(spend >= min_spend) | (orders >= min_orders)] = code
+    return codes
+
+def classify_customers(customers, status_thresholds=None, tier_thresholds=None, now=None):
+    """Get (status_codes, tier_codes) for a list of customers or a columnar frame"""
+    status_codes = get_customer_status_codes(
+        _get_column(customers, 'last_order_date'), status_thresholds, now=now
+    )
+    tier_codes = get_customer_tier_codes(
+        _get_column(customers, 'total_spend', 0),
+        _get_column(customers, 'total_orders', 0),
+        tier_thresholds
+    )
+    return status_codes, tier_codes
+
+def count_by_code(codes, table):
+    """Count codes into a {label: count} dict following the table order"""
+    counts = np.bincount(np.asarray(codes, dtype=np.int64), minlength=len(table))
+    return {label: int(count) for (label, _, _), count in zip(table, counts)}
+
+def count_customer_tiers(customers, thresholds=None):
+    """Count customers per tier, e.g. {"New": 10, "Regular": 4, ...}"""
+    codes = get_customer_tier_codes(
+        _get_column(customers, 'total_spend', 0),
+        _get_column(customers, 'total_orders', 0),
+        thresholds
+    )
+    return count_by_code(codes, CUSTOMER_TIERS)
+
+def count_customer_statuses(customers, thresholds=None, now=None):
+    """Count customers per activity status"""
+    codes = get_customer_status_codes(_get_column(customers, 'last_order_date'), thresholds, now=now)
+    return count_by_code(codes, CUSTOMER_STATUSES)
 
 def show_success_message(message, duration=3):
     """Show animated success message"""
@@ -147,7 +347,8 @@ def format_campaign_status(status):
         "active": ("🟢 Active", "#28a745"),
         "paused": ("⏸️ Paused", "#ffc107"),
         "completed": ("✅ Completed", "#17a2b8"),
-        "draft": ("📝 Draft", "#6c757d")
+        "draft": ("📝 Draft", "#6c757d"),
+        "archived": ("🗄️ Archived", "#6c757d")
     }
     
     return status_map.get(status.lower(), ("❓ Unknown", "#6c757d"))
@@ -185,6 +386,21 @@ def create_progress_bar(current, total, label="Progress"):
     st.write(f"**{label}:** {current}/{total} ({percentage:.1f}%)")
     st.progress(percentage / 100)
 
+def fragment(func=None, run_every=None):
+    """Decorate func as a Streamlit fragment that reruns on its own.
+
+    Uses st.fragment, or st.experimental_fragment on older Streamlit; when
+    neither exists the function just runs as part of the full script.
+    """
+    decorator = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+    
+    def wrap(f):
+        if decorator is None:
+            return f
+        return decorator(f, run_every=run_every)
+    
+    return wrap(func) if func is not None else wrap
+
 def sanitize_filename(filename):
     """Sanitize filename for safe file operations"""
     # Remove invalid characters
@@ -202,9 +418,193 @@ def truncate_text(text, max_length=50):
         return text
     return text[:max_length-3] + "..."
 
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ttl seconds"""
+    
+    def __init__(self, maxsize=256, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key, default=None):
+        """Get a live value or default"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[1] > self.ttl:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+    
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def get_or_set(self, key, compute):
+        """Get a value, storing compute() on a miss (None results aren't cached)"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.set(key, value)
+        return value
+    
+    def delete(self, key):
+        """Drop one entry"""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def stats(self):
+        """Describe cache usage"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+def estimate_size(obj, seen=None):
+    """Approximate the bytes held by nested dicts, lists and scalars"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, seen) + estimate_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, seen) for item in obj)
+    elif isinstance(obj, np.ndarray):
+        # An array owning its buffer already counts it in getsizeof; a view doesn't
+        if obj.base is not None:
+            size += obj.nbytes
+    elif hasattr(obj, 'nbytes') and not isinstance(obj, (pd.Series, pd.Index)):
+        size += obj.nbytes
+    return size
+
+class SessionScope:
+    """Namespaced, bounded slice of session state.
+    
+    Entries are kept in LRU order with their size and last access time.
+    Expired entries (ttl seconds without access) and, once max_keys or
+    max_bytes is exceeded, least recently used entries are evicted.
+    """
+    
+    def __init__(self, namespace, max_keys=None, ttl=None, max_bytes=None):
+        self.namespace = namespace
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._storage_key = f"{SessionManager.SCOPE_PREFIX}{namespace}"
+        
+        if self._storage_key not in st.session_state:
+            st.session_state[self._storage_key] = OrderedDict()
+    
+    @property
+    def _entries(self):
+        return st.session_state[self._storage_key]
+    
+    def get(self, key, default=None):
+        """Get value from the scope, refreshing its LRU position"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        if self._expired(entry):
+            del self._entries[key]
+            return default
+        
+        entry["accessed"] = time.time()
+        self._entries.move_to_end(key)
+        return entry["value"]
+    
+    def set(self, key, value):
+        """Set value in the scope, evicting old entries if over the limits"""
+        self._entries[key] = {"value": value, "accessed": time.time(), "size": estimate_size(value)}
+        self._entries.move_to_end(key)
+        self.evict()
+        SessionManager.enforce_memory_limit()
+    
+    def delete(self, key):
+        """Delete key from the scope"""
+        self._entries.pop(key, None)
+    
+    def has(self, key):
+        """Check if a live key exists in the scope"""
+        entry = self._entries.get(key)
+        return entry is not None and not self._expired(entry)
+    
+    def clear(self):
+        """Remove every key of the scope"""
+        self._entries.clear()
+    
+    def keys(self):
+        """List keys in LRU order (oldest first)"""
+        return list(self._entries)
+    
+    def size_bytes(self):
+        """Get the estimated bytes held by the scope"""
+        return sum(entry["size"] for entry in self._entries.values())
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def evict(self):
+        """Drop expired entries, then LRU entries beyond max_keys/max_bytes"""
+        for key in [k for k, entry in self._entries.items() if self._expired(entry)]:
+            del self._entries[key]
+        
+        while self.max_keys is not None and len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+        
+        while self.max_bytes is not None and self._entries and self.size_bytes() > self.max_bytes:
+            self._entries.popitem(last=False)
+    
+    def stats(self):
+        """Describe the scope for introspection"""
+        entries = self._entries
+        now = time.time()
+        return {
+            "namespace": self.namespace,
+            "keys": len(entries),
+            "bytes": self.size_bytes(),
+            "max_keys": self.max_keys,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "oldest_idle_seconds": now - min((e["accessed"] for e in entries.values()), default=now),
+        }
+    
+    def _expired(self, entry):
+        return self.ttl is not None and time.time() - entry["accessed"] > self.ttl
+
 class SessionManager:
     """Manage Streamlit session state"""
     
+    # Session state key prefix under which scopes keep their entries
+    SCOPE_PREFIX = "_scope_"
+    
+    # Per-session cap on bytes held by all scopes together
+    MAX_SESSION_BYTES = 5 * 1024 * 1024
+    
     @staticmethod
     def get(key, default=None):
         """Get value from session state"""
@@ -230,49 +630,188 @@ class SessionManager:
     def has(key):
         """Check if key exists in session state"""
         return key in st.session_state
+    
+    @staticmethod
+    def scope(namespace, max_keys=200, ttl=None, max_bytes=None):
+        """Get a namespaced scope for UI flags and other short-lived keys"""
+        return SessionScope(namespace, max_keys=max_keys, ttl=ttl, max_bytes=max_bytes)
+    
+    @staticmethod
+    def _scope_storages():
+        prefix = SessionManager.SCOPE_PREFIX
+        return {
+            key[len(prefix):]: value
+            for key, value in st.session_state.items()
+            if isinstance(key, str) and key.startswith(prefix)
+        }
+    
+    @staticmethod
+    def enforce_memory_limit(limit=None):
+        """Evict least recently used scope entries until the session fits the limit"""
+        limit = SessionManager.MAX_SESSION_BYTES if limit is None else limit
+        storages = SessionManager._scope_storages()
+        total = sum(entry["size"] for entries in storages.values() for entry in entries.values())
+        
+        # Oldest entries across every scope go first
+        candidates = sorted(
+            (entry["accessed"], namespace, key)
+            for namespace, entries in storages.items()
+            for key, entry in entries.items()
+        )
+        for _, namespace, key in candidates:
+            if total <= limit:
+                break
+            total -= storages[namespace].pop(key)["size"]
+        return total
+    
+    @staticmethod
+    def stats():
+        """Describe session state usage: key count, estimated bytes and scopes"""
+        storages = SessionManager._scope_storages()
+        scopes = {
+            namespace: {
+                "keys": len(entries),
+                "bytes": sum(entry["size"] for entry in entries.values()),
+            }
+            for namespace, entries in storages.items()
+        }
+        return {
+            "keys": len(st.session_state),
+            "bytes": sum(estimate_size(value) for value in st.session_state.values()),
+            "limit_bytes": SessionManager.MAX_SESSION_BYTES,
+            "scopes": scopes,
+        }
+
+# ================================
+# TABLE RENDERING
+# ================================
+
+# Columns rendered as currency by the table renderer
+CURRENCY_COLUMNS = ['total_spend', 'order_value']
 
-def render_data_table(data, columns=None, key=None):
-    """Render data as a nice table without pandas dependency"""
+PAGE_SIZE_OPTIONS = [10, 25, 50, 100]
+
+def _is_date_column(col):
+    """Check whether a column holds ISO dates by naming convention"""
+    return col.endswith('_date') or col.endswith('_at')
+
+def format_currency_column(values):
+    """Format a numeric column as Indian Rupees (blank if missing)"""
+    numbers = pd.to_numeric(pd.Series(values), errors='coerce')
+    return numbers.map(lambda amount: f"₹{amount:,.0f}" if amount == amount else "").to_numpy(dtype=object)
+
+def format_table_column(col, values):
+    """Format one column for display based on its name and dtype"""
+    if _is_date_column(col):
+        return format_date_column(values)
+    if col in CURRENCY_COLUMNS:
+        return format_currency_column(values)
+    
+    series = pd.Series(values)
+    if pd.api.types.is_float_dtype(series):
+        return series.map(lambda value: f"{value:.2f}" if value == value else "").to_numpy(dtype=object)
+    return series.to_numpy()
+
+def _sort_key(col):
+    """Sort key for a frame column, parsing dates so they order chronologically"""
+    if _is_date_column(col):
+        return lambda series: pd.Series(parse_date_column(series.to_numpy()), index=series.index)
+    return None
+
+def to_frame(data, columns=None):
+    """Build a columnar frame from a list of dicts, a record table or a frame"""
+    if isinstance(data, pd.DataFrame):
+        frame = data
+    elif hasattr(data, 'to_frame'):
+        frame = data.to_frame()
+    else:
+        frame = pd.DataFrame(data)
+    if columns:
+        frame = frame.reindex(columns=columns)
+    return frame
+
+def render_paged_table(data, columns=None, *, key, page_size=25, sort_by=None, descending=False, extra=None):
+    """Render data as a sortable, paged table.
+    
+    Sorting runs on the raw columns and only the visible page is formatted
+    and sent to st.dataframe, so cost per rerun scales with the page size.
+    extra(window) may return {column: values} added for the visible rows only,
+    for columns that are expensive to compute (they aren't sortable).
+    key names the table's widgets and must be unique on the page.
+    """
+    if data is None or len(data) == 0:
+        st.info("📄 No data to display")
+        return None
+    
+    frame = to_frame(data, columns)
+    cols = list(frame.columns)
+    
+    col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
+    
+    with col1:
+        sort_options = ["(none)"] + cols
+        sort_col = st.selectbox(
+            "Sort by",
+            sort_options,
+            index=sort_options.index(sort_by) if sort_by in cols else 0,
+            key=f"{key}_sort_by"
+        )
+    
+    with col2:
+        descending = st.checkbox("Descending", value=descending, key=f"{key}_descending")
+    
+    with col3:
+        page_size = st.selectbox(
+            "Rows per page",
+            PAGE_SIZE_OPTIONS,
+            index=PAGE_SIZE_OPTIONS.index(page_size) if page_size in PAGE_SIZE_OPTIONS else 1,
+            key=f"{key}_page_size"
+        )
+    
+    total_rows = len(frame)
+    total_pages = max(1, -(-total_rows // page_size))
+    
+    # The page lives in session state only: seed it, or clamp one left over from a larger dataset
+    page_key = f"{key}_page"
+    if page_key not in st.session_state:
+        st.session_state[page_key] = 1
+    elif st.session_state[page_key] > total_pages:
+        st.session_state[page_key] = total_pages
+    
+    with col4:
+        page = st.number_input("Page", min_value=1, max_value=total_pages, step=1, key=page_key)
+    
+    if sort_col != "(none)":
+        frame = frame.sort_values(
+            sort_col,
+            ascending=not descending,
+            na_position='last',
+            kind='stable',
+            key=_sort_key(sort_col)
+        )
+    
+    start = (int(page) - 1) * page_size
+    window = frame.iloc[start:start + page_size]
+    if extra is not None:
+        window = window.assign(**extra(window))
+    
+    visible = pd.DataFrame(
+        {col: format_table_column(col, window[col].to_numpy()) for col in window.columns},
+        index=window.index
+    )
+    
+    st.dataframe(visible, hide_index=True, use_container_width=True)
+    st.caption(f"Showing {start + 1}-{start + len(window)} of {total_rows} rows (page {int(page)} of {total_pages})")
+    return window
+
+def render_data_table(data, columns=None, *, key):
+    """Render data as a paged table (see render_paged_table; key must be unique on the page)"""
     if not data:
         st.info("📄 No data to display")
         return
     
-    # If data is a list of dictionaries, convert to table format
-    if isinstance(data, list) and data and isinstance(data[0], dict):
-        # Get column names
-        if columns:
-            cols = columns
-        else:
-            cols = list(data[0].keys())
-        
-        # Create table rows
-        table_data = []
-        for item in data:
-            row = []
-            for col in cols:
-                value = item.get(col, "")
-                # Format special fields
-                if col.endswith('_date') or col.endswith('_at'):
-                    value = format_date(str(value)) if value else "Never"
-                elif col in ['total_spend', 'order_value'] and value:
-                    value = format_currency(float(value))
-                elif isinstance(value, float):
-                    value = f"{value:.2f}"
-                row.append(str(value))
-            table_data.append(row)
-        
-        # Display table
-        if table_data:
-            # Create markdown table
-            header = "| " + " | ".join(cols) + " |"
-            separator = "| " + " | ".join(["---"] * len(cols)) + " |"
-            
-            table_md = [header, separator]
-            for row in table_data:
-                row_md = "| " + " | ".join(row) + " |"
-                table_md.append(row_md)
-            
-            st.markdown("\n".join(table_md))
+    if isinstance(data, list) and isinstance(data[0], dict):
+        render_paged_table(data, columns=columns, key=key)
     else:
         st.write(data)
 
@@ -280,10 +819,17 @@ def render_data_table(data, columns=None, key=None):
 __all__ = [
     'format_currency', 'format_date', 'format_datetime',
     'calculate_days_ago', 'format_days_ago',
+    'parse_date_column', 'calculate_days_ago_column',
+    'format_date_column', 'format_datetime_column', 'format_days_ago_column',
     'validate_email', 'validate_phone',
     'get_customer_status', 'get_customer_tier',
+    'STATUS_THRESHOLDS', 'TIER_THRESHOLDS', 'CUSTOMER_STATUSES', 'CUSTOMER_TIERS',
+    'classify_activity', 'get_customer_status_codes', 'get_customer_tier_codes',
+    'classify_customers', 'count_by_code', 'count_customer_tiers', 'count_customer_statuses',
     'show_success_message', 'show_error_message', 'show_warning_message', 'show_info_message',
     'create_metric_card', 'format_campaign_status', 'calculate_delivery_rate',
-    'format_large_number', 'create_progress_bar',
-    'truncate_text', 'SessionManager', 'render_data_table'
+    'format_large_number', 'create_progress_bar', 'fragment',
+    'truncate_text', 'TTLCache', 'estimate_size', 'SessionScope', 'SessionManager',
+    'format_currency_column', 'format_table_column', 'to_frame',
+    'render_paged_table', 'render_data_table'
 ]
@@ -0,0 +1,197 @@
+"""
+Process-wide background jobs with progress, cancellation and retained results
+"""
+
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+# Long jobs (launches, exports, scheduled sends) running at once across every session
+JOB_WORKERS = 4
+
+# Workers kept for short interactive jobs (AI suggestions, audience counts),
+# so long jobs filling JOB_WORKERS can't starve them
+INTERACTIVE_WORKERS = 2
+
+# Seconds a finished job (and its result) is kept for pages to pick up
+JOB_RETENTION = 30 * 60
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+class JobCancelled(Exception):
+    """Raised inside a job function to stop it early"""
+
+class Job:
+    """One unit of background work and its live status.
+
+    The job function receives the Job and reports through update(); it
+    should check `cancelled` (or wait on `cancel_event`) between steps and
+    may raise JobCancelled. Jobs run on worker threads, so they must not
+    touch Streamlit.
+    """
+
+    def __init__(self, job_id, kind, label=None, owner=None):
+        self.id = job_id
+        self.kind = kind
+        self.label = label or kind
+        self.owner = owner
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = ""
+        self.details = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        """Whether cancellation was requested"""
+        return self.cancel_event.is_set()
+
+    @property
+    def done(self):
+        return self.status in FINISHED
+
+    def update(self, progress=None, message=None, **details):
+        """Report progress (0-1), a status message and extra details"""
+        with self._lock:
+            if progress is not None:
+                self.progress = min(max(float(progress), 0.0), 1.0)
+            if message is not None:
+                self.message = message
+            self.details.update(details)
+
+    def wait(self, timeout=None):
+        """Block until the job finishes, returning its result"""
+        if self.future is not None:
+            self.future.exception(timeout)
+        return self.result
+
+    def snapshot(self):
+        """Get the job's status as a plain dict, safe to read while it runs"""
+        with self._lock:
+            end = self.finished_at or time.time()
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "label": self.label,
+                "owner": self.owner,
+                "status": self.status,
+                "progress": self.progress,
+                "message": self.message,
+                "details": dict(self.details),
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "elapsed_s": end - self.started_at if self.started_at else 0.0,
+                "done": self.status in FINISHED,
+                "cancel_requested": self.cancel_event.is_set(),
+            }
+
+class JobManager:
+    """Run jobs on shared worker pools and keep them for JOB_RETENTION seconds.
+
+    Pages submit() work and keep the job id; status is read back with
+    get() on later (fragment) reruns, so no script thread waits on it.
+    Interactive jobs get a pool of their own, separate from long ones.
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, interactive_workers=INTERACTIVE_WORKERS, retention=JOB_RETENTION):
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="jobs")
+        self._interactive = ThreadPoolExecutor(max_workers=interactive_workers, thread_name_prefix="jobs-interactive")
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, kind, func, *args, label=None, owner=None, interactive=False, **kwargs):
+        """Queue func(job, *args, **kwargs) and return its Job.
+
+        Pass interactive=True for short jobs a user is waiting on; they run
+        on their own pool so long jobs never hold them up.
+        """
+        self._prune()
+        executor = self._interactive if interactive else self._executor
+        with self._lock:
+            job = Job(f"{kind}-{next(self._ids)}", kind, label, owner)
+            self._jobs[job.id] = job
+            job.future = executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        """Get a job by id, None if unknown or expired"""
+        self._prune()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Ask a job to stop; queued jobs never start"""
+        job = self.get(job_id)
+        if job is None or job.done:
+            return False
+        job.cancel_event.set()
+        return True
+
+    def jobs(self, owner=None, kind=None, active=None):
+        """List jobs, newest first, optionally filtered by owner, kind and activity"""
+        self._prune()
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return sorted(
+            (
+                job for job in jobs
+                if (owner is None or job.owner == owner)
+                and (kind is None or job.kind == kind)
+                and (active is None or active != job.done)
+            ),
+            key=lambda job: job.created_at,
+            reverse=True,
+        )
+
+    def _run(self, job, func, args, kwargs):
+        if job.cancelled:
+            self._finish(job, CANCELLED)
+            return
+        with job._lock:
+            job.status = RUNNING
+            job.started_at = time.time()
+        try:
+            result = func(job, *args, **kwargs)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            self._finish(job, FAILED, error=str(e) or type(e).__name__)
+        else:
+            self._finish(job, CANCELLED if job.cancelled else SUCCEEDED, result=result)
+
+    def _finish(self, job, status, result=None, error=None):
+        with job._lock:
+            job.status = status
+            job.result = result
+            job.error = error
+            job.finished_at = time.time()
+            if status == SUCCEEDED:
+                job.progress = 1.0
+
+    def _prune(self):
+        """Drop finished jobs older than the retention period"""
+        cutoff = time.time() - self.retention
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.finished_at and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+@st.cache_resource
+def get_job_manager():
+    """Get the job manager shared by every session of this server process"""
+    return JobManager()
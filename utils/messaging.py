@@ -0,0 +1,147 @@
+"""
+SMS encoding, segment counting and bulk personalization of message templates
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from utils.templates import compile_template
+
+# GSM 03.38 basic character set, one septet each
+GSM7_BASIC = set(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞ\x1bÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+
+# GSM 03.38 extension table, escaped into two septets each
+GSM7_EXTENDED = set("^{}\\[~]|€\f")
+
+GSM7, UCS2 = "GSM-7", "UCS-2"
+
+# Units per message: (single part, each part of a concatenated message)
+SMS_LIMITS = {GSM7: (160, 153), UCS2: (70, 67)}
+
+# Default price of one SMS part, in ₹
+SMS_COST_PER_SEGMENT = 0.25
+
+def non_gsm_characters(text):
+    """Get the characters that force a message into UCS-2"""
+    return sorted({char for char in text if char not in GSM7_BASIC and char not in GSM7_EXTENDED})
+
+def message_encoding(text):
+    """Get the encoding an SMS gateway will pick for a text"""
+    return GSM7 if not non_gsm_characters(text) else UCS2
+
+def message_units(text, encoding=None):
+    """Get a text's length in septets (GSM-7) or UTF-16 code units (UCS-2)"""
+    encoding = encoding or message_encoding(text)
+    if encoding == GSM7:
+        return len(text) + sum(1 for char in text if char in GSM7_EXTENDED)
+    # Characters outside the BMP (most emoji) take a surrogate pair
+    return len(text.encode("utf-16-le")) // 2
+
+def segment_count(units, encoding):
+    """Number of SMS parts needed for a message length in units"""
+    single, multi = SMS_LIMITS[encoding]
+    if units <= single:
+        return 1 if units else 0
+    return math.ceil(units / multi)
+
+def sms_segments(text):
+    """Get (encoding, units, segments) of one message"""
+    encoding = message_encoding(text)
+    units = message_units(text, encoding)
+    return encoding, units, segment_count(units, encoding)
+
+def personalize(template, data, chunk_size=100000):
+    """Yield the message of each customer, rendering a chunk at a time"""
+    compiled = compile_template(template)
+    for chunk in compiled.render_chunks(data, chunk_size):
+        yield from chunk
+
+def _segments_vector(units, gsm):
+    """Vectorized segment_count over units with a per-message encoding flag"""
+    single = np.where(gsm, SMS_LIMITS[GSM7][0], SMS_LIMITS[UCS2][0])
+    multi = np.where(gsm, SMS_LIMITS[GSM7][1], SMS_LIMITS[UCS2][1])
+    segments = np.where(units <= single, 1, -(-units // multi))
+    return np.where(units > 0, segments, 0)
+
+def _measure_column(column):
+    """Get per-row (gsm, septets, utf16 units, characters), measuring each distinct value once"""
+    codes, unique = pd.factorize(pd.Series(column, dtype=object))
+    gsm = np.array([message_encoding(value) == GSM7 for value in unique], dtype=bool)
+    septets = np.array([message_units(value, GSM7) for value in unique], dtype=np.int64)
+    utf16 = np.array([message_units(value, UCS2) for value in unique], dtype=np.int64)
+    chars = np.array([len(value) for value in unique], dtype=np.int64)
+    return gsm[codes], septets[codes], utf16[codes], chars[codes]
+
+def message_stats(template, data, cost_per_segment=SMS_COST_PER_SEGMENT):
+    """Size up a template personalized for a whole audience.
+
+    A message is the template's static text plus its placeholder values,
+    so encoding and length are measured once per distinct value of each
+    placeholder and summed with numpy instead of rendering every message.
+    data is a list of customer dicts or a record table. Returns per-message
+    lengths (characters), units and segments alongside totals and cost.
+    """
+    compiled = compile_template(template)
+    count = len(data)
+    static = compiled.static_text
+
+    gsm = np.full(count, message_encoding(static) == GSM7)
+    septets = np.full(count, message_units(static, GSM7), dtype=np.int64)
+    utf16 = np.full(count, message_units(static, UCS2), dtype=np.int64)
+    lengths = np.full(count, len(static), dtype=np.int64)
+
+    columns = {key: _measure_column(column) for key, column in compiled.format_columns(data).items()}
+    for placeholder in compiled.placeholders:
+        field_gsm, field_septets, field_utf16, field_chars = columns[placeholder]
+        gsm &= field_gsm
+        septets += field_septets
+        utf16 += field_utf16
+        lengths += field_chars
+
+    units = np.where(gsm, septets, utf16)
+    segments = _segments_vector(units, gsm)
+
+    total_segments = int(segments.sum())
+    longest = int(np.argmax(lengths)) if count else None
+    return {
+        "messages": count,
+        "encodings": {GSM7: int(gsm.sum()), UCS2: int((~gsm).sum())},
+        "non_gsm_characters": non_gsm_characters(static),
+        "lengths": lengths,
+        "units": units,
+        "segments": segments,
+        "segment_counts": {int(k): int(v) for k, v in zip(*np.unique(segments, return_counts=True))},
+        "total_segments": total_segments,
+        "cost": total_segments * cost_per_segment,
+        "longest_message": compiled.render_column(data[longest:longest + 1])[0] if longest is not None else None,
+    }
+
+def delivery_estimate(template, data, total=None, cost_per_segment=SMS_COST_PER_SEGMENT):
+    """Summarize message_stats for display, without the per-message arrays.
+
+    data may be a sample of the audience: pass the audience size as total
+    and the counts and cost are scaled up from the sample to it.
+    """
+    stats = message_stats(template, data, cost_per_segment)
+    count = stats["messages"]
+    total = count if total is None else total
+    scale = total / count if count else 0.0
+    lengths = stats["lengths"]
+
+    total_segments = round(stats["total_segments"] * scale)
+    return {
+        "messages": total,
+        "sample_size": count,
+        "encodings": {encoding: round(n * scale) for encoding, n in stats["encodings"].items()},
+        "non_gsm_characters": stats["non_gsm_characters"],
+        "lengths": (int(lengths.min()), int(lengths.max()), float(np.median(lengths))) if count else None,
+        "segment_counts": {segments: round(n * scale) for segments, n in stats["segment_counts"].items()},
+        "total_segments": total_segments,
+        "cost": total_segments * cost_per_segment,
+        "longest_message": stats["longest_message"],
+    }
@@ -0,0 +1,274 @@
+"""
+Compact columnar storage for customer and order records
+"""
+
+import sys
+import hashlib
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils.helpers import parse_date_column, estimate_size
+
+# Column kinds understood by RecordTable
+INT, FLOAT, BOOL, DATE, CATEGORY, TEXT, OBJECT = "int", "float", "bool", "date", "category", "text", "object"
+
+_DTYPES = {
+    INT: np.int64,
+    FLOAT: np.float64,
+    BOOL: np.bool_,
+}
+
+class RecordView(Mapping):
+    """Read-only dict-like view of one row of a RecordTable"""
+
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, key):
+        return self._table.value(self._index, key)
+
+    def __iter__(self):
+        return iter(self._table.fields)
+
+    def __len__(self):
+        return len(self._table.fields)
+
+    def to_dict(self):
+        """Copy the row into a plain dict"""
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"RecordView({self.to_dict()!r})"
+
+class RecordTable(Sequence):
+    """Struct-of-arrays table of API records.
+
+    Numeric fields live in typed numpy arrays, dates in datetime64 (UTC),
+    categorical strings as small integer codes into an interned category
+    list. Indexing with an int returns a RecordView so code written against
+    lists of dicts keeps working; indexing with a field name returns the
+    whole column.
+    """
+
+    # field -> kind, subclasses describe the API payload
+    SCHEMA = {}
+
+    def __init__(self, columns, kinds, categories=None, length=0):
+        self._columns = columns
+        self._kinds = kinds
+        self._categories = categories or {}
+        self._length = length
+        self.fields = list(columns)
+
+    @classmethod
+    def from_records(cls, records):
+        """Build a table from a list of dicts returned by the API"""
+        records = list(records or [])
+        kinds = dict(cls.SCHEMA)
+
+        # Keep unexpected fields from the backend as plain object columns
+        for record in records:
+            for field in record:
+                if field not in kinds:
+                    kinds[field] = OBJECT
+
+        columns = {}
+        categories = {}
+        for field, kind in kinds.items():
+            values = [record.get(field) for record in records]
+            columns[field], field_categories = _encode(values, kind)
+            if field_categories is not None:
+                categories[field] = field_categories
+
+        return cls(columns, kinds, categories, len(records))
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.column(key)
+        if isinstance(key, slice):
+            return self.take(np.arange(self._length)[key])
+        if key < 0:
+            key += self._length
+        if not 0 <= key < self._length:
+            raise IndexError("record index out of range")
+        return RecordView(self, key)
+
+    def __contains__(self, item):
+        if isinstance(item, str):
+            return item in self._columns
+        return super().__contains__(item)
+
+    def kind(self, field):
+        """Get the storage kind of a field"""
+        return self._kinds[field]
+
+    def column(self, field):
+        """Get a whole column (categories are decoded to strings)"""
+        if self._kinds[field] == CATEGORY:
+            return self.categories(field)[self.codes(field)]
+        return self._columns[field]
+
+    def codes(self, field):
+        """Get integer codes of a categorical field (-1 for missing)"""
+        return self._columns[field]
+
+    def categories(self, field):
+        """Get the category labels of a categorical field.
+
+        The array carries a trailing None so code -1 decodes to missing.
+        """
+        return self._categories[field]
+
+    def value(self, index, field):
+        """Get a single value as the API would have returned it"""
+        if field not in self._columns:
+            raise KeyError(field)
+
+        kind = self._kinds[field]
+        value = self._columns[field][index]
+
+        if kind == CATEGORY:
+            return self._categories[field][value]
+        if kind == DATE:
+            if np.isnat(value):
+                return None
+            return np.datetime_as_string(value, unit='s') + "+00:00"
+        if kind == FLOAT:
+            return None if np.isnan(value) else float(value)
+        if kind == INT:
+            return int(value)
+        if kind == BOOL:
+            return bool(value)
+        return value
+
+    def take(self, indices):
+        """Get a new table holding only the given rows"""
+        indices = np.asarray(indices, dtype=np.int64)
+        columns = {field: column[indices] for field, column in self._columns.items()}
+        return type(self)(columns, dict(self._kinds), self._categories, len(indices))
+
+    def to_dicts(self):
+        """Convert back to the list of dicts representation"""
+        return [row.to_dict() for row in self]
+
+    def to_frame(self):
+        """Convert to a pandas DataFrame (categorical fields stay categorical)"""
+        data = {}
+        for field, kind in self._kinds.items():
+            if kind == CATEGORY:
+                labels = list(self._categories[field][:-1])
+                data[field] = pd.Categorical.from_codes(self._columns[field], categories=labels)
+            else:
+                data[field] = self._columns[field]
+        return pd.DataFrame(data)
+
+    def fingerprint(self):
+        """Hash the table contents, used to tell data versions apart"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(str(self._length).encode())
+        for field, kind in self._kinds.items():
+            digest.update(field.encode())
+            column = self._columns[field]
+            if kind in (TEXT, OBJECT):
+                digest.update(pd.util.hash_array(column.astype(str)).tobytes())
+            else:
+                digest.update(np.ascontiguousarray(column).tobytes())
+                if kind == CATEGORY:
+                    digest.update("\x00".join(map(str, self._categories[field][:-1])).encode())
+        return digest.hexdigest()
+
+    def memory_usage(self):
+        """Get bytes used per column, including referenced string objects"""
+        usage = {}
+        for field, column in self._columns.items():
+            size = column.nbytes
+            if column.dtype == object:
+                size += sum(sys.getsizeof(value) for value in _distinct_objects(column))
+            if field in self._categories:
+                size += sum(sys.getsizeof(value) for value in self._categories[field])
+            usage[field] = size
+        return usage
+
+class CustomerTable(RecordTable):
+    """Columnar customer records"""
+
+    SCHEMA = {
+        "id": INT,
+        "name": TEXT,
+        "email": TEXT,
+        "phone": TEXT,
+        "total_spend": FLOAT,
+        "total_orders": INT,
+        "last_order_date": DATE,
+        "is_active": BOOL,
+        "created_at": DATE,
+    }
+
+class OrderTable(RecordTable):
+    """Columnar order records"""
+
+    SCHEMA = {
+        "id": INT,
+        "customer_id": INT,
+        "order_value": FLOAT,
+        "product_category": CATEGORY,
+        "status": CATEGORY,
+        "order_date": DATE,
+        "created_at": DATE,
+    }
+
+def _encode(values, kind):
+    """Encode a list of values into a column, returns (column, categories)"""
+    if kind == INT:
+        numbers = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
+        return numbers.fillna(0).to_numpy(dtype=_DTYPES[INT]), None
+    if kind == FLOAT:
+        numbers = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
+        return numbers.to_numpy(dtype=_DTYPES[FLOAT]), None
+    if kind == BOOL:
+        return np.array([bool(value) for value in values], dtype=_DTYPES[BOOL]), None
+    if kind == DATE:
+        return parse_date_column(values), None
+    if kind == CATEGORY:
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+        labels = np.array([sys.intern(str(label)) for label in uniques] + [None], dtype=object)
+        dtype = np.int8 if len(uniques) < 127 else np.int32
+        return codes.astype(dtype), labels
+
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column, None
+
+def _distinct_objects(column):
+    """Yield each distinct object referenced by an object column once"""
+    seen = set()
+    for value in column:
+        if value is not None and id(value) not in seen:
+            seen.add(id(value))
+            yield value
+
+def memory_report(records, table_cls=CustomerTable):
+    """Compare memory of a list of dicts against its columnar table"""
+    table = table_cls.from_records(records)
+    dict_bytes = estimate_size(records)
+    columns = table.memory_usage()
+    table_bytes = sum(columns.values())
+    rows = max(len(table), 1)
+
+    return {
+        "rows": len(table),
+        "dict_bytes": dict_bytes,
+        "table_bytes": table_bytes,
+        "dict_bytes_per_row": dict_bytes / rows,
+        "table_bytes_per_row": table_bytes / rows,
+        "savings_ratio": dict_bytes / table_bytes if table_bytes else None,
+        "columns": columns,
+    }
@@ -0,0 +1,348 @@
+"""
+Revenue cube over orders (category × status × day), kept current by order mutations
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data_store import get_data_store
+from utils.helpers import parse_date_column
+
+# Labels used for orders saved without a category or status
+DEFAULT_CATEGORY = "Other"
+DEFAULT_STATUS = "completed"
+
+# Extra days allocated when an order falls outside the cube's date range
+DAY_PADDING = 30
+
+DIMENSIONS = ("category", "status", "day")
+
+def _labels(table, field, default):
+    """Get (codes, labels) of a categorical order field, missing values mapped to default"""
+    codes = np.asarray(table.codes(field), dtype=np.int64)
+    labels = [label for label in table.categories(field)[:-1]]
+    if default not in labels:
+        labels.append(default)
+    return np.where(codes < 0, labels.index(default), codes), labels
+
+def _order_columns(table):
+    """Get category and status (codes, labels), UTC days, a dated mask and values of an OrderTable"""
+    category_codes, categories = _labels(table, "product_category", DEFAULT_CATEGORY)
+    status_codes, statuses = _labels(table, "status", DEFAULT_STATUS)
+
+    days = table["order_date"].astype("datetime64[D]")
+    missing = np.isnat(days)
+    days = np.where(missing, table["created_at"].astype("datetime64[D]"), days)
+    values = np.nan_to_num(np.asarray(table["order_value"], dtype=float))
+    return (category_codes, categories), (status_codes, statuses), days, ~np.isnat(days), values
+
+def _day(value):
+    """Get the UTC day of an ISO date string, None if missing or invalid"""
+    day = parse_date_column([value])[0]
+    return None if np.isnat(day) else day.astype("datetime64[D]")
+
+class RevenueCube:
+    """Dense revenue and order-count arrays indexed by [category, status, day].
+
+    Category × status totals are kept alongside the cube, so questions
+    without a date range are a single lookup; with one they sum a slice
+    of days. Either way the cost doesn't depend on the number of orders.
+    apply() and remove() adjust only the cells an order touches, using the
+    contribution recorded for each order id, and reconcile() folds in a
+    reloaded table the same way, so the cube is built once and maintained.
+    """
+
+    def __init__(self, categories, statuses, start, revenue, orders, contributions, version=0, undated=0):
+        self.categories = list(categories)
+        self.statuses = list(statuses)
+        self.start = start
+        self.revenue = revenue
+        self.orders = orders
+        self.cell_revenue = revenue.sum(axis=2)
+        self.cell_orders = orders.sum(axis=2)
+        self.version = version
+        self.undated = undated
+        self.mutations = 0
+        self._contributions = contributions
+        self._category_index = {label: i for i, label in enumerate(self.categories)}
+        self._status_index = {label: i for i, label in enumerate(self.statuses)}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def build(cls, table, version=0):
+        """Aggregate an OrderTable with one bincount per measure"""
+        (category_codes, categories), (status_codes, statuses), days, dated, values = _order_columns(table)
+        if dated.any():
+            start = days[dated].min()
+            day_codes = (days[dated] - start).astype(np.int64)
+            span = int(day_codes.max()) + 1
+        else:
+            start = np.datetime64("today", "D")
+            day_codes = np.empty(0, dtype=np.int64)
+            span = 1
+
+        shape = (len(categories), len(statuses), span)
+        flat = np.ravel_multi_index((category_codes[dated], status_codes[dated], day_codes), shape)
+        size = int(np.prod(shape))
+        revenue = np.bincount(flat, weights=values[dated], minlength=size).reshape(shape)
+        orders = np.bincount(flat, minlength=size).reshape(shape).astype(np.int64)
+
+        # Days are recorded as days since the epoch, so growing the day axis never rewrites them
+        contributions = {
+            int(order_id): (int(c), int(s), int(d), float(v))
+            for order_id, c, s, d, v in zip(
+                table["id"][dated], category_codes[dated], status_codes[dated],
+                days[dated].astype(np.int64), values[dated]
+            )
+        }
+        return cls(categories, statuses, start, revenue, orders, contributions, version, int((~dated).sum()))
+
+    @property
+    def days(self):
+        """Calendar days along the cube's day axis"""
+        return self.start + np.arange(self.revenue.shape[2])
+
+    # ================================
+    # INCREMENTAL UPDATES
+    # ================================
+
+    def apply(self, order):
+        """Add or replace one order's contribution (fields missing from a partial update keep their old values)"""
+        order_id = order.get("id")
+        if order_id is None:
+            return
+        with self._lock:
+            previous = self._contributions.get(int(order_id))
+            old_category, old_status, old_day = (
+                (self.categories[previous[0]], self.statuses[previous[1]], np.datetime64(previous[2], "D"))
+                if previous else (DEFAULT_CATEGORY, DEFAULT_STATUS, np.datetime64("today", "D"))
+            )
+
+            category = self._category(order.get("product_category") or old_category)
+            status = self._status(order.get("status") or old_status)
+            day = _day(order.get("order_date"))
+            day = _day(order.get("created_at")) if day is None else day
+            day = int((old_day if day is None else day).astype(np.int64))
+            self._reserve_day(day)
+            value = order.get("order_value")
+            value = float(value) if value is not None else (previous[3] if previous else 0.0)
+
+            if previous:
+                self._add(previous[0], previous[1], previous[2], -previous[3], -1)
+            self._add(category, status, day, value, 1)
+            self._contributions[int(order_id)] = (category, status, day, value)
+            self.mutations += 1
+
+    def remove(self, order_id):
+        """Take a deleted order's contribution out of the cube"""
+        with self._lock:
+            previous = self._contributions.pop(int(order_id), None)
+            if previous:
+                self._add(previous[0], previous[1], previous[2], -previous[3], -1)
+                self.mutations += 1
+
+    def reconcile(self, table, version):
+        """Bring the cube up to a reloaded order table, returning how many orders changed.
+
+        Only orders whose contribution differs are re-added, so a sync that
+        returns the mutations already applied touches no cells.
+        """
+        (category_codes, categories), (status_codes, statuses), days, dated, values = _order_columns(table)
+        with self._lock:
+            category_index = np.array([self._category(label) for label in categories], dtype=np.int64)
+            status_index = np.array([self._status(label) for label in statuses], dtype=np.int64)
+            day_numbers = days[dated].astype(np.int64)
+            if len(day_numbers):
+                self._reserve_day(int(day_numbers.min()))
+                self._reserve_day(int(day_numbers.max()))
+
+            current = {
+                int(order_id): (int(c), int(s), int(d), float(v))
+                for order_id, c, s, d, v in zip(
+                    table["id"][dated], category_index[category_codes[dated]],
+                    status_index[status_codes[dated]], day_numbers, values[dated]
+                )
+            }
+
+            changed = 0
+            for order_id in self._contributions.keys() - current.keys():
+                previous = self._contributions[order_id]
+                self._add(previous[0], previous[1], previous[2], -previous[3], -1)
+                changed += 1
+            for order_id, contribution in current.items():
+                previous = self._contributions.get(order_id)
+                if previous == contribution:
+                    continue
+                if previous:
+                    self._add(previous[0], previous[1], previous[2], -previous[3], -1)
+                self._add(contribution[0], contribution[1], contribution[2], contribution[3], 1)
+                changed += 1
+
+            self._contributions = current
+            self.version = version
+            self.undated = int((~dated).sum())
+            return changed
+
+    def _add(self, category, status, day, value, count):
+        day -= int(self.start.astype(np.int64))
+        self.revenue[category, status, day] += value
+        self.orders[category, status, day] += count
+        self.cell_revenue[category, status] += value
+        self.cell_orders[category, status] += count
+
+    def _category(self, label):
+        if label not in self._category_index:
+            self._category_index[label] = len(self.categories)
+            self.categories.append(label)
+            self._grow(axis=0, before=0, after=1)
+        return self._category_index[label]
+
+    def _status(self, label):
+        if label not in self._status_index:
+            self._status_index[label] = len(self.statuses)
+            self.statuses.append(label)
+            self._grow(axis=1, before=0, after=1)
+        return self._status_index[label]
+
+    def _reserve_day(self, day):
+        offset = day - int(self.start.astype(np.int64))
+        if offset < 0:
+            self._grow(axis=2, before=-offset + DAY_PADDING, after=0)
+            self.start = self.start + (offset - DAY_PADDING)
+        elif offset >= self.revenue.shape[2]:
+            self._grow(axis=2, before=0, after=offset - self.revenue.shape[2] + 1 + DAY_PADDING)
+
+    def _grow(self, axis, before, after):
+        pad = [(0, 0)] * 3
+        pad[axis] = (before, after)
+        self.revenue = np.pad(self.revenue, pad)
+        self.orders = np.pad(self.orders, pad)
+        if axis < 2:
+            self.cell_revenue = np.pad(self.cell_revenue, pad[:2])
+            self.cell_orders = np.pad(self.cell_orders, pad[:2])
+
+    # ================================
+    # QUERIES
+    # ================================
+
+    def _selection(self, category=None, status=None, start=None, end=None):
+        """Get index selectors for a drill-down, None if a label is unknown"""
+        if category is not None and category not in self._category_index:
+            return None
+        if status is not None and status not in self._status_index:
+            return None
+
+        c = slice(None) if category is None else slice(self._category_index[category], self._category_index[category] + 1)
+        s = slice(None) if status is None else slice(self._status_index[status], self._status_index[status] + 1)
+        if start is None and end is None:
+            return c, s, None
+
+        span = self.revenue.shape[2]
+        first = 0 if start is None else int((np.datetime64(start, "D") - self.start).astype(np.int64))
+        last = span - 1 if end is None else int((np.datetime64(end, "D") - self.start).astype(np.int64))
+        return c, s, slice(min(max(first, 0), span), min(max(last + 1, 0), span))
+
+    def total(self, category=None, status=None, start=None, end=None):
+        """Get {revenue, orders} of a slice; omitted dimensions are summed over"""
+        with self._lock:
+            selection = self._selection(category, status, start, end)
+            if selection is None:
+                return {"revenue": 0.0, "orders": 0}
+            c, s, d = selection
+            if d is None:
+                return {"revenue": float(self.cell_revenue[c, s].sum()), "orders": int(self.cell_orders[c, s].sum())}
+            return {"revenue": float(self.revenue[c, s, d].sum()), "orders": int(self.orders[c, s, d].sum())}
+
+    def breakdown(self, by, category=None, status=None, start=None, end=None):
+        """Get revenue and orders of a slice per category, status or day, as a DataFrame"""
+        if by not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension '{by}'")
+
+        with self._lock:
+            selection = self._selection(category, status, start, end)
+            if selection is None:
+                return pd.DataFrame(columns=[by, "revenue", "orders"])
+            c, s, d = selection
+
+            if by == "day" or d is not None:
+                d = d if d is not None else slice(None)
+                revenue, orders = self.revenue[c, s, d], self.orders[c, s, d]
+                axis = DIMENSIONS.index(by)
+                others = tuple(i for i in range(3) if i != axis)
+                labels = {"category": self.categories[c], "status": self.statuses[s], "day": self.days[d]}[by]
+            else:
+                revenue, orders = self.cell_revenue[c, s], self.cell_orders[c, s]
+                others = (1,) if by == "category" else (0,)
+                labels = self.categories[c] if by == "category" else self.statuses[s]
+
+            return pd.DataFrame({
+                by: labels,
+                "revenue": revenue.sum(axis=others),
+                "orders": orders.sum(axis=others),
+            })
+
+class RevenueCubeStore:
+    """Keep the cube of the latest order data version and route order mutations to it"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cube = None
+
+    def on_load(self, name, table, version):
+        """DataStore listener: fold every order sync into the cube"""
+        if name == "orders":
+            self.sync(table, version)
+
+    def build(self, table, version):
+        """Build and keep the cube for an order table"""
+        cube = RevenueCube.build(table, version)
+        with self._lock:
+            self._cube = cube
+        return cube
+
+    def sync(self, table, version):
+        """Reconcile the kept cube with an order table, building one only the first time"""
+        cube = self._cube
+        if cube is None:
+            return self.build(table, version)
+        cube.reconcile(table, version)
+        return cube
+
+    def latest(self):
+        """Get the newest cube, even if its data version is stale"""
+        return self._cube
+
+    def for_version(self, table, version):
+        """Get the cube of a data version, reconciling or building it if needed"""
+        cube = self._cube
+        if cube is None or cube.version != version:
+            cube = self.sync(table, version)
+        return cube
+
+    def order_saved(self, order):
+        """Fold a created or updated order into the cube, if one is built"""
+        cube = self._cube
+        if cube is not None and order:
+            cube.apply(order)
+
+    def order_deleted(self, order_id):
+        """Take a deleted order out of the cube, if one is built"""
+        cube = self._cube
+        if cube is not None:
+            cube.remove(order_id)
+
+@st.cache_resource
+def get_revenue_cube_store():
+    """Get the revenue cube store shared by every session, fed by DataStore syncs"""
+    store = RevenueCubeStore()
+    get_data_store().on_load(store.on_load)
+    return store
+
+def get_revenue_cube(api_client):
+    """Get the revenue cube for the current version of the shared order table"""
+    store = get_data_store()
+    table = store.orders(api_client)
+    return get_revenue_cube_store().for_version(table, store.version("orders"))
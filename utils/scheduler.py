@@ -0,0 +1,355 @@
+"""
+Scheduled and recurring campaign launches on a persistent timer queue
+"""
+
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import streamlit as st
+
+from utils.data_store import get_data_store
+from utils.api_client import APIClient
+from utils.dispatch import CampaignDispatcher, delivery_adapter_name, get_delivery_adapter
+from utils.jobs import JobCancelled, get_job_manager
+from utils.segment_engine import SegmentEngine
+
+# Journal of scheduled launches, replayed on startup
+SCHEDULE_PATH = os.getenv(
+    "SCHEDULE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".scheduler", "campaigns.jsonl")
+)
+
+# Scheduled launches running at once, across every campaign
+SCHEDULER_MAX_CONCURRENT = 2
+
+# Longest the worker sleeps between checks, so clock changes are picked up
+SCHEDULER_MAX_SLEEP = 30
+
+# Seconds before a due launch whose job couldn't be submitted is retried
+SCHEDULER_RETRY_DELAY = 5
+
+# Time zone launch times are entered and shown in unless another is picked
+SCHEDULE_TIMEZONE = os.getenv("SCHEDULE_TIMEZONE", "Asia/Kolkata")
+
+SCHEDULE_TIMEZONES = list(dict.fromkeys([
+    SCHEDULE_TIMEZONE, "Asia/Kolkata", "UTC", "Asia/Dubai", "Asia/Singapore", "Europe/London", "America/New_York",
+]))
+
+# Seconds between runs of each recurrence (None runs once)
+RECURRENCES = {
+    "once": None,
+    "hourly": 60 * 60,
+    "daily": 24 * 60 * 60,
+    "weekly": 7 * 24 * 60 * 60,
+}
+
+def available_recurrences():
+    """Get the recurrences launches may use.
+
+    Repeating needs a DELIVERY_ADAPTER: without one a launch only activates
+    the campaign, so every run after the first would send nothing.
+    """
+    return list(RECURRENCES) if delivery_adapter_name() else ["once"]
+
+class CampaignGone(RuntimeError):
+    """Raised by a launch whose campaign no longer exists, so its schedule is dropped"""
+
+def next_run(run_at, recurrence, now=None):
+    """Get the first run of a recurrence after now, None for one-off launches"""
+    interval = RECURRENCES.get(recurrence)
+    if interval is None:
+        return None
+    now = time.time() if now is None else now
+    # Runs missed while the server was down are skipped, not replayed
+    missed = max(0, int((now - run_at) // interval) + 1)
+    return run_at + missed * interval
+
+class ScheduleJournal:
+    """Append-only JSON-lines log of schedule changes.
+
+    Each line is {"op": "put", "item": {...}} or {"op": "delete", "id": ...};
+    replaying it gives the live items. The file is rewritten compactly once
+    it holds more than twice as many lines as there are live items.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lines = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def load(self):
+        """Replay the journal into {id: item}, skipping a torn last line"""
+        items = {}
+        if not os.path.exists(self.path):
+            return items
+
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                self._lines += 1
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("op") == "put":
+                    items[entry["item"]["id"]] = entry["item"]
+                elif entry.get("op") == "delete":
+                    items.pop(entry["id"], None)
+        return items
+
+    def put(self, item):
+        self._append({"op": "put", "item": item})
+
+    def delete(self, item_id):
+        self._append({"op": "delete", "id": item_id})
+
+    def _append(self, entry):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        self._lines += 1
+
+    def maybe_compact(self, items):
+        """Rewrite the journal as one put per live item when it has grown"""
+        if self._lines <= max(1000, 2 * len(items)):
+            return
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for item in items.values():
+                f.write(json.dumps({"op": "put", "item": item}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self._lines = len(items)
+
+class CampaignScheduler:
+    """Launch campaigns at set times from a heap-ordered timer queue.
+
+    Items are kept in a dict and a heap of (run_at, rev, id); rescheduling
+    or cancelling bumps or drops the item and its stale heap entries are
+    skipped when they surface. Every change is journaled, so items survive
+    restarts. A worker thread pops due items and hands them to `launcher`
+    as background jobs, holding at most `max_concurrent` at a time.
+    """
+
+    def __init__(self, journal, launcher, jobs, max_concurrent=SCHEDULER_MAX_CONCURRENT):
+        self.journal = journal
+        self.launcher = launcher
+        self.jobs = jobs
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._cond = threading.Condition()
+        self._revs = itertools.count(1)
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._items = journal.load()
+        self._heap = []
+        for item in self._items.values():
+            item["rev"] = next(self._revs)
+            self._heap.append((item["run_at"], item["rev"], item["id"]))
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._items)
+
+    def schedule(self, campaign_id, run_at, recurrence="once", label=None, created_by=None, timezone=None):
+        """Schedule a campaign launch at run_at (epoch seconds, in the future), optionally recurring"""
+        if recurrence not in RECURRENCES:
+            raise ValueError(f"Unknown recurrence '{recurrence}'")
+        if recurrence not in available_recurrences():
+            raise ValueError("Recurring launches need messages sent from this app (set DELIVERY_ADAPTER)")
+        if run_at <= time.time():
+            raise ValueError("The launch time has already passed")
+
+        with self._cond:
+            item = {
+                "id": f"sched-{int(time.time() * 1000)}-{next(self._revs)}",
+                "campaign_id": campaign_id,
+                "label": label or f"Campaign #{campaign_id}",
+                "run_at": float(run_at),
+                "recurrence": recurrence,
+                "timezone": timezone,
+                "created_by": created_by,
+                "last_run_at": None,
+                "last_job": None,
+            }
+            self._put(item)
+            self._cond.notify()
+        return dict(item)
+
+    def cancel(self, item_id):
+        """Remove a scheduled launch; its stale heap entry is skipped later"""
+        with self._cond:
+            if self._items.pop(item_id, None) is None:
+                return False
+            self.journal.delete(item_id)
+            self.journal.maybe_compact(self._items)
+            return True
+
+    def cancel_campaign(self, campaign_id):
+        """Remove every scheduled launch of a campaign, returning how many there were"""
+        with self._cond:
+            item_ids = [item_id for item_id, item in self._items.items() if item["campaign_id"] == campaign_id]
+        return sum(self.cancel(item_id) for item_id in item_ids)
+
+    def upcoming(self, limit=50, campaign_id=None):
+        """Get the next scheduled launches, soonest first"""
+        with self._cond:
+            items = self._items.values()
+            if campaign_id is not None:
+                items = [item for item in items if item["campaign_id"] == campaign_id]
+            return [dict(item) for item in heapq.nsmallest(limit, items, key=lambda item: item["run_at"])]
+
+    def start(self):
+        """Start the worker thread (once)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="campaign-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify()
+
+    def _put(self, item):
+        item["rev"] = next(self._revs)
+        self._items[item["id"]] = item
+        heapq.heappush(self._heap, (item["run_at"], item["rev"], item["id"]))
+        self.journal.put(item)
+        self.journal.maybe_compact(self._items)
+
+    def _pop_due(self, now):
+        """Pop the next due item, or return the seconds until one is due"""
+        while self._heap:
+            run_at, rev, item_id = self._heap[0]
+            item = self._items.get(item_id)
+            if item is None or item["rev"] != rev:
+                heapq.heappop(self._heap)
+                continue
+            if run_at > now:
+                return None, run_at - now
+            heapq.heappop(self._heap)
+            return item, 0
+        return None, None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            # Wait for a free slot first, so due items stay queued while the cap is reached
+            self._slots.acquire()
+            with self._cond:
+                item, wait_for = self._pop_due(time.time())
+                if item is None:
+                    self._slots.release()
+                    self._cond.wait(min(wait_for, SCHEDULER_MAX_SLEEP) if wait_for is not None else SCHEDULER_MAX_SLEEP)
+                    continue
+
+                launch = dict(item)
+                try:
+                    job = self.jobs.submit(
+                        "scheduled_launch", self._run, launch,
+                        label=f"Scheduled: {item['label']}", owner=item.get("created_by")
+                    )
+                except Exception:
+                    # The item stays due and is retried; its slot was never used
+                    heapq.heappush(self._heap, (item["run_at"], item["rev"], item["id"]))
+                    self._slots.release()
+                    self._cond.wait(SCHEDULER_RETRY_DELAY)
+                    continue
+                # The slot frees whenever the job ends, even if it's cancelled before starting
+                job.future.add_done_callback(lambda _: self._slots.release())
+                item["last_run_at"] = time.time()
+                item["last_job"] = job.id
+                following = next_run(item["run_at"], item["recurrence"])
+                if following is None:
+                    self._items.pop(item["id"], None)
+                    self.journal.delete(item["id"])
+                else:
+                    item["run_at"] = following
+                    self._put(item)
+
+    def _run(self, job, item):
+        try:
+            return self.launcher(job, item)
+        except CampaignGone:
+            # Nothing left to launch: drop the schedule instead of re-arming it
+            self.cancel(item["id"])
+            raise
+
+def launch_campaign(job, api_client, store, item):
+    """Activate a scheduled campaign and send it to its audience (runs as a job)"""
+    campaign = api_client.get_campaign(item["campaign_id"], silent=True)
+    if not campaign:
+        # Tell a deleted campaign from a backend that's briefly unreachable
+        campaigns = api_client.get_campaigns(empty_on_error=False, silent=True)
+        if campaigns is not None and all(c.get("id") != item["campaign_id"] for c in campaigns):
+            raise CampaignGone(f"campaign #{item['campaign_id']} no longer exists")
+        raise RuntimeError(f"campaign #{item['campaign_id']} couldn't be loaded")
+    if campaign.get("status") in ("archived", "completed"):
+        job.update(message=f"⏭️ Skipped: campaign is {campaign['status']}")
+        return {"campaign": campaign, "delivery": None, "skipped": True}
+
+    # Without a configured adapter, activating is the launch: the backend sends it
+    adapter = get_delivery_adapter(api_client, campaign["id"])
+    if adapter is None:
+        if campaign.get("status") == "active":
+            # Nothing here can make the backend send again, so say so instead of reporting a launch
+            job.update(progress=1.0, message="⚠️ Not sent: the campaign is already active and no DELIVERY_ADAPTER is set")
+            return {"campaign": campaign, "delivery": None, "adapter": None, "sent": False}
+        if not api_client.update_campaign_status(campaign["id"], "active", campaign=campaign):
+            raise RuntimeError("the campaign couldn't be activated")
+        job.update(progress=1.0, message="✅ Campaign activated")
+        return {"campaign": campaign, "delivery": None, "adapter": None, "sent": True}
+
+    # Only stored rules define who gets messages; audience types are the backend's to resolve
+    rules = campaign.get("segment_rules")
+    if not (isinstance(rules, dict) and "rules" in rules):
+        raise RuntimeError("the campaign has no stored segment rules, so its audience can't be resolved locally")
+
+    job.update(message="🎯 Resolving audience...")
+    table = store.customers(api_client, silent=True)
+    engine = SegmentEngine(table, store.version("customers"))
+    audience = table.take(np.flatnonzero(engine.mask(rules)))
+
+    if campaign.get("status") != "active":
+        api_client.update_campaign_status(campaign["id"], "active", campaign=campaign)
+
+    if job.cancelled:
+        raise JobCancelled()
+
+    def report(snapshot):
+        done = snapshot["total_sent"] / snapshot["total"] if snapshot["total"] else 1.0
+        job.update(progress=done, message=f"📤 {snapshot['total_sent']:,} of {snapshot['total']:,} messages sent", delivery=snapshot)
+
+    dispatcher = CampaignDispatcher(adapter, cancel=job.cancel_event)
+    progress = dispatcher.dispatch(campaign["message_template"], audience, on_progress=report)
+    return {"campaign": campaign, "delivery": progress.snapshot(), "adapter": adapter.name}
+
+def schedule_timestamp(run_date, run_time, timezone=None):
+    """Get the epoch seconds of a wall-clock date and time in a time zone"""
+    return datetime.combine(run_date, run_time, tzinfo=ZoneInfo(timezone or SCHEDULE_TIMEZONE)).timestamp()
+
+def format_run_at(run_at, timezone=None):
+    """Format a schedule time (epoch seconds) in a time zone, SCHEDULE_TIMEZONE by default"""
+    return datetime.fromtimestamp(run_at, ZoneInfo(timezone or SCHEDULE_TIMEZONE)).strftime("%d %b %Y, %I:%M %p %Z")
+
+@st.cache_resource
+def _scheduler_for(path):
+    store = get_data_store()
+    # The worker outlives any one session, so it gets a client of its own
+    api_client = APIClient(silent=True)
+
+    def launcher(job, item):
+        return launch_campaign(job, api_client, store, item)
+
+    scheduler = CampaignScheduler(ScheduleJournal(path), launcher, get_job_manager())
+    scheduler.start()
+    return scheduler
+
+def get_campaign_scheduler():
+    """Get the scheduler shared by every session, starting its worker on first use"""
+    return _scheduler_for(SCHEDULE_PATH)
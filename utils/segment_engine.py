@@ -0,0 +1,348 @@
+"""
+Local evaluation of segment rules over cached customer columns
+"""
+
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import streamlit as st
+
+from utils.helpers import TTLCache, calculate_days_ago_column
+from utils.data_store import get_data_store
+from utils.bitmap_index import Bitmap, get_bitmap_cache
+from utils.segment_rules import SEGMENT_FIELDS, canonicalize, is_group
+from utils.segment_sketch import get_sketch_store
+
+# Seconds a materialized audience stays valid for a data version
+SNAPSHOT_TTL = 300
+
+# Below this share of surviving rows, uncached rules in an AND group are
+# evaluated on the survivors only instead of the whole column
+RESTRICT_FRACTION = 1 / 16
+
+OPERATORS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "=": np.equal,
+}
+
+LOGIC_OPERATORS = ["AND", "OR"]
+
+class SegmentError(ValueError):
+    """Raised when rules can't be evaluated locally"""
+
+def compile_rule(rule):
+    """Compile one {field, operator, value} rule into mask(columns)"""
+    field = rule.get("field")
+    operator = rule.get("operator")
+
+    if field not in SEGMENT_FIELDS:
+        raise SegmentError(f"Unknown field: {field}")
+    if operator not in OPERATORS:
+        raise SegmentError(f"Unknown operator: {operator}")
+
+    try:
+        value = float(rule.get("value"))
+    except (TypeError, ValueError):
+        raise SegmentError(f"Invalid value for {field}: {rule.get('value')!r}")
+
+    compare = OPERATORS[operator]
+
+    def mask(columns):
+        # NaN (e.g. no orders yet) never matches, like NULL in SQL
+        return compare(columns[field], value)
+
+    return mask
+
+def rule_key(rule):
+    """Get a hashable identity for a rule, used to cache its mask"""
+    try:
+        return (rule.get("field"), rule.get("operator"), float(rule.get("value")))
+    except (TypeError, ValueError):
+        raise SegmentError(f"Invalid value for {rule.get('field')}: {rule.get('value')!r}")
+
+def combine_masks(masks, logic, size):
+    """Combine rule masks with AND/OR into a new mask"""
+    if not masks:
+        return np.ones(size, dtype=bool)
+
+    combine = np.logical_and if logic == "AND" else np.logical_or
+    result = masks[0].copy()
+    for mask in masks[1:]:
+        combine(result, mask, out=result)
+    return result
+
+def compile_rules(segment_rules):
+    """Compile a {logic, rules} object into mask(columns).
+
+    Entries may be nested {logic, negate, rules} groups. An empty rule list
+    matches every customer.
+    """
+    logic = segment_rules.get("logic", "AND")
+    if logic not in LOGIC_OPERATORS:
+        raise SegmentError(f"Unknown logic operator: {logic}")
+
+    masks = [compile_rules(node) if is_group(node) else compile_rule(node) for node in segment_rules.get("rules", [])]
+    negate = bool(segment_rules.get("negate"))
+
+    def mask(columns):
+        size = len(columns["total_spend"])
+        result = combine_masks([rule_mask(columns) for rule_mask in masks], logic, size)
+        return np.logical_not(result, out=result) if negate else result
+
+    return mask
+
+class QueryPlanner:
+    """Order the entries of rule groups for evaluation.
+
+    Selectivity comes from the data version's sketch (independence is
+    assumed across entries). AND groups run their most selective entries
+    first so the survivors shrink quickly, OR groups run their broadest
+    entries first so they fill up quickly; ties go to cheaper entries.
+    """
+
+    def __init__(self, sketch=None):
+        self.sketch = sketch
+        self._selectivity = {}
+
+    def selectivity(self, node):
+        """Estimated share of customers an entry matches"""
+        if is_group(node):
+            parts = [self.selectivity(child) for child in node["rules"]]
+            if node.get("logic", "AND") == "AND":
+                share = float(np.prod(parts)) if parts else 1.0
+            else:
+                share = 1 - float(np.prod([1 - part for part in parts])) if parts else 1.0
+            return 1 - share if node.get("negate") else share
+
+        key = rule_key(node)
+        if key not in self._selectivity:
+            estimate = self.sketch.estimate({"logic": "AND", "rules": [node]}) if self.sketch else None
+            self._selectivity[key] = estimate["estimate"] / estimate["total"] if estimate and estimate["total"] else 0.5
+        return self._selectivity[key]
+
+    def cost(self, node):
+        """Number of rules an entry evaluates"""
+        if is_group(node):
+            return sum(self.cost(child) for child in node["rules"])
+        return 1
+
+    def order(self, group):
+        """Get a group's entries in evaluation order"""
+        sign = 1 if group.get("logic", "AND") == "AND" else -1
+        return sorted(group.get("rules", []), key=lambda node: (sign * self.selectivity(node), self.cost(node)))
+
+class SegmentEngine:
+    """Evaluate segment rules against one version of the customer table"""
+
+    def __init__(self, table, version=0):
+        self.table = table
+        self.version = version
+        self._columns = None
+        self._columns_for = None
+
+    def __len__(self):
+        return len(self.table)
+
+    @property
+    def day(self):
+        """Date the day counts are relative to (UTC)"""
+        return datetime.now(timezone.utc).date()
+
+    def columns(self):
+        """Get the rule fields as numpy columns (unknown values stay NaN and never match)"""
+        # Day counts only change when the date does, so build once per day
+        today = self.day
+        if self._columns_for != today:
+            self._columns = {
+                "total_spend": self.table["total_spend"],
+                "total_orders": self.table["total_orders"],
+                "days_since_last_order": calculate_days_ago_column(self.table["last_order_date"]),
+            }
+            self._columns_for = today
+        return self._columns
+
+    def mask(self, segment_rules):
+        """Get the boolean audience mask for a {logic, rules} object"""
+        return compile_rules(segment_rules)(self.columns())
+
+    def evaluate(self, segment_rules, sample_size=5):
+        """Get audience size and sample customers, shaped like the server preview"""
+        started = time.perf_counter()
+        mask = self.mask(segment_rules)
+        return self.preview(mask, sample_size, started)
+
+    def preview(self, mask, sample_size=5, started=None):
+        """Build a preview result from an audience mask or bitmap"""
+        if isinstance(mask, Bitmap):
+            audience_size = mask.count()
+            sample_rows = mask.first(sample_size)
+        else:
+            audience_size = int(np.count_nonzero(mask))
+            sample_rows = np.flatnonzero(mask)[:sample_size]
+
+        sample = [self.table[int(i)] for i in sample_rows]
+
+        return {
+            "audience_size": audience_size,
+            "sample_customers": sample,
+            "total_customers": len(self.table),
+            "elapsed_ms": (time.perf_counter() - started) * 1000 if started else None,
+            "source": "local",
+            "data_version": self.version,
+        }
+
+class IncrementalSegmentEvaluator:
+    """Evaluate rule sets incrementally as rules are added, edited or removed.
+
+    Each rule's result is a packed bitmap kept in the shared predicate cache
+    under (data version, day, rule), so a changed rule set only computes
+    rules that nobody has evaluated yet and recombines the rest bitwise.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache
+        self.recomputed = 0
+
+    def _cache(self):
+        if self.cache is None:
+            self.cache = get_bitmap_cache()
+        return self.cache
+
+    def rule_bitmap(self, engine, rule, within=None):
+        """Get one rule's bitmap, computing it only on a cache miss.
+
+        With a sparse `within` bitmap (the survivors of an AND group), a
+        miss is evaluated on those rows only and not cached; rows outside
+        it are left unset.
+        """
+        compiled = compile_rule(rule)
+        key = predicate_cache_key(engine, rule)
+        cache = self._cache()
+
+        bitmap = cache.get(key)
+        if bitmap is not None:
+            return bitmap
+
+        self.recomputed += 1
+        if within is not None and within.count() <= len(engine) * RESTRICT_FRACTION:
+            rows = np.flatnonzero(within.to_mask())
+            columns = {field: column[rows] for field, column in engine.columns().items()}
+            mask = np.zeros(len(engine), dtype=bool)
+            mask[rows] = compiled(columns)
+            return Bitmap.from_mask(mask)
+
+        bitmap = Bitmap.from_mask(compiled(engine.columns()))
+        cache.put(key, bitmap)
+        return bitmap
+
+    def evaluate(self, engine, segment_rules, sample_size=5):
+        """Get a preview result, noting how many rules were recomputed"""
+        started = time.perf_counter()
+        bitmap = self.bitmap(engine, segment_rules)
+        preview = engine.preview(bitmap, sample_size, started)
+        preview["recomputed_rules"] = self.recomputed
+        preview["cache"] = self._cache().stats()
+        return preview
+
+    def bitmap(self, engine, segment_rules):
+        """Get the audience bitmap of the canonical form of the rules"""
+        self.recomputed = 0
+        canonical = canonicalize(segment_rules)
+        if not canonical.satisfiable:
+            return Bitmap.empty(len(engine))
+
+        planner = QueryPlanner(get_sketch_store().for_version(engine.table, engine.version))
+        return self.group_bitmap(engine, canonical.rules, planner)
+
+    def group_bitmap(self, engine, group, planner, within=None):
+        """Evaluate a group in planner order, short-circuiting once decided.
+
+        Only rows in `within` (when given) are guaranteed to be correct.
+        """
+        logic = group.get("logic", "AND")
+        if logic not in LOGIC_OPERATORS:
+            raise SegmentError(f"Unknown logic operator: {logic}")
+
+        size = len(engine)
+        result = None
+        for node in planner.order(group):
+            if result is not None:
+                # AND can't regain rows, OR can't gain more
+                if logic == "AND" and not result.any():
+                    break
+                if logic == "OR" and result.count() == size:
+                    break
+
+            survivors = within
+            if logic == "AND" and result is not None:
+                survivors = result if within is None else result & within
+
+            if is_group(node):
+                bitmap = self.group_bitmap(engine, node, planner, survivors)
+            else:
+                bitmap = self.rule_bitmap(engine, node, survivors)
+
+            if result is None:
+                result = bitmap
+            else:
+                result = result & bitmap if logic == "AND" else result | bitmap
+
+        if result is None:
+            result = Bitmap.full(size)
+        return ~result if group.get("negate") else result
+
+def predicate_cache_key(engine, rule):
+    """Key of a rule's bitmap in the shared cache"""
+    key = rule_key(rule)
+    # Only day counts go stale overnight, other predicates live for the whole version
+    day = engine.day if key[0] == "days_since_last_order" else None
+    return (engine.version, day, key)
+
+def combine_bitmaps(bitmaps, logic, size):
+    """Combine rule bitmaps with AND/OR"""
+    if not bitmaps:
+        return Bitmap.full(size)
+
+    result = bitmaps[0]
+    for bitmap in bitmaps[1:]:
+        result = result & bitmap if logic == "AND" else result | bitmap
+    return result
+
+@st.cache_resource
+def get_snapshot_cache():
+    """Get the audience snapshot cache shared by every session"""
+    return TTLCache(maxsize=128, ttl=SNAPSHOT_TTL)
+
+def audience_snapshot(engine, segment_rules):
+    """Get ids of customers matching the rules.
+
+    Snapshots are memoized by canonical rules hash, data version and day,
+    so the audience seen in preview is reused at campaign launch.
+    """
+    key = (canonicalize(segment_rules).key, engine.version, engine.day)
+
+    def compute():
+        bitmap = IncrementalSegmentEvaluator().bitmap(engine, segment_rules)
+        return engine.table["id"][bitmap.to_mask()]
+
+    return get_snapshot_cache().get_or_set(key, compute)
+
+@st.cache_resource(max_entries=2)
+def _engine_for(version, _table):
+    return SegmentEngine(_table, version)
+
+def get_segment_engine(api_client, silent=False):
+    """Get the engine for the current version of the shared customer table.
+
+    Pass silent=True off the script thread: a failed load then raises
+    RuntimeError (failing the job) instead of calling st.error.
+    """
+    store = get_data_store()
+    # Registers the sketch builder before the first sync, so it runs as customers load
+    get_sketch_store()
+    table = store.customers(api_client, silent=silent)
+    return _engine_for(store.version("customers"), table)
@@ -0,0 +1,189 @@
+"""
+Local parser turning audience descriptions into segment rules
+"""
+
+import copy
+import re
+from functools import lru_cache
+
+import streamlit as st
+
+from utils.helpers import TTLCache
+from utils.segment_rules import INTEGER_FIELDS
+
+# Seconds an AI parse result is reused for the same normalized text
+AI_PARSE_TTL = 60 * 60
+
+_SCALES = {
+    "k": 1e3, "thousand": 1e3,
+    "lakh": 1e5, "lakhs": 1e5, "lac": 1e5, "lacs": 1e5,
+    "crore": 1e7, "crores": 1e7, "cr": 1e7,
+    "million": 1e6, "mn": 1e6, "m": 1e6,
+}
+
+_DAY_UNITS = {"day": 1, "week": 7, "month": 30, "year": 365, "yr": 365}
+
+_AMOUNT_RE = re.compile(
+    r"(?P<currency>₹|rs\.?|inr)?\s*(?P<number>\d[\d,]*(?:\.\d+)?)\s*"
+    r"(?P<scale>k|thousand|lakhs?|lacs?|crores?|cr|million|mn|m)?(?![a-z])"
+    r"(?:\s*(?P<unit>days?|weeks?|months?|years?|yrs?)\b)?"
+)
+
+# Checked in order, so "no more than" wins over "more than"
+_COMPARATORS = [
+    (r"at least|no less than|not less than|minimum(?: of)?|ormore|\+|>=|≥", ">="),
+    (r"at most|no more than|not more than|up to|maximum(?: of)?|orless|orfewer|<=|≤", "<="),
+    (r"more than|greater than|over|above|exceed(?:s|ing)?|beyond|>", ">"),
+    (r"less than|fewer than|under|below|<", "<"),
+    (r"exactly|equal to|equals?|=", "="),
+]
+_COMPARATORS = [
+    (re.compile(r"(?<![a-z])(?:" + pattern + r")(?![a-z])"), operator)
+    for pattern, operator in _COMPARATORS
+]
+
+_SPEND_RE = re.compile(r"₹|\brs\b|\binr\b|rupee|spen[dt]|spending|revenue|worth|value|ltv")
+_ORDERS_RE = re.compile(r"\border(?:s|ed)?\b|\bpurchases?\b|\btimes\b|\btransactions?\b")
+_INACTIVE_RE = re.compile(
+    r"haven't|have not|hasn't|has not|not ordered|not purchased|no orders?|no purchases?|"
+    r"\binactive\b|dormant|lapsed|\bago\b|without"
+)
+# A time span is only order recency when the clause is about ordering or activity
+_RECENCY_CUE_RE = re.compile(
+    r"\border(?:s|ed|ing)?\b|\bpurchas(?:e|es|ed|ing)\b|\bbought\b|\bbuy(?:s|ing)?\b|\bshop(?:ped|ping)?\b|"
+    r"\btransact(?:ed|ions?)?\b|\b(?:in)?activ(?:e|ity)\b|dormant|lapsed"
+)
+_RECENT_RE = re.compile(r"in the last|in the past|within|\brecent|\bactive\b|ordered in|purchased in")
+
+class _Unrecognized(Exception):
+    """Raised when a clause mentions a number the grammar can't place"""
+
+def normalize_text(text):
+    """Normalize a description so equivalent phrasings share cache entries"""
+    text = text.lower().replace("’", "'").replace("‘", "'")
+    text = re.sub(r"\s+", " ", text).strip(" .!?")
+    # Keep "or more"/"or less" from reading as an OR between clauses
+    return re.sub(r"\bor (more|less|fewer)\b(?! than)", r"or\1", text)
+
+def _amount(match):
+    value = float(match.group("number").replace(",", ""))
+    scale = match.group("scale")
+    if scale:
+        value *= _SCALES[scale]
+    unit = match.group("unit")
+    if unit:
+        value *= _DAY_UNITS[unit.rstrip("s")]
+    return value
+
+def _value(field, value):
+    return int(round(value)) if field in INTEGER_FIELDS else float(value)
+
+def _detect_field(clause, match):
+    if match.group("unit"):
+        # Age, tenure and sign-up spans aren't recency; the AI handles those
+        return "days_since_last_order" if _RECENCY_CUE_RE.search(clause) else None
+    if match.group("currency") or match.group("scale") or _SPEND_RE.search(clause):
+        return "total_spend"
+    if _ORDERS_RE.search(clause):
+        return "total_orders"
+    return None
+
+def _detect_operator(clause, field):
+    for pattern, operator in _COMPARATORS:
+        if pattern.search(clause):
+            return operator
+
+    if field == "days_since_last_order":
+        if _INACTIVE_RE.search(clause):
+            return ">="
+        if _RECENT_RE.search(clause):
+            return "<="
+        return None
+    if field == "total_orders":
+        return "="
+    return ">="
+
+def _parse_clause(clause):
+    """Parse one clause into a list of rules (empty if it has no numbers)"""
+    matches = list(_AMOUNT_RE.finditer(clause))
+    if not matches:
+        return []
+
+    field = _detect_field(clause, matches[0])
+    if field is None:
+        raise _Unrecognized(clause)
+
+    if "between" in clause and len(matches) >= 2:
+        low, high = sorted(_amount(m) for m in matches[:2])
+        return [
+            {"field": field, "operator": ">=", "value": _value(field, low)},
+            {"field": field, "operator": "<=", "value": _value(field, high)},
+        ]
+
+    if len(matches) > 1:
+        # Several numbers in one clause ("5 orders in 30 days") need the AI
+        raise _Unrecognized(clause)
+
+    operator = _detect_operator(clause, field)
+    if operator is None:
+        raise _Unrecognized(clause)
+
+    return [{"field": field, "operator": operator, "value": _value(field, _amount(matches[0]))}]
+
+_AND_SPLIT_RE = re.compile(r"\s*(?:,(?!\d)|;|&|\band\b|\bbut\b)\s*")
+
+def _parse_conjunction(text):
+    rules = []
+    for clause in _AND_SPLIT_RE.split(text):
+        rules.extend(_parse_clause(clause))
+    return rules
+
+@lru_cache(maxsize=1024)
+def _parse_normalized(text):
+    # Protect "between X and Y" from the clause split
+    text = re.sub(r"between (.+?) and ", r"between \1 to ", text)
+
+    # AND binds tighter than OR: "a and b or c" is (a AND b) OR c
+    branches = re.split(r"\s*\bor\b\s*", text)
+    rules = []
+    try:
+        for branch in branches:
+            branch_rules = _parse_conjunction(branch)
+            if len(branches) > 1 and len(branch_rules) > 1:
+                rules.append({"logic": "AND", "negate": False, "rules": branch_rules})
+            else:
+                rules.extend(branch_rules)
+    except _Unrecognized:
+        return None
+
+    if not rules:
+        return None
+    return {"logic": "OR" if len(branches) > 1 else "AND", "rules": rules}
+
+def parse_segment_text_local(text):
+    """Parse a description into {logic, rules}, None if the grammar can't"""
+    parsed = _parse_normalized(normalize_text(text))
+    # Callers edit rules in place, never hand out the cached objects
+    return copy.deepcopy(parsed)
+
+@st.cache_resource
+def get_ai_parse_cache():
+    """Get the AI parse cache shared by every session, keyed by normalized text"""
+    return TTLCache(maxsize=1024, ttl=AI_PARSE_TTL)
+
+def parse_segment_text(text, api_client):
+    """Parse a description locally, falling back to the AI backend.
+
+    Returns {"rules": {logic, rules}, "source": "local" | "ai"} or None.
+    """
+    parsed = parse_segment_text_local(text)
+    if parsed:
+        return {"rules": parsed, "source": "local"}
+
+    result = get_ai_parse_cache().get_or_set(
+        normalize_text(text),
+        lambda: api_client.parse_segment_text(text.strip())
+    )
+    if not result:
+        return None
+    return {**copy.deepcopy(result), "source": "ai"}
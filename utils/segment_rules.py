@@ -0,0 +1,284 @@
+"""
+Canonical form of segment rules, so equivalent rule sets share caches
+"""
+
+import hashlib
+import json
+import math
+from collections import namedtuple
+
+import streamlit as st
+
+from utils.helpers import TTLCache
+
+# Fields a segment rule can filter on
+SEGMENT_FIELDS = ["total_spend", "total_orders", "days_since_last_order"]
+
+# Fields holding whole numbers, where "> 4" and ">= 5" mean the same
+INTEGER_FIELDS = {"total_orders", "days_since_last_order"}
+
+RULE_OPERATORS = [">", ">=", "<", "<=", "="]
+
+# Seconds a server preview stays valid for identical canonical rules
+PREVIEW_TTL = 120
+
+CanonicalSegment = namedtuple("CanonicalSegment", ["rules", "key", "satisfiable"])
+
+# Interval on one field: (low, low_inclusive, high, high_inclusive), None = unbounded
+_EMPTY = "empty"
+
+def _rule_interval(rule):
+    """Get the interval a rule accepts, _EMPTY if it can never match"""
+    field, operator, value = rule["field"], rule["operator"], float(rule["value"])
+
+    if field in INTEGER_FIELDS:
+        if operator == ">":
+            return (math.floor(value) + 1, True, None, True)
+        if operator == ">=":
+            return (math.ceil(value), True, None, True)
+        if operator == "<":
+            return (None, True, math.ceil(value) - 1, True)
+        if operator == "<=":
+            return (None, True, math.floor(value), True)
+        if value.is_integer():
+            return (int(value), True, int(value), True)
+        return _EMPTY
+
+    if operator == ">":
+        return (value, False, None, True)
+    if operator == ">=":
+        return (value, True, None, True)
+    if operator == "<":
+        return (None, True, value, False)
+    if operator == "<=":
+        return (None, True, value, True)
+    return (value, True, value, True)
+
+def _is_empty(interval):
+    if interval is _EMPTY:
+        return True
+    low, low_inc, high, high_inc = interval
+    if low is None or high is None:
+        return False
+    return low > high or (low == high and not (low_inc and high_inc))
+
+def _intersect(a, b):
+    """Intersect two intervals (the AND of two rules on one field)"""
+    if a is _EMPTY or b is _EMPTY:
+        return _EMPTY
+
+    low, low_inc = a[0], a[1]
+    if b[0] is not None and (low is None or b[0] > low or (b[0] == low and not b[1])):
+        low, low_inc = b[0], b[1]
+
+    high, high_inc = a[2], a[3]
+    if b[2] is not None and (high is None or b[2] < high or (b[2] == high and not b[3])):
+        high, high_inc = b[2], b[3]
+
+    interval = (low, low_inc, high, high_inc)
+    return _EMPTY if _is_empty(interval) else interval
+
+def _number(field, value):
+    return int(value) if field in INTEGER_FIELDS else float(value)
+
+def _interval_rules(field, interval):
+    """Express an interval as one or two rules"""
+    low, low_inc, high, high_inc = interval
+    if low is not None and low == high:
+        return [{"field": field, "operator": "=", "value": _number(field, low)}]
+
+    rules = []
+    if low is not None:
+        rules.append({"field": field, "operator": ">=" if low_inc else ">", "value": _number(field, low)})
+    if high is not None:
+        rules.append({"field": field, "operator": "<=" if high_inc else "<", "value": _number(field, high)})
+    return rules
+
+def _canonical_and(field, intervals):
+    """AND rules on one field: intersect them into a single range"""
+    interval = (None, True, None, True)
+    for other in intervals:
+        interval = _intersect(interval, other)
+        if interval is _EMPTY:
+            return None
+    return _interval_rules(field, interval)
+
+def _canonical_or(field, intervals):
+    """OR rules on one field: keep the weakest bounds and uncovered points"""
+    lower = upper = None
+    points = set()
+
+    for interval in intervals:
+        if _is_empty(interval):
+            continue
+        low, low_inc, high, high_inc = interval
+        if low is not None and low == high:
+            points.add(low)
+        elif high is None and low is not None:
+            if lower is None or low < lower[0] or (low == lower[0] and low_inc):
+                lower = (low, low_inc)
+        elif low is None and high is not None:
+            if upper is None or high > upper[0] or (high == upper[0] and high_inc):
+                upper = (high, high_inc)
+        else:
+            # Unbounded on both sides, only reachable through odd inputs
+            return _interval_rules(field, interval)
+
+    # Fold points that fall inside or touch a half-line into it
+    step = 1 if field in INTEGER_FIELDS else 0
+    changed = True
+    while changed:
+        changed = False
+        for point in sorted(points):
+            if lower and (point > lower[0] or (point == lower[0] and lower[1])):
+                points.discard(point)
+            elif lower and point == lower[0] - step:
+                points.discard(point)
+                lower = (point, True)
+            elif upper and (point < upper[0] or (point == upper[0] and upper[1])):
+                points.discard(point)
+            elif upper and point == upper[0] + step:
+                points.discard(point)
+                upper = (point, True)
+            else:
+                continue
+            changed = True
+
+    if lower is None and upper is None and not points:
+        return None
+
+    rules = []
+    if lower:
+        rules += _interval_rules(field, (lower[0], lower[1], None, True))
+    if upper:
+        rules += _interval_rules(field, (None, True, upper[0], upper[1]))
+    rules += [{"field": field, "operator": "=", "value": _number(field, p)} for p in sorted(points)]
+    return rules
+
+def _rule_sort_key(rule):
+    field = rule.get("field")
+    return (
+        SEGMENT_FIELDS.index(field) if field in SEGMENT_FIELDS else len(SEGMENT_FIELDS),
+        json.dumps(rule, sort_keys=True, default=str),
+    )
+
+def _is_known(rule):
+    try:
+        float(rule.get("value"))
+    except (TypeError, ValueError):
+        return False
+    return rule.get("field") in SEGMENT_FIELDS and rule.get("operator") in RULE_OPERATORS
+
+def is_group(node):
+    """Check whether a rules entry is a nested {logic, negate, rules} group"""
+    return isinstance(node, dict) and isinstance(node.get("rules"), list)
+
+def _canonical_group(group):
+    """Canonicalize one group, returning (payload, satisfiable)"""
+    logic = group.get("logic", "AND")
+    negate = bool(group.get("negate"))
+    rules = group.get("rules", [])
+
+    by_field = {}
+    field_rules = {}
+    unknown = []
+    groups = []
+
+    def add(node):
+        if is_group(node):
+            groups.append(node)
+        elif _is_known(node):
+            by_field.setdefault(node["field"], []).append(_rule_interval(node))
+            field_rules.setdefault(node["field"], []).append(node)
+        else:
+            unknown.append(node)
+
+    for node in rules:
+        if not is_group(node):
+            add(node)
+            continue
+
+        child, child_satisfiable = _canonical_group(node)
+        if child.get("negate"):
+            # NOT(...) is kept as a unit, it never empties its parent
+            groups.append(child)
+        elif not child_satisfiable:
+            if logic == "AND":
+                return _wrap(child, negate), negate
+            # An empty OR branch adds nobody
+        elif not child["rules"] and logic == "OR":
+            # An empty group matches everyone, keep it rather than drop it
+            groups.append(child)
+        elif len(child["rules"]) <= 1 or child["logic"] == logic:
+            # Same logic (or a single entry): splice the children into this group
+            for grandchild in child["rules"]:
+                add(grandchild)
+        else:
+            groups.append(child)
+
+    canonical = []
+    satisfiable = True
+    combine = _canonical_and if logic == "AND" else _canonical_or
+
+    for field, intervals in by_field.items():
+        merged = combine(field, intervals)
+        if merged is None:
+            if logic == "AND":
+                # One contradictory field empties the whole audience
+                satisfiable = False
+                canonical = field_rules[field]
+                unknown = []
+                groups = []
+                break
+            continue
+        canonical.extend(merged)
+
+    if logic == "OR" and rules and not canonical and not unknown and not groups:
+        # Keep the rules so the payload never degrades to "everyone"
+        satisfiable = False
+        canonical = list(rules)
+
+    unique = {json.dumps(rule, sort_keys=True, default=str): rule for rule in canonical + unknown + groups}
+    canonical = sorted(unique.values(), key=_rule_sort_key)
+
+    # With a single entry the combining logic doesn't matter
+    payload = {"logic": logic if len(canonical) > 1 else "AND", "rules": canonical}
+    if negate:
+        payload["negate"] = True
+        # Negating an empty audience can match anyone
+        satisfiable = True
+    return payload, satisfiable
+
+def _wrap(child, negate):
+    if not negate:
+        return child
+    return {"logic": "AND", "negate": True, "rules": [child]}
+
+def canonicalize(segment_rules):
+    """Normalize a {logic, rules} object.
+
+    Rules are grouped per field, integer bounds are made inclusive, ranges
+    are intersected (AND) or merged (OR), duplicates are dropped and the
+    result is sorted. Entries of "rules" may be nested {logic, negate,
+    rules} groups, canonicalized recursively; groups sharing their parent's
+    logic are flattened into it. Rules the canonicalizer doesn't understand
+    are kept as-is. Returns CanonicalSegment(rules, key, satisfiable) where
+    key is a stable hash of the canonical payload.
+    """
+    payload, satisfiable = _canonical_group(segment_rules)
+
+    # A lone nested group is the segment itself
+    if not payload.get("negate") and len(payload["rules"]) == 1 and is_group(payload["rules"][0]):
+        payload = payload["rules"][0]
+
+    return CanonicalSegment(payload, rules_hash(payload), satisfiable)
+
+def rules_hash(payload):
+    """Stable hash of a rules payload"""
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(encoded.encode()).hexdigest()[:16]
+
+@st.cache_resource
+def get_preview_cache():
+    """Get the server preview cache shared by every session, keyed by canonical hash"""
+    return TTLCache(maxsize=512, ttl=PREVIEW_TTL)
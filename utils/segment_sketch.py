@@ -0,0 +1,258 @@
+"""
+Small per-field sketches of the customer base for instant audience estimates
+"""
+
+import math
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+import streamlit as st
+
+from utils.data_store import get_data_store
+from utils.segment_rules import SEGMENT_FIELDS, canonicalize, is_group
+
+# Rows kept in the joint sample used for multi-field estimates
+SAMPLE_SIZE = 2000
+
+# Quantile bins per continuous field
+HISTOGRAM_BINS = 64
+
+# Fields with at most this many distinct values keep exact value counts
+MAX_DISTINCT_VALUES = 2048
+
+# z-score of the 95% confidence interval reported with sample estimates
+Z_95 = 1.96
+
+_OPERATORS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "=": np.equal,
+}
+
+class FieldSketch:
+    """Distribution of one field: exact value counts or a quantile histogram"""
+
+    def __init__(self, values):
+        known = values[~np.isnan(values)]
+        distinct, counts = np.unique(known, return_counts=True)
+
+        if len(distinct) <= MAX_DISTINCT_VALUES:
+            self.values, self.counts = distinct, counts
+            self.edges = None
+        else:
+            self.values = None
+            quantiles = np.quantile(known, np.linspace(0, 1, HISTOGRAM_BINS + 1))
+            self.edges = np.unique(quantiles)
+            self.counts, _ = np.histogram(known, bins=self.edges)
+
+    @property
+    def exact(self):
+        return self.values is not None
+
+    def count(self, mask_fn):
+        """Count rows matching mask_fn(values), exact fields only"""
+        return int(self.counts[mask_fn(self.values)].sum())
+
+    def bounds(self, operator, value):
+        """Get (estimate, low, high) rows matching one comparison"""
+        if self.exact:
+            count = self.count(lambda values: _OPERATORS[operator](values, value))
+            return count, count, count
+
+        edges, counts = self.edges, self.counts
+        # Bins are half-open [left, right) except the last, which also holds
+        # the top edge. Bins strictly past the one holding the value are
+        # certain; that bin contributes between 0 and all of its rows.
+        i = int(np.searchsorted(edges, value, side="right")) - 1
+        if i == len(counts) and value == edges[-1]:
+            i -= 1
+        if i < 0 or i >= len(counts):
+            below = 0 if i < 0 else int(counts.sum())
+            above = int(counts.sum()) - below
+            certain = {">": above, ">=": above, "<": below, "<=": below}.get(operator, 0)
+            return certain, certain, certain
+
+        if operator in (">", ">="):
+            certain = int(counts[i + 1:].sum())
+        elif operator in ("<", "<="):
+            certain = int(counts[:i].sum())
+        else:
+            certain = 0
+
+        width = edges[i + 1] - edges[i]
+        fraction = (value - edges[i]) / width if width else 0.5
+        if operator in (">", ">="):
+            fraction = 1 - fraction
+        elif operator == "=":
+            fraction = 0
+
+        estimate = certain + counts[i] * fraction
+        return int(round(estimate)), certain, certain + int(counts[i])
+
+class SegmentSketch:
+    """Per-field sketches plus a joint row sample of one data version.
+
+    Field sketches answer single-field rules with hard bounds; the sample
+    keeps rows whole so multi-field rules see real correlations, and is
+    reported with a 95% Wilson interval.
+    """
+
+    def __init__(self, columns, version=0, sample_size=SAMPLE_SIZE, seed=0):
+        self.version = version
+        self.total = len(columns["total_spend"])
+        self.built_on = datetime.now(timezone.utc).date()
+        self.fields = {field: FieldSketch(np.asarray(columns[field], dtype=float)) for field in SEGMENT_FIELDS}
+
+        rng = np.random.default_rng(seed)
+        rows = rng.choice(self.total, size=min(sample_size, self.total), replace=False)
+        self.sample = {field: np.asarray(columns[field], dtype=float)[rows] for field in SEGMENT_FIELDS}
+
+    def _shift(self, rule):
+        """Get (field, operator, value) with day counts moved to today, None if unreadable"""
+        if rule.get("field") not in self.fields or rule.get("operator") not in _OPERATORS:
+            return None
+        try:
+            value = float(rule["value"])
+        except (TypeError, ValueError):
+            return None
+        if rule["field"] == "days_since_last_order":
+            value -= (datetime.now(timezone.utc).date() - self.built_on).days
+        return rule["field"], rule["operator"], value
+
+    def estimate(self, segment_rules):
+        """Estimate audience size as {estimate, low, high, method, total}.
+
+        Returns None for rules the sketch can't interpret.
+        """
+        canonical = canonicalize(segment_rules)
+        if not canonical.satisfiable:
+            return self._result(0, 0, 0, "exact")
+
+        group = canonical.rules
+        rules = group["rules"]
+        if not rules and not group.get("negate"):
+            return self._result(self.total, self.total, self.total, "exact")
+
+        if group.get("negate") or any(is_group(rule) for rule in rules):
+            # Nested groups are estimated from the joint sample
+            mask = self._sample_mask(group)
+            return None if mask is None else self._sample_estimate(mask)
+
+        shifted = [self._shift(rule) for rule in rules]
+        if None in shifted:
+            return None
+        logic = group["logic"]
+        fields = {field for field, _, _ in shifted}
+
+        if len(fields) == 1:
+            sketch = self.fields[shifted[0][0]]
+            if sketch.exact:
+                combine = np.logical_and if logic == "AND" else np.logical_or
+
+                def mask(values):
+                    masks = [_OPERATORS[op](values, value) for _, op, value in shifted]
+                    return combine.reduce(masks)
+
+                count = sketch.count(mask)
+                return self._result(count, count, count, "exact")
+            if len(shifted) == 1:
+                _, operator, value = shifted[0]
+                return self._result(*sketch.bounds(operator, value), "histogram")
+
+        return self._sample_estimate(self._sample_mask(group))
+
+    def _sample_mask(self, group):
+        """Evaluate a (nested) group over the sample rows, None if not possible"""
+        size = len(self.sample["total_spend"])
+        masks = []
+        for node in group.get("rules", []):
+            if is_group(node):
+                mask = self._sample_mask(node)
+                if mask is None:
+                    return None
+            else:
+                shifted = self._shift(node)
+                if shifted is None:
+                    return None
+                field, operator, value = shifted
+                mask = _OPERATORS[operator](self.sample[field], value)
+            masks.append(mask)
+
+        if not masks:
+            mask = np.ones(size, dtype=bool)
+        elif group.get("logic", "AND") == "AND":
+            mask = np.logical_and.reduce(masks)
+        else:
+            mask = np.logical_or.reduce(masks)
+        return ~mask if group.get("negate") else mask
+
+    def _sample_estimate(self, mask):
+        size = len(mask)
+        if not size:
+            return self._result(0, 0, 0, "exact")
+
+        hits = int(mask.sum())
+        if size == self.total:
+            return self._result(hits, hits, hits, "exact")
+
+        p = hits / size
+        denominator = 1 + Z_95 ** 2 / size
+        center = (p + Z_95 ** 2 / (2 * size)) / denominator
+        half = Z_95 * math.sqrt(p * (1 - p) / size + Z_95 ** 2 / (4 * size ** 2)) / denominator
+
+        return self._result(
+            int(round(p * self.total)),
+            int(max(0.0, center - half) * self.total),
+            int(math.ceil(min(1.0, center + half) * self.total)),
+            "sample"
+        )
+
+    def _result(self, estimate, low, high, method):
+        return {"estimate": estimate, "low": low, "high": high, "method": method, "total": self.total}
+
+class SketchStore:
+    """Keep the sketch of the latest customer data version"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sketch = None
+
+    def on_load(self, name, table, version):
+        """DataStore listener: rebuild the sketch whenever customers sync"""
+        if name == "customers":
+            self.build(table, version)
+
+    def build(self, table, version):
+        """Build and keep the sketch for a customer table"""
+        from utils.segment_engine import SegmentEngine
+
+        sketch = SegmentSketch(SegmentEngine(table, version).columns(), version)
+        with self._lock:
+            self._sketch = sketch
+        return sketch
+
+    def latest(self):
+        """Get the newest sketch, even if its data version is stale"""
+        return self._sketch
+
+    def for_version(self, table, version):
+        """Get the sketch of a data version, building it if needed"""
+        sketch = self._sketch
+        if sketch is None or sketch.version != version:
+            sketch = self.build(table, version)
+        return sketch
+
+@st.cache_resource
+def get_sketch_store():
+    """Get the sketch store shared by every session, fed by DataStore syncs"""
+    store = SketchStore()
+    data_store = get_data_store()
+    data_store.on_load(store.on_load)
+    # Customers synced before the store existed get their sketch now
+    table = data_store.peek("customers")
+    if table is not None:
+        store.build(table, data_store.version("customers"))
+    return store
@@ -0,0 +1,223 @@
+"""
+Message templates compiled once into column-wise render functions
+"""
+
+import string
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from utils.helpers import (
+    format_currency_column, format_date_column,
+    format_datetime_column, format_days_ago_column
+)
+
+def _column(data, field):
+    """Get one field from a list of dicts or a columnar record table"""
+    if isinstance(data, list):
+        return [row.get(field) for row in data]
+    return data[field]
+
+def _text_column(values):
+    series = pd.Series(values, dtype=object)
+    return series.where(series.notna(), "").astype(str).str.strip().to_numpy(dtype=object)
+
+def _string_method(method):
+    def formatter(values):
+        return getattr(pd.Series(_text_column(values), dtype=object).str, method)().to_numpy(dtype=object)
+    return formatter
+
+def _first_word(values):
+    words = pd.Series(_text_column(values), dtype=object).str.split().str[0]
+    return words.where(words.notna(), "").to_numpy(dtype=object)
+
+def _number_column(values):
+    numbers = pd.to_numeric(pd.Series(values), errors='coerce')
+    return numbers.map(lambda number: f"{number:,.0f}" if number == number else "").to_numpy(dtype=object)
+
+# Column formatters usable as {field:formatter}
+FORMATTERS = {
+    "text": _text_column,
+    "upper": _string_method("upper"),
+    "lower": _string_method("lower"),
+    "title": _string_method("title"),
+    "first": _first_word,
+    "number": _number_column,
+    "currency": format_currency_column,
+    "date": format_date_column,
+    "datetime": format_datetime_column,
+    "days_ago": format_days_ago_column,
+}
+
+# Customer fields a template can use, with their default formatter
+TEMPLATE_FIELDS = {
+    "name": "text",
+    "email": "text",
+    "phone": "text",
+    "total_spend": "currency",
+    "total_orders": "number",
+    "last_order_date": "date",
+    "created_at": "date",
+}
+
+# Text used when a customer has no value for a field
+FIELD_FALLBACKS = {
+    "name": "Customer",
+    "total_spend": "₹0",
+    "total_orders": "0",
+}
+
+# Placeholders every campaign message must personalize with
+REQUIRED_FIELDS = ("name",)
+
+# Placeholders the backend fills in when it renders and sends messages itself
+BACKEND_FIELDS = ("name",)
+
+# Customer shown in previews when no real audience is at hand
+SAMPLE_CUSTOMER = {
+    "name": "John Doe",
+    "email": "john.doe@example.com",
+    "phone": "+91 98765 43210",
+    "total_spend": 12500,
+    "total_orders": 4,
+    "last_order_date": "2024-01-15T10:30:00",
+    "created_at": "2023-06-01T09:00:00",
+}
+
+class TemplateError(ValueError):
+    """Raised for malformed templates or unknown placeholders"""
+
+class CompiledTemplate:
+    """A parsed template, rendered a whole column of customers at a time"""
+
+    def __init__(self, template, parts):
+        self.template = template
+        self.parts = parts
+        self.fields = list(dict.fromkeys(field for _, field, _ in parts if field))
+        self.static_text = "".join(literal for literal, _, _ in parts)
+
+    @property
+    def placeholders(self):
+        """(field, formatter) of each placeholder, in order"""
+        return [(field, formatter) for _, field, formatter in self.parts if field]
+
+    def format_columns(self, data):
+        """Get the formatted column of each distinct (field, formatter) placeholder"""
+        columns = {}
+        for field, formatter in self.placeholders:
+            if (field, formatter) in columns:
+                continue
+            column = FORMATTERS[formatter](_column(data, field))
+            fallback = FIELD_FALLBACKS.get(field)
+            if fallback is not None:
+                column = np.where(column == "", fallback, column).astype(object)
+            columns[(field, formatter)] = column
+        return columns
+
+    def render_column(self, data):
+        """Render the message of every customer in a list of dicts or a record table"""
+        columns = self.format_columns(data)
+        messages = np.full(len(data), "", dtype=object)
+        for literal, field, formatter in self.parts:
+            if literal:
+                messages = messages + literal
+            if field:
+                messages = messages + columns[(field, formatter)]
+        return messages
+
+    def render(self, customer):
+        """Render the message of one customer dict"""
+        return self.render_column([customer])[0]
+
+    def render_chunks(self, data, chunk_size=100000):
+        """Yield rendered messages chunk by chunk, for audiences too big to hold at once"""
+        for start in range(0, len(data), chunk_size):
+            yield self.render_column(data[start:start + chunk_size])
+
+    def __repr__(self):
+        return f"CompiledTemplate({self.template!r})"
+
+@lru_cache(maxsize=256)
+def compile_template(template):
+    """Parse a template once into a CompiledTemplate.
+
+    Placeholders are {field} or {field:formatter}, with fields from
+    TEMPLATE_FIELDS and formatters from FORMATTERS; "{{" and "}}" are
+    literal braces. Raises TemplateError listing every problem found.
+    """
+    try:
+        tokens = list(string.Formatter().parse(template))
+    except ValueError as e:
+        raise TemplateError(f"Malformed template: {e}")
+
+    parts = []
+    errors = []
+    for literal, field, spec, conversion in tokens:
+        if field is None:
+            parts.append((literal, None, None))
+            continue
+
+        if field not in TEMPLATE_FIELDS:
+            errors.append(f"Unknown placeholder {{{field}}}")
+        elif spec and spec not in FORMATTERS:
+            errors.append(f"Unknown formatter '{spec}' in {{{field}:{spec}}}")
+        elif conversion:
+            errors.append(f"Conversions like !{conversion} aren't supported in {{{field}}}")
+        parts.append((literal, field, spec or TEMPLATE_FIELDS.get(field)))
+
+    if errors:
+        raise TemplateError("; ".join(errors))
+    return CompiledTemplate(template, tuple(parts))
+
+def extended_placeholders():
+    """Whether templates may use every TEMPLATE_FIELDS placeholder and formatter.
+
+    That's only when a DELIVERY_ADAPTER renders messages in this app;
+    otherwise the backend sends them and fills in BACKEND_FIELDS only.
+    """
+    from utils.dispatch import delivery_adapter_name
+
+    return delivery_adapter_name() is not None
+
+def placeholder_help():
+    """Describe the placeholders a template may use in this configuration"""
+    if extended_placeholders():
+        return (
+            "Placeholders: " + ", ".join(f"{{{field}}}" for field in TEMPLATE_FIELDS) +
+            ". Add a formatter like {name:first} or {last_order_date:days_ago}."
+        )
+    return "Placeholders: " + ", ".join(f"{{{field}}}" for field in BACKEND_FIELDS) + " (filled in by the backend when it sends)."
+
+def _backend_errors(template):
+    """Get the parts of a valid template the backend can't render"""
+    errors = []
+    if "{{" in template or "}}" in template:
+        errors.append("Escaped braces ({{ or }}) are only supported when messages are sent from this app")
+    for _, field, spec, _ in string.Formatter().parse(template):
+        if field is None:
+            continue
+        if field not in BACKEND_FIELDS:
+            errors.append(f"{{{field}}} is only supported when messages are sent from this app (DELIVERY_ADAPTER)")
+        elif spec:
+            errors.append(f"Formatters like {{{field}:{spec}}} are only supported when messages are sent from this app (DELIVERY_ADAPTER)")
+    return list(dict.fromkeys(errors))
+
+def validate_template(template, required=REQUIRED_FIELDS, extended=None):
+    """Get a list of problems with a template (empty if it's usable).
+
+    Unless extended (by default: a DELIVERY_ADAPTER is configured), only
+    the placeholders the backend fills in are accepted.
+    """
+    if not template or not template.strip():
+        return ["Message template is required"]
+
+    try:
+        compiled = compile_template(template)
+    except TemplateError as e:
+        return str(e).split("; ")
+
+    if extended is None:
+        extended = extended_placeholders()
+    errors = [] if extended else _backend_errors(template)
+    return errors + [f"Message must include {{{field}}} placeholder" for field in required if field not in compiled.fields]